@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Audit log routes for investigations (admin only)
+"""
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.auth.rbac import require_permissions
+from app.auth.security import User
+from app.config import settings
+from app.database.tenancy import current_tenant
+from app.monitoring.profiling import TimedRoute
+from app.services.audit import audit_log
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/events")
+async def query_audit_events(
+    request: Request,
+    event: Optional[str] = Query(None, description="Event type, e.g. login.failed"),
+    username: Optional[str] = Query(None, description="Username the events are about"),
+    user_id: Optional[str] = Query(None, description="User id the events are about"),
+    since: Optional[datetime] = Query(None, description="Earliest event time (UTC)"),
+    until: Optional[datetime] = Query(None, description="Latest event time (UTC)"),
+    limit: int = Query(1000, ge=1, le=settings.AUDIT_QUERY_MAX_LIMIT),
+    current_user: User = Depends(require_permissions("audit:read")),
+):
+    """
+    Stream audit events as newline-delimited JSON, newest first
+
+    Events are sent as they are read from the database, so large result sets
+    don't have to fit in memory. Admins only see the events of their own
+    tenant, or of the default database (events without a tenant).
+    """
+    # {"tenant": None} also matches events stored without the field
+    filters = {"tenant": current_tenant()}
+    if event:
+        filters["event"] = event
+    if username:
+        filters["username"] = username
+    if user_id:
+        filters["user_id"] = user_id
+    if since or until:
+        filters["ts"] = {}
+        if since:
+            filters["ts"]["$gte"] = since
+        if until:
+            filters["ts"]["$lte"] = until
+
+    # Investigations are audited too
+    audit_log.record(
+        "audit.queried",
+        username=current_user.username,
+        user_id=current_user.id,
+        request=request,
+        filters={key: str(value) for key, value in filters.items()},
+    )
+
+    async def lines() -> AsyncIterator[str]:
+        async for document in audit_log.query(filters, limit):
+            yield json.dumps(document, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -2,33 +2,24 @@
 """
 API routes for the FastAPI starter template
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from app.models.batch import BatchRequest, BatchResponse
 from app.models.hello import HelloAuthenticatedRequest, HelloAuthenticatedResponse
+from app.services.batch_service import BatchService
+from app.services.cache import cache_stats
+from app.services.container import get_hello_authenticated_service
 from app.services.hello_service import HelloAuthenticatedService
-from app.auth.security import User, get_current_user
+from app.auth.rbac import require_permissions
+from app.auth.security import User
+from app.monitoring.profiling import TimedRoute
 
-router = APIRouter()
-
-# Health check endpoint
-@router.get("/health")
-async def health_check():
-    """
-    Health check endpoint
-    
-    Returns:
-        Health status of the API
-    """
-    return {"status": "healthy", "message": "API is running"}
-
-# Dependencies to get services
-def get_hello_authenticated_service():
-    return HelloAuthenticatedService()
+router = APIRouter(route_class=TimedRoute)
 
 # POST endpoint for hello_authenticated has been removed
 
 @router.get("/hello_authenticated", response_model=HelloAuthenticatedResponse)
 async def say_hello_authenticated_get(
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(require_permissions("hello:read")),
     service: HelloAuthenticatedService = Depends(get_hello_authenticated_service)
 ):
     """
@@ -43,3 +34,43 @@ async def say_hello_authenticated_get(
     """
     response = await service.say_hello(None, current_user.username)
     return response
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def batch(
+    batch_request: BatchRequest,
+    request: Request,
+    current_user: User = Depends(require_permissions("batch:execute"))
+):
+    """
+    Execute several API calls in a single round trip
+    
+    The caller is authenticated once for the whole batch; the sub-requests
+    are dispatched concurrently through the application routers and reuse
+    that authentication.
+    
+    Args:
+        batch_request: The sub-requests to execute
+        request: The outer request
+        current_user: The authenticated user
+        
+    Returns:
+        One result per sub-request with its own status code
+    """
+    service = BatchService(request.app, request.scope, current_user)
+    responses = await service.execute(batch_request.requests)
+    return BatchResponse(responses=responses)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(current_user: User = Depends(require_permissions("cache:read"))):
+    """
+    Report the hit-rate metrics of the service caches of this worker
+    
+    Args:
+        current_user: The authenticated user
+        
+    Returns:
+        Counters and hit rate per cache
+    """
+    return cache_stats()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Streaming routes pushing live user events over WebSocket and Server-Sent Events
+
+Both endpoints authenticate once when the connection is opened and only
+re-check the token expiry on a timer afterwards. They are closed as soon as
+the user is deactivated or the worker starts shutting down.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from app.auth.rbac import permission_engine, require_permissions
+from app.auth.security import User, get_current_user, oauth2_scheme, verify_token
+from app.config import settings
+from app.monitoring.profiling import TimedRoute
+from app.services.event_service import event_broker
+
+router = APIRouter(route_class=TimedRoute)
+
+_STREAM_READ = permission_engine.mask(["stream:read"])
+
+
+class TokenExpiryCheck:
+    """Re-checks the expiry of a connection's token on a timer"""
+    
+    def __init__(self, token: Optional[str]):
+        token_data = verify_token(token) if token else None
+        self.expires_at = token_data.exp if token_data else None
+        self.next_check = time.monotonic() + settings.STREAM_TOKEN_RECHECK_SECONDS
+    
+    def expired(self) -> bool:
+        """Return True once the token has expired, checking at most once per interval"""
+        now = time.monotonic()
+        if now < self.next_check:
+            return False
+        self.next_check = now + settings.STREAM_TOKEN_RECHECK_SECONDS
+        return self.expires_at is not None and datetime.now(timezone.utc) >= self.expires_at
+
+
+def _poll_interval() -> float:
+    """Seconds to wait for an event before doing housekeeping"""
+    return min(settings.STREAM_KEEPALIVE_SECONDS, settings.STREAM_TOKEN_RECHECK_SECONDS)
+
+
+def _get_websocket_token(websocket: WebSocket) -> Optional[str]:
+    """Extract the bearer token from the query string or the Authorization header"""
+    token = websocket.query_params.get("token")
+    if token:
+        return token
+    
+    scheme, _, value = websocket.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and value:
+        return value
+    
+    return None
+
+
+@router.websocket("/ws")
+async def user_events_websocket(websocket: WebSocket):
+    """
+    Push the authenticated user's events over a WebSocket
+    
+    The token is passed in the `token` query parameter or the Authorization header.
+    """
+    token = _get_websocket_token(websocket)
+    try:
+        user = await get_current_user(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    if not user.is_active:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    # The authentication middleware doesn't see WebSockets, so check the role mask here
+    if (permission_engine.mask_for_roles(user.roles) & _STREAM_READ) != _STREAM_READ:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    subscription = event_broker.subscribe(str(user.id), "websocket")
+    expiry = TokenExpiryCheck(token)
+    
+    async def wait_for_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    
+    receiver = asyncio.create_task(wait_for_disconnect())
+    try:
+        while not receiver.done():
+            message = await subscription.next_event(_poll_interval())
+            
+            if expiry.expired():
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token expired")
+                break
+            
+            if message is not None:
+                await websocket.send_text(message)
+            
+            if subscription.finished:
+                await websocket.close(code=subscription.close_code, reason=subscription.close_reason)
+                break
+    except (WebSocketDisconnect, RuntimeError):
+        # The client went away while we were sending
+        pass
+    finally:
+        receiver.cancel()
+        event_broker.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def user_events_stream(
+    request: Request,
+    current_user: User = Depends(require_permissions("stream:read")),
+    token: Optional[str] = Depends(oauth2_scheme)
+):
+    """
+    Push the authenticated user's events as Server-Sent Events
+    
+    Args:
+        request: The request, used to detect client disconnects
+        current_user: The authenticated user
+        token: The bearer token, used for the periodic expiry check
+        
+    Returns:
+        A text/event-stream response
+    """
+    expiry = TokenExpiryCheck(token)
+    
+    async def stream():
+        subscription = event_broker.subscribe(str(current_user.id), "sse")
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                message = await subscription.next_event(_poll_interval())
+                
+                if await request.is_disconnected():
+                    break
+                
+                if expiry.expired():
+                    yield "event: token_expired\ndata: {}\n\n"
+                    break
+                
+                if message is not None:
+                    yield f"data: {message}\n\n"
+                
+                if subscription.finished:
+                    break
+                
+                if message is None:
+                    # Comment line keeping proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+        finally:
+            event_broker.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stats")
+async def stream_stats(current_user: User = Depends(require_permissions("stream:read"))):
+    """
+    Report live connection counts and per-connection memory of this worker
+    
+    Args:
+        current_user: The authenticated user
+        
+    Returns:
+        Connection statistics
+    """
+    return event_broker.stats()
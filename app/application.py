@@ -2,16 +2,53 @@
 """
 Main application setup for the FastAPI starter template
 """
-from fastapi import FastAPI, Request
+import asyncio
+import time
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from app.config import settings
+from app.api.audit_routes import router as audit_router
 from app.api.routes import router as api_router
+from app.api.stream_routes import router as stream_router
 from app.auth.routes import router as auth_router
+from app.auth.api_keys import api_key_from_request, api_key_index
 from app.auth.middleware import verify_user_middleware
-from app.database.mongodb import init_db, close_db_connection
+from app.database.mongodb import CircuitOpenError, init_db, close_db_connection
+from app.database.tenancy import tenant_registry
+from app.middleware.concurrency import LoadSheddingMiddleware
+from app.middleware.deadline import DeadlineMiddleware
+from app.middleware.inflight import InFlightMiddleware, inflight_tracker
+from app.middleware.tenant import TenantMiddleware
+from app.models.api_key import ApiKey
+from app.models.job import Job
 from app.models.user import User
+from app.monitoring.health import HealthProbeMiddleware
+from app.monitoring.metrics import METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics
+from app.monitoring.profiling import ProfilingMiddleware, timed_phase
+from app.services.activity import activity_tracker
+from app.services.audit import audit_log
+from app.services.container import ServiceContainer
+from app.services.job_queue import job_queue
+from app.services.rate_limit import API_PER_IP, client_address, rate_limiter
+
+
+# Beanie document models registered at startup (also used by manage.py);
+# TenantDocument models (User) are stored in the current tenant's database
+DOCUMENT_MODELS = [
+    User,
+    Job,
+    ApiKey,
+    # Add more document models here as needed
+]
+
+
+def _seconds_until(deadline: float) -> float:
+    """Seconds left before a time.monotonic() deadline, never negative"""
+    return max(deadline - time.monotonic(), 0.0)
 
 
 @asynccontextmanager
@@ -19,18 +56,54 @@ async def lifespan(app: FastAPI):
     """
     Lifespan context manager for FastAPI
     
-    This handles database initialization and cleanup
+    This handles database initialization, service warmup and cleanup
     """
     # Initialize database connection
-    document_models = [
-        User
-        # Add more document models here as needed
-    ]
-    await init_db(document_models)
+    await init_db(DOCUMENT_MODELS)
+    
+    # Load the API keys before reporting ready, then keep them in sync
+    await api_key_index.start()
+    
+    # Build the service singletons and warm them up before serving requests
+    services = ServiceContainer()
+    await services.warmup()
+    app.state.services = services
+    
+    # Run background jobs in this process (JOB_WORKERS=0 leaves them to `manage.py worker`)
+    job_queue.start(settings.JOB_WORKERS)
+    
+    # Flush buffered last-seen/last-login updates in the background
+    activity_tracker.start()
+    
+    # Write queued audit events in batches
+    audit_log.start()
     
     yield
     
-    # Close database connection
+    # Let in-flight requests and running jobs finish before releasing services and the database.
+    # All steps share the graceful timeout, counted from when the server stopped accepting
+    # connections, and the drain leaves SERVER_SHUTDOWN_FLUSH_SECONDS of it to write the
+    # buffered activity and audit events before the worker is killed
+    shutdown_started_at = inflight_tracker.shutdown_started_at
+    if shutdown_started_at is None:
+        shutdown_started_at = time.monotonic()
+    shutdown_deadline = shutdown_started_at + settings.SERVER_GRACEFUL_TIMEOUT_SECONDS
+    drain_deadline = shutdown_deadline - settings.SERVER_SHUTDOWN_FLUSH_SECONDS
+    await inflight_tracker.drain(_seconds_until(drain_deadline))
+    await job_queue.stop(_seconds_until(drain_deadline))
+    for name, stop in (
+        ("activity", activity_tracker.stop),
+        ("API key", api_key_index.stop),
+        ("audit log", audit_log.stop),
+    ):
+        try:
+            await asyncio.wait_for(stop(), _seconds_until(shutdown_deadline))
+        except asyncio.TimeoutError:
+            print(f"Shutdown of the {name} flush timed out")
+    await services.shutdown()
+    
+    # Close tenant and default database connections
+    tenant_registry.close_all()
     await close_db_connection()
 
 
@@ -60,9 +133,30 @@ def create_application() -> FastAPI:
     # Add authentication middleware
     @app.middleware("http")
     async def auth_middleware(request: Request, call_next):
-        await verify_user_middleware(request)
+        try:
+            # Reject clients over their quota before verifying tokens or touching the database
+            # (API key calls are limited per key instead)
+            if request.url.path.startswith(settings.API_PREFIX) and api_key_from_request(request) is None:
+                await rate_limiter.check(API_PER_IP, client_address(request))
+            with timed_phase("auth"):
+                await verify_user_middleware(request)
+        except HTTPException as e:
+            # Exception handlers don't run for errors raised in middleware
+            return JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
         return await call_next(request)
     
+    # Fail fast while the database circuit breaker is open
+    @app.exception_handler(CircuitOpenError)
+    async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+        return JSONResponse(
+            {"detail": "Database unavailable"},
+            status_code=503,
+            headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+        )
+    
+    # Server-Timing breakdowns and on-demand profiles
+    app.add_middleware(ProfilingMiddleware)
+    
     # Include routers
     app.include_router(
         auth_router,
@@ -76,10 +170,41 @@ def create_application() -> FastAPI:
         tags=["API"]
     )
     
-    @app.get("/health", tags=["Health"])
-    async def health_check():
-        """Health check endpoint to verify the API is running"""
-        return {"status": "healthy", "message": "API is running"}
+    app.include_router(
+        stream_router,
+        prefix=f"{settings.API_PREFIX}/stream",
+        tags=["Streaming"]
+    )
+    
+    app.include_router(
+        audit_router,
+        prefix=f"{settings.API_PREFIX}/audit",
+        tags=["Audit"]
+    )
+    
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics endpoint"""
+        return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+    
+    # Route requests to the database of their host's tenant
+    app.add_middleware(TenantMiddleware)
+    
+    # Give every request a deadline, applied to its database operations
+    app.add_middleware(DeadlineMiddleware)
+    
+    # Shed requests over the adaptive concurrency limit before any auth or database work
+    app.add_middleware(LoadSheddingMiddleware)
+    
+    # Record per-route latency histograms and in-flight requests
+    app.add_middleware(MetricsMiddleware)
+    
+    # Count in-flight requests so shutdown can drain them
+    app.add_middleware(InFlightMiddleware)
+    
+    # Answer liveness/readiness probes before any other middleware runs.
+    # Added last so it is the outermost middleware.
+    app.add_middleware(HealthProbeMiddleware)
     
     return app
 
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+API keys for service-to-service calls
+
+A key looks like `<prefix>_<key_id>_<secret>` and is sent as
+`Authorization: ApiKey <key>` or `X-API-Key: <key>`. Secrets are random, so
+they are stored as an HMAC-SHA256 (keyed with API_KEY_HASH_SECRET) rather than
+with bcrypt, and checking one costs microseconds.
+
+Every worker keeps all active keys in memory, keyed by key id, and refreshes
+the index every API_KEY_REFRESH_SECONDS with a query for the keys updated since
+the last refresh. Authenticating a request with a key needs no database work;
+new keys, scope changes and revocations take effect within one refresh.
+"""
+import asyncio
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from fastapi import Request
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.auth.rbac import permission_engine
+from app.models.api_key import ApiKey
+from app.monitoring.metrics import stats_collector
+
+# Documents written by a host whose clock lags are still picked up
+_REFRESH_OVERLAP = timedelta(seconds=30)
+
+
+def hash_secret(secret: str) -> str:
+    """HMAC-SHA256 of a key secret, as stored in the database"""
+    return hmac.new(settings.API_KEY_HASH_SECRET.encode(), secret.encode(), hashlib.sha256).hexdigest()
+
+
+def generate_api_key() -> Tuple[str, str, str]:
+    """
+    Generate a new API key
+
+    Returns:
+        (full key to hand out once, key id, secret hash to store)
+    """
+    key_id = secrets.token_hex(8)
+    secret = secrets.token_urlsafe(32)
+    return f"{settings.API_KEY_PREFIX}_{key_id}_{secret}", key_id, hash_secret(secret)
+
+
+def parse_api_key(key: str) -> Optional[Tuple[str, str]]:
+    """Split a key into (key id, secret), or None if it isn't shaped like one"""
+    prefix, _, rest = key.partition("_")
+    key_id, _, secret = rest.partition("_")
+    if prefix != settings.API_KEY_PREFIX or not key_id or not secret:
+        return None
+    return key_id, secret
+
+
+def api_key_from_request(request: Request) -> Optional[str]:
+    """The API key sent with a request, if any"""
+    key = request.headers.get("x-api-key")
+    if key:
+        return key
+    authorization = request.headers.get("authorization")
+    if authorization and authorization[:7].lower() == "apikey ":
+        return authorization[7:].strip()
+    return None
+
+
+class ApiKeyEntry:
+    """What the index keeps of an active key"""
+
+    __slots__ = ("key_id", "secret_hash", "owner_id", "tenant", "scopes", "scope_mask", "expires_at")
+
+    def __init__(self, key_id: str, secret_hash: str, owner_id: str, scopes: FrozenSet[str],
+                 expires_at: Optional[datetime], tenant: Optional[str] = None):
+        self.key_id = key_id
+        self.secret_hash = secret_hash
+        self.owner_id = owner_id
+        self.tenant = tenant
+        self.scopes = scopes
+        # Scopes are permission names, compiled once per refresh
+        self.scope_mask = permission_engine.scope_mask(scopes)
+        self.expires_at = expires_at
+
+
+class ApiKeyIndex:
+    """In-memory index of the active API keys, refreshed incrementally"""
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._entries: Dict[str, ApiKeyEntry] = {}
+        self._synced_until: Optional[datetime] = None
+        self._last_used: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def authenticate(self, key: str) -> Optional[ApiKeyEntry]:
+        """
+        Check an API key against the index
+
+        Returns:
+            The key's entry, or None if the key is unknown, revoked, expired or wrong
+        """
+        parsed = parse_api_key(key)
+        entry = self._entries.get(parsed[0]) if parsed else None
+        if entry is None or not hmac.compare_digest(entry.secret_hash, hash_secret(parsed[1])):
+            self.rejected += 1
+            return None
+        now = datetime.utcnow()
+        if entry.expires_at is not None and entry.expires_at <= now:
+            self.rejected += 1
+            return None
+        self._last_used[entry.key_id] = now
+        self.verified += 1
+        return entry
+
+    async def refresh(self) -> int:
+        """
+        Apply the keys changed since the last refresh (all keys the first time)
+
+        Returns:
+            Number of changed keys applied
+        """
+        started = datetime.utcnow()
+        query = {}
+        if self._synced_until is not None:
+            query = {"updated_at": {"$gte": self._synced_until - _REFRESH_OVERLAP}}
+
+        changed = 0
+        cursor = ApiKey.get_motor_collection().find(
+            query,
+            {"key_id": 1, "secret_hash": 1, "owner_id": 1, "tenant": 1, "scopes": 1, "expires_at": 1, "revoked_at": 1},
+        )
+        async for document in cursor:
+            changed += 1
+            if document.get("revoked_at") is not None:
+                self._entries.pop(document["key_id"], None)
+                continue
+            self._entries[document["key_id"]] = ApiKeyEntry(
+                key_id=document["key_id"],
+                secret_hash=document["secret_hash"],
+                owner_id=document["owner_id"],
+                scopes=frozenset(document.get("scopes") or ()),
+                expires_at=document.get("expires_at"),
+                tenant=document.get("tenant"),
+            )
+
+        self._synced_until = started
+        self.refreshes += 1
+        return changed
+
+    async def flush_last_used(self) -> None:
+        """Write last-used times with one batched update"""
+        if not self._last_used:
+            return
+        last_used, self._last_used = self._last_used, {}
+        await ApiKey.get_motor_collection().bulk_write(
+            [UpdateOne({"key_id": key_id}, {"$max": {"last_used_at": used}}) for key_id, used in last_used.items()],
+            ordered=False,
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+                await self.flush_last_used()
+            except Exception as e:
+                self.refresh_errors += 1
+                print(f"API key index refresh failed: {e}")
+
+    async def start(self) -> None:
+        """Load all active keys and start refreshing them in the background"""
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop refreshing and write the pending last-used times"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush_last_used()
+        except Exception as e:
+            print(f"API key last-used flush failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Report index size and verification counters"""
+        return {
+            "keys": len(self._entries),
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "verified": self.verified,
+            "rejected": self.rejected,
+        }
+
+
+# Global API key index instance
+api_key_index = ApiKeyIndex(refresh_interval=settings.API_KEY_REFRESH_SECONDS)
+stats_collector.register(
+    "app_api_keys", api_key_index.stats,
+    counters=("refreshes", "refresh_errors", "verified", "rejected")
+)
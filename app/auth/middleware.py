@@ -7,7 +7,17 @@ from fastapi import Request, HTTPException, status, Depends
 from jose import JWTError, jwt
 from app.config import settings
 from app.models.user import User
+from app.auth.api_keys import api_key_from_request, api_key_index
+from app.auth.principals import PrincipalUnavailable, load_principal, principal_snapshots, stale_principal
+from app.auth.rbac import permission_engine
 from app.auth.security import verify_token
+from app.database.mongodb import CircuitOpenError
+from app.database.tenancy import bind_tenant, tenant_key
+from app.monitoring.profiling import timed_phase
+from app.services.activity import activity_tracker
+from app.services.audit import audit_log
+from app.services.rate_limit import API_PER_KEY, API_PER_USER, RateLimitExceeded, rate_limiter
+from app.services.user_service import UserService
 
 
 async def verify_user_middleware(request: Request) -> None:
@@ -29,10 +39,24 @@ async def verify_user_middleware(request: Request) -> None:
         "/redoc",
         "/openapi.json",
         "/health",
+        settings.HEALTH_LIVENESS_PATH,
+        settings.HEALTH_READINESS_PATH,
+        "/metrics",
         # API paths that don't need auth
         f"{settings.API_PREFIX}/auth/test-token",
+        f"{settings.API_PREFIX}/auth/token",
     ]:
         return
+    
+    # Skip requests that were already authenticated (e.g. batch sub-requests)
+    if getattr(request.state, "user", None) is not None:
+        return
+    
+    # Service API keys are checked against the in-memory key index
+    api_key = api_key_from_request(request)
+    if api_key is not None:
+        await verify_api_key(request, api_key)
+        return
         
     # Get token from header
     authorization: str = request.headers.get("Authorization")
@@ -44,7 +68,8 @@ async def verify_user_middleware(request: Request) -> None:
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
-            
+    
+    token_data = None
     try:
         scheme, token = authorization.split()
         
@@ -82,8 +107,21 @@ async def verify_user_middleware(request: Request) -> None:
                 headers={"WWW-Authenticate": "Bearer"},
             )
             
-        # Get user from database
-        user = await User.find_one({"username": token_data.sub})
+        # Route the request to the token's tenant (which must match the host's)
+        if not bind_tenant(token_data.tenant):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token not valid for this tenant",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
+        # Enforce the per-user quota before any database work
+        await rate_limiter.check(API_PER_USER, tenant_key(token_data.sub))
+        
+        # Get user from database, batched with concurrent lookups
+        # (or from a recent snapshot while the database is unavailable)
+        with timed_phase("db"):
+            user = await load_principal(request, token_data.sub)
         
         if user is None:
             raise HTTPException(
@@ -101,8 +139,21 @@ async def verify_user_middleware(request: Request) -> None:
             
         # Attach user to request state
         request.state.user = user
+        request.state.permissions = permission_engine.mask_for_roles(user.roles)
+        activity_tracker.seen(user.id)
         
+    except (RateLimitExceeded, PrincipalUnavailable):
+        raise
+    except HTTPException as e:
+        audit_log.record(
+            "token.rejected",
+            username=token_data.sub if token_data else None,
+            request=request,
+            reason=e.detail,
+        )
+        raise
     except (ValueError, JWTError):
+        audit_log.record("token.rejected", request=request, reason="Invalid token")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
@@ -110,6 +161,63 @@ async def verify_user_middleware(request: Request) -> None:
         )
 
 
+async def verify_api_key(request: Request, api_key: str) -> None:
+    """
+    Authenticate a request made with a service API key
+    
+    The key is checked against the in-memory key index and its owner comes
+    from the user cache, so a valid key normally costs no database work.
+    
+    Args:
+        request: The FastAPI request object
+        api_key: The key sent with the request
+        
+    Raises:
+        HTTPException: If the key or its owner isn't valid
+    """
+    entry = api_key_index.authenticate(api_key)
+    if entry is None:
+        audit_log.record("api_key.rejected", request=request, reason="Invalid API key")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+            headers={"WWW-Authenticate": "ApiKey"},
+        )
+    
+    await rate_limiter.check(API_PER_KEY, entry.key_id)
+    
+    # The key's owner lives in the key's tenant
+    if not bind_tenant(entry.tenant):
+        audit_log.record("api_key.rejected", request=request, key_id=entry.key_id,
+                         reason="Key not valid for this tenant")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+            headers={"WWW-Authenticate": "ApiKey"},
+        )
+    
+    try:
+        user = await UserService.get_user_by_id(entry.owner_id)
+    except CircuitOpenError as e:
+        user = stale_principal(request, e, user_id=entry.owner_id)
+    else:
+        if user is not None:
+            principal_snapshots.remember(user)
+    if user is None or not user.is_active:
+        audit_log.record("api_key.rejected", user_id=entry.owner_id, request=request,
+                         key_id=entry.key_id, reason="Inactive key owner")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Inactive key owner",
+        )
+    
+    request.state.user = user
+    request.state.api_key = entry
+    # A key gets its owner's permissions, limited to its scopes
+    request.state.permissions = permission_engine.mask_for_roles(user.roles) & entry.scope_mask
+    activity_tracker.seen(user.id)
+
+
 def get_user_from_request(request: Request) -> Optional[User]:
     """
     Get the user from the request state
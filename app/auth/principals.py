@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Principal lookups with a stale fallback for database outages
+
+Every user the auth path loads from the database is remembered as a
+snapshot. While the database circuit breaker is open, the
+AUTH_STALE_PRINCIPAL_POLICY decides what happens to requests whose user
+can't be loaded: with "read_only" (the default), GET/HEAD/OPTIONS requests
+are authorized against a snapshot verified within
+AUTH_STALE_PRINCIPAL_MAX_AGE_SECONDS; everything else, and every request with
+"off", gets 503 with Retry-After. Snapshots are kept per tenant.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from app.config import settings
+from app.database.loader import load_user
+from app.database.mongodb import CircuitOpenError
+from app.database.tenancy import tenant_key
+from app.models.user import User
+from app.monitoring.metrics import stats_collector
+
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class PrincipalUnavailable(HTTPException):
+    """Raised when the database can't provide a principal and no snapshot may be used; rendered as 503"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database unavailable",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+class PrincipalSnapshots:
+    """LRU of recently verified users, by username and by id, qualified with their tenant"""
+
+    def __init__(self, max_entries: int, max_age: float):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        # Tenant-qualified username -> (user, time.monotonic() it was loaded, tenant-qualified id)
+        self._by_username: "OrderedDict[str, Tuple[User, float, str]]" = OrderedDict()
+        self._usernames_by_id: Dict[str, str] = {}
+
+        self.served = 0
+        self.missing = 0
+
+    def remember(self, user: User) -> None:
+        """Record a user of the current tenant just loaded from the database"""
+        username, user_id = tenant_key(user.username), tenant_key(user.id)
+        self._by_username[username] = (user, time.monotonic(), user_id)
+        self._by_username.move_to_end(username)
+        self._usernames_by_id[user_id] = username
+        while len(self._by_username) > self.max_entries:
+            _, (_, _, evicted_id) = self._by_username.popitem(last=False)
+            self._usernames_by_id.pop(evicted_id, None)
+
+    def get(self, username: Optional[str] = None, user_id: Optional[str] = None) -> Optional[User]:
+        """
+        A copy of the snapshot of a user of the current tenant if it is recent enough
+
+        Args:
+            username: Username to look up
+            user_id: User id to look up, if no username is given
+        """
+        if username is None:
+            username = self._usernames_by_id.get(tenant_key(user_id))
+        else:
+            username = tenant_key(username)
+        snapshot = self._by_username.get(username) if username is not None else None
+        if snapshot is None or time.monotonic() - snapshot[1] > self.max_age:
+            self.missing += 1
+            return None
+        self.served += 1
+        return snapshot[0].model_copy(deep=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the number of snapshots and how often they were used"""
+        return {
+            "snapshots": len(self._by_username),
+            "served": self.served,
+            "missing": self.missing,
+        }
+
+
+# Global principal snapshots
+principal_snapshots = PrincipalSnapshots(
+    max_entries=settings.AUTH_PRINCIPAL_SNAPSHOT_MAX,
+    max_age=settings.AUTH_STALE_PRINCIPAL_MAX_AGE_SECONDS,
+)
+stats_collector.register(
+    "app_principal_snapshots", principal_snapshots.stats,
+    counters=("served", "missing")
+)
+
+
+def stale_principal(
+    request: Optional[Request],
+    error: CircuitOpenError,
+    username: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> User:
+    """
+    Apply the stale-principal policy to a user the database couldn't provide
+
+    Args:
+        request: The request being authenticated
+        error: The error raised by the open circuit breaker
+        username: Username of the principal
+        user_id: Id of the principal, if the username isn't known
+
+    Returns:
+        A recent snapshot of the user
+
+    Raises:
+        PrincipalUnavailable: If the policy doesn't allow a snapshot
+    """
+    if (
+        settings.AUTH_STALE_PRINCIPAL_POLICY == "read_only"
+        and request is not None
+        and request.method in READ_ONLY_METHODS
+    ):
+        user = principal_snapshots.get(username=username, user_id=user_id)
+        if user is not None:
+            request.state.stale_principal = True
+            return user
+    raise PrincipalUnavailable(error.retry_after)
+
+
+async def load_principal(request: Optional[Request], username: str) -> Optional[User]:
+    """
+    Load the user a token was issued to, batched with concurrent lookups
+
+    Args:
+        request: The request being authenticated, if any
+        username: Token subject
+
+    Returns:
+        The user, or None if no such user exists
+
+    Raises:
+        PrincipalUnavailable: If the database is unavailable and no snapshot may be used
+    """
+    try:
+        user = await load_user(username)
+    except CircuitOpenError as e:
+        return stale_principal(request, e, username=username)
+    if user is not None:
+        principal_snapshots.remember(user)
+    return user
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Role-based access control over `User.roles`
+
+Roles are declared below as permission sets (optionally including other
+roles). At import the permissions are assigned bits and every role is compiled
+into an integer mask, so checking a request is a single bitwise AND against the
+mask of the principal. Masks of role combinations are cached, and the
+authentication middleware stores the mask on the request next to the user.
+
+API key scopes are permission names: a key's mask is its owner's mask limited
+to its scopes.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.auth.security import User, get_current_user
+
+# Bounds the role-list cache should roles ever be generated per user
+_MAX_CACHED_ROLE_LISTS = 1024
+
+# Declarative role definitions: permissions plus the roles they include
+ROLE_DEFINITIONS: Dict[str, Dict[str, List[str]]] = {
+    "user": {
+        "permissions": [
+            "profile:read",
+            "hello:read",
+            "batch:execute",
+            "cache:read",
+            "stream:read",
+        ],
+    },
+    "gateway": {
+        "permissions": [
+            "tokens:introspect",
+        ],
+    },
+    "admin": {
+        "includes": ["user", "gateway"],
+        "permissions": [
+            "audit:read",
+            "users:manage",
+        ],
+    },
+}
+
+
+class PermissionEngine:
+    """Compiles role definitions into bitmasks and checks masks"""
+
+    def __init__(self, role_definitions: Dict[str, Dict[str, List[str]]]):
+        permissions = sorted({
+            permission
+            for definition in role_definitions.values()
+            for permission in definition.get("permissions", ())
+        })
+        self.bits: Dict[str, int] = {permission: 1 << i for i, permission in enumerate(permissions)}
+        self.role_masks: Dict[str, int] = {
+            role: self._compile_role(role, role_definitions, ())
+            for role in role_definitions
+        }
+        self._roles_cache: Dict[Tuple[str, ...], int] = {}
+
+    def _compile_role(self, role: str, definitions: Dict[str, Dict[str, List[str]]], seen: tuple) -> int:
+        if role in seen:
+            raise ValueError(f"Role '{role}' includes itself: {' -> '.join(seen + (role,))}")
+        if role not in definitions:
+            raise ValueError(f"Unknown role '{role}'")
+        definition = definitions[role]
+        mask = self.mask(definition.get("permissions", ()))
+        for included in definition.get("includes", ()):
+            mask |= self._compile_role(included, definitions, seen + (role,))
+        return mask
+
+    def mask(self, permissions: Iterable[str]) -> int:
+        """
+        Compile permission names into a mask
+
+        Raises:
+            ValueError: If a permission isn't granted by any role
+        """
+        mask = 0
+        for permission in permissions:
+            bit = self.bits.get(permission)
+            if bit is None:
+                raise ValueError(f"Unknown permission '{permission}'")
+            mask |= bit
+        return mask
+
+    def scope_mask(self, scopes: Iterable[str]) -> int:
+        """Mask of API key scopes; scopes that aren't permissions grant nothing"""
+        mask = 0
+        for scope in scopes:
+            mask |= self.bits.get(scope, 0)
+        return mask
+
+    def mask_for_roles(self, roles: Iterable[str]) -> int:
+        """Mask of a list of roles, cached per distinct list; unknown roles grant nothing"""
+        # A tuple is cheaper to build and hash than a frozenset, and users
+        # share a handful of role lists
+        key = tuple(roles)
+        mask = self._roles_cache.get(key)
+        if mask is None:
+            mask = 0
+            for role in key:
+                mask |= self.role_masks.get(role, 0)
+            if len(self._roles_cache) < _MAX_CACHED_ROLE_LISTS:
+                self._roles_cache[key] = mask
+        return mask
+
+    def permissions(self, mask: int) -> List[str]:
+        """Permission names of a mask"""
+        return sorted(permission for permission, bit in self.bits.items() if mask & bit)
+
+
+# Global permission engine, compiled once at import
+permission_engine = PermissionEngine(ROLE_DEFINITIONS)
+
+
+def request_permissions(request: Request, user: User) -> int:
+    """Permission mask of the request's principal"""
+    mask = getattr(request.state, "permissions", None)
+    if mask is None:
+        mask = permission_engine.mask_for_roles(user.roles)
+    return mask
+
+
+def require_permissions(*permissions: str):
+    """
+    Dependency factory requiring all of `permissions`
+
+    The required mask is compiled when the route is declared, so a misspelled
+    permission fails at startup.
+
+    Args:
+        *permissions: Permission names
+
+    Returns:
+        A dependency returning the current user
+    """
+    required = permission_engine.mask(permissions)
+
+    async def check_permissions(request: Request, current_user: User = Depends(get_current_user)) -> User:
+        if (request_permissions(request, current_user) & required) != required:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions",
+            )
+        return current_user
+
+    return check_permissions
@@ -2,26 +2,111 @@
 """
 Authentication routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, Header
+from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
+from typing import Optional, Tuple
 
+from app.auth.rbac import require_permissions
 from app.auth.security import (
     create_access_token,
     Token,
-    User,
-    get_current_user
+    User
 )
 from app.config import settings
+from app.database.tenancy import tenant_key
+from app.models.introspection import IntrospectionRequest, IntrospectionResponse
+from app.models.user import user_fieldset
+from app.monitoring.profiling import TimedRoute
+from app.services.rate_limit import LOGIN_PER_IP, LOGIN_PER_USERNAME, client_address, rate_limiter
+from app.services.introspection import token_introspector
+from app.services.user_service import UserService
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 
+@router.post("/token", response_model=Token)
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    """
+    Exchange a username (or email) and password for an access token
+    
+    Attempts are rate limited per client address and per username before the
+    password is checked, so credential stuffing can't exhaust the CPU on bcrypt.
+    """
+    await rate_limiter.check(LOGIN_PER_IP, client_address(request))
+    await rate_limiter.check(LOGIN_PER_USERNAME, tenant_key(form_data.username.lower()))
+    
+    result = await UserService.authenticate_user(form_data.username, form_data.password)
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return Token(access_token=result["access_token"], token_type=result["token_type"])
+
+
+FIELDS_DESCRIPTION = f"Comma-separated fields to return, out of: {', '.join(user_fieldset.allowed)}"
+
+
+def _selected_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Validate a `fields` query parameter against the allow-list"""
+    try:
+        return user_fieldset.parse(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.get("/me", response_model=User)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(require_permissions("profile:read"))
+):
     """
     Get current user information
+    
+    With `fields`, only the selected fields are serialized and sent.
+    """
+    if fields is None:
+        return current_user
+    selected = _selected_fields(fields)
+    # The principal is already loaded by the auth middleware; skip response model validation
+    return Response(user_fieldset.dump(current_user, selected), media_type="application/json")
+
+
+@router.get("/users/{user_id}", response_model=None)
+async def read_user(
+    user_id: str,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: User = Depends(require_permissions("users:manage"))
+):
+    """
+    Get a user by id (admin only)
+    
+    Only the selected `fields` (all non-secret fields by default) are read
+    from the database and sent.
+    """
+    selected = _selected_fields(fields)
+    document = await UserService.get_user_fields(user_id, selected)
+    if document is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return Response(user_fieldset.dump_document(document, selected), media_type="application/json")
+
+@router.post("/introspect", response_model=IntrospectionResponse, response_model_exclude_none=True)
+async def introspect_tokens(
+    introspection_request: IntrospectionRequest,
+    current_user: User = Depends(require_permissions("tokens:introspect"))
+):
+    """
+    Introspect a batch of access tokens (RFC 7662 shaped results)
+    
+    Meant for gateways and sidecars: tokens are verified locally and their
+    users resolved with a single query. Each active result carries `exp` and
+    may be cached until then.
     """
-    return current_user
+    results = await token_introspector.introspect(introspection_request.tokens)
+    return {"results": results}
 
 # Test token endpoint removed - use generate_dev_token.py instead
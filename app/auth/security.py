@@ -2,21 +2,27 @@
 """
 Security utilities for JWT authentication
 """
+import time
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional, Union
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import BaseModel
 
+from app.auth.principals import load_principal
 from app.config import settings
+from app.database.loader import load_user
+from app.database.tenancy import bind_tenant
 from app.models.user import User
+from app.monitoring.metrics import observe_jwt_verify
+from app.monitoring.profiling import add_timing, timed_phase
+from app.services.activity import activity_tracker
 
 # OAuth2 scheme for token extraction
-# Note: We don't have a token URL since we're using dev tokens directly
 oauth2_scheme = OAuth2PasswordBearer(
-    tokenUrl="",  # No token URL needed for dev tokens
+    tokenUrl=f"{settings.API_PREFIX}/auth/token",
     auto_error=False  # Don't auto-raise errors for missing tokens (for bypass)
 )
 
@@ -28,6 +34,8 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     sub: Optional[str] = None
     exp: Optional[datetime] = None
+    # Tenant the token was issued for ("tid" claim), None for the default database
+    tenant: Optional[str] = None
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -83,6 +91,7 @@ def verify_token(token: str) -> Optional[TokenData]:
     Returns:
         TokenData if valid, None otherwise
     """
+    started = time.perf_counter()
     try:
         payload = jwt.decode(
             token, 
@@ -94,21 +103,32 @@ def verify_token(token: str) -> Optional[TokenData]:
         if user_id is None:
             return None
             
-        token_data = TokenData(sub=user_id)
+        token_data = TokenData(sub=user_id, exp=payload.get("exp"), tenant=payload.get("tid"))
         return token_data
         
     except JWTError:
         return None
+    finally:
+        elapsed = time.perf_counter() - started
+        observe_jwt_verify(elapsed)
+        add_timing("jwt", elapsed)
 
-async def get_current_user(token: Optional[str] = Depends(oauth2_scheme)) -> User:
+async def get_current_user(
+    token: Optional[str] = Depends(oauth2_scheme),
+    request: Request = None
+) -> User:
     """
     Get the current user from the token
     
+    If the authentication middleware already resolved the user for this
+    request, that user is returned without verifying the token again.
+    
     If the token is a dev token (sub="dev_test_user"), this function will
     automatically create a test user in the database if it doesn't exist.
     
     Args:
         token: JWT token
+        request: The current request, if any
         
     Returns:
         User object
@@ -122,6 +142,12 @@ async def get_current_user(token: Optional[str] = Depends(oauth2_scheme)) -> Use
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    # Reuse the user attached by the authentication middleware
+    if request is not None:
+        user = getattr(request.state, "user", None)
+        if user is not None:
+            return user
+    
     # Check for token
     if not token:
         raise credentials_exception
@@ -143,7 +169,7 @@ async def get_current_user(token: Optional[str] = Depends(oauth2_scheme)) -> Use
     
     if is_dev_token:
         # This is a dev token, get or create the test user
-        test_user = await User.find_one({"username": "dev_test_user"})
+        test_user = await load_user("dev_test_user")
         
         if test_user is None:
             # Create a test user
@@ -171,13 +197,20 @@ async def get_current_user(token: Optional[str] = Depends(oauth2_scheme)) -> Use
         
         if token_data is None:
             raise credentials_exception
+        
+        # Route the lookup to the token's tenant
+        if not bind_tenant(token_data.tenant):
+            raise credentials_exception
             
-        # Look up the user in the database
-        user = await User.find_one({"username": token_data.sub})
+        # Look up the user in the database, batched with concurrent lookups
+        # (or from a recent snapshot while the database is unavailable)
+        with timed_phase("db"):
+            user = await load_principal(request, token_data.sub)
         
         if user is None:
             raise credentials_exception
-            
+        
+        activity_tracker.seen(user.id)
         return user
 
 
@@ -33,10 +33,140 @@ class Settings(BaseModel):
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # API keys for service-to-service calls (secrets are stored as HMAC-SHA256 keyed with API_KEY_HASH_SECRET)
+    API_KEY_PREFIX: str = os.getenv("API_KEY_PREFIX", "fsk")
+    API_KEY_HASH_SECRET: str = os.getenv("API_KEY_HASH_SECRET", os.getenv("JWT_SECRET_KEY", "supersecretkey"))
+    API_KEY_REFRESH_SECONDS: float = float(os.getenv("API_KEY_REFRESH_SECONDS", "2"))
+    
     # Auth bypass for testing
     AUTH_BYPASS_ENABLED: bool = Field(default=True, description="Enable auth bypass for testing")
     # AUTH_BYPASS_SECRET removed - use generate_dev_token.py instead
     
+    # Production server settings (SERVER_WORKERS=0 means one worker per available CPU)
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "0"))
+    SERVER_BACKLOG: int = int(os.getenv("SERVER_BACKLOG", "2048"))
+    SERVER_KEEPALIVE_SECONDS: int = int(os.getenv("SERVER_KEEPALIVE_SECONDS", "75"))
+    SERVER_PRELOAD: bool = os.getenv("SERVER_PRELOAD", "true").lower() == "true"
+    SERVER_MAX_REQUESTS: int = int(os.getenv("SERVER_MAX_REQUESTS", "10000"))
+    SERVER_MAX_REQUESTS_JITTER: int = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "1000"))
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+    # Part of the graceful timeout kept for flushing buffered writes after the drain
+    SERVER_SHUTDOWN_FLUSH_SECONDS: int = int(os.getenv("SERVER_SHUTDOWN_FLUSH_SECONDS", "5"))
+    
+    # Number of database pool connections opened during startup warmup
+    DB_WARMUP_CONNECTIONS: int = int(os.getenv("DB_WARMUP_CONNECTIONS", "4"))
+    
+    # Batching of concurrent user lookups (0 ms = one event loop tick)
+    USER_LOADER_WINDOW_MS: float = float(os.getenv("USER_LOADER_WINDOW_MS", "0"))
+    USER_LOADER_MAX_BATCH_SIZE: int = int(os.getenv("USER_LOADER_MAX_BATCH_SIZE", "100"))
+    
+    # Health probe settings
+    HEALTH_LIVENESS_PATH: str = "/health/live"
+    HEALTH_READINESS_PATH: str = "/health/ready"
+    HEALTH_REFRESH_SECONDS: float = float(os.getenv("HEALTH_REFRESH_SECONDS", "5"))
+    HEALTH_PING_TIMEOUT_SECONDS: float = float(os.getenv("HEALTH_PING_TIMEOUT_SECONDS", "2"))
+    
+    # Server-Timing and on-demand profiling (profiling is off while PROFILING_SECRET is empty)
+    SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+    PROFILING_SECRET: str = os.getenv("PROFILING_SECRET", "")
+    PROFILING_MAX_PER_MINUTE: int = int(os.getenv("PROFILING_MAX_PER_MINUTE", "6"))
+    PROFILING_INTERVAL_SECONDS: float = float(os.getenv("PROFILING_INTERVAL_SECONDS", "0.001"))
+    PROFILING_OUTPUT_DIR: str = os.getenv("PROFILING_OUTPUT_DIR", "profiles")
+    
+    # Batch endpoint settings
+    BATCH_MAX_REQUESTS: int = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+    
+    # Token introspection (results are cached until the token's exp, capped at the max)
+    INTROSPECTION_MAX_TOKENS: int = int(os.getenv("INTROSPECTION_MAX_TOKENS", "100"))
+    INTROSPECTION_CACHE_MAX_SECONDS: float = float(os.getenv("INTROSPECTION_CACHE_MAX_SECONDS", "300"))
+    INTROSPECTION_CACHE_MAX_ENTRIES: int = int(os.getenv("INTROSPECTION_CACHE_MAX_ENTRIES", "100000"))
+    
+    # Service cache settings ("memory" for an in-process LRU, "mongo" to share across workers).
+    # Users are cached per worker; other workers see a deactivation after CACHE_USER_TTL_SECONDS
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_USER_TTL_SECONDS: int = int(os.getenv("CACHE_USER_TTL_SECONDS", "30"))
+    CACHE_USER_NEGATIVE_TTL_SECONDS: int = int(os.getenv("CACHE_USER_NEGATIVE_TTL_SECONDS", "5"))
+    
+    # Streaming (WebSocket / SSE) settings
+    STREAM_QUEUE_SIZE: int = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+    STREAM_TOKEN_RECHECK_SECONDS: int = int(os.getenv("STREAM_TOKEN_RECHECK_SECONDS", "30"))
+    STREAM_KEEPALIVE_SECONDS: int = int(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+    
+    # Background job queue (JOB_WORKERS in-app workers per process; 0 to run them with `manage.py worker`,
+    # the default under the production server when it isn't set)
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = int(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "60"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BASE_SECONDS: float = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+    JOB_RETRY_MAX_SECONDS: float = float(os.getenv("JOB_RETRY_MAX_SECONDS", "300"))
+    JOB_RETENTION_SECONDS: int = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+    
+    # Outgoing email ("log" sends nothing, "smtp" delivers through SMTP_HOST,
+    # "package.module:ClassName" uses a custom EmailSender)
+    EMAIL_BACKEND: str = os.getenv("EMAIL_BACKEND", "log")
+    EMAIL_FROM: str = os.getenv("EMAIL_FROM", "noreply@example.com")
+    # Link sent in verification emails, "{token}" is replaced by the token
+    EMAIL_VERIFICATION_URL: str = os.getenv("EMAIL_VERIFICATION_URL", "http://localhost:8000/verify?token={token}")
+    SMTP_HOST: str = os.getenv("SMTP_HOST", "localhost")
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
+    SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
+    SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
+    SMTP_USE_TLS: bool = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+    
+    # Write-behind user activity tracking (last_seen_at / last_login_at)
+    ACTIVITY_FLUSH_SECONDS: float = float(os.getenv("ACTIVITY_FLUSH_SECONDS", "10"))
+    ACTIVITY_MAX_PENDING: int = int(os.getenv("ACTIVITY_MAX_PENDING", "50000"))
+    
+    # Authentication audit log
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    AUDIT_FLUSH_SECONDS: float = float(os.getenv("AUDIT_FLUSH_SECONDS", "1"))
+    AUDIT_MAX_QUEUE: int = int(os.getenv("AUDIT_MAX_QUEUE", "10000"))
+    AUDIT_RETENTION_DAYS: int = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))
+    AUDIT_QUERY_MAX_LIMIT: int = int(os.getenv("AUDIT_QUERY_MAX_LIMIT", "100000"))
+    
+    # Rate limiting ("memory" limits per worker, "mongo" shares the limits across workers)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    RATE_LIMIT_LOGIN_PER_IP_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_LOGIN_PER_IP_PER_MINUTE", "20"))
+    RATE_LIMIT_LOGIN_PER_USERNAME_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_LOGIN_PER_USERNAME_PER_MINUTE", "5"))
+    RATE_LIMIT_API_PER_IP_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_API_PER_IP_PER_MINUTE", "1200"))
+    RATE_LIMIT_API_PER_USER_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_API_PER_USER_PER_MINUTE", "600"))
+    RATE_LIMIT_API_PER_KEY_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_API_PER_KEY_PER_MINUTE", "600000"))
+    
+    # Adaptive concurrency limit per worker; requests over it get 503 at once
+    LOAD_SHED_ENABLED: bool = os.getenv("LOAD_SHED_ENABLED", "true").lower() == "true"
+    LOAD_SHED_INITIAL_LIMIT: int = int(os.getenv("LOAD_SHED_INITIAL_LIMIT", "100"))
+    LOAD_SHED_MIN_LIMIT: int = int(os.getenv("LOAD_SHED_MIN_LIMIT", "4"))
+    LOAD_SHED_MAX_LIMIT: int = int(os.getenv("LOAD_SHED_MAX_LIMIT", "500"))
+    LOAD_SHED_TARGET_LATENCY_MS: float = float(os.getenv("LOAD_SHED_TARGET_LATENCY_MS", "250"))
+    LOAD_SHED_SLOW_RATIO: float = float(os.getenv("LOAD_SHED_SLOW_RATIO", "0.1"))
+    LOAD_SHED_BACKOFF: float = float(os.getenv("LOAD_SHED_BACKOFF", "0.9"))
+    LOAD_SHED_INCREASE: int = int(os.getenv("LOAD_SHED_INCREASE", "2"))
+    LOAD_SHED_WINDOW_SECONDS: float = float(os.getenv("LOAD_SHED_WINDOW_SECONDS", "1"))
+    LOAD_SHED_CRITICAL_HEADROOM: float = float(os.getenv("LOAD_SHED_CRITICAL_HEADROOM", "0.25"))
+    LOAD_SHED_LOW_PRIORITY_SHARE: float = float(os.getenv("LOAD_SHED_LOW_PRIORITY_SHARE", "0.5"))
+    LOAD_SHED_RETRY_AFTER_SECONDS: int = int(os.getenv("LOAD_SHED_RETRY_AFTER_SECONDS", "1"))
+    
+    # Request deadlines (clients may ask for less with X-Request-Timeout: <seconds>)
+    REQUEST_DEADLINES_ENABLED: bool = os.getenv("REQUEST_DEADLINES_ENABLED", "true").lower() == "true"
+    REQUEST_TIMEOUT_SECONDS: float = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "10"))
+    REQUEST_TIMEOUT_MAX_SECONDS: float = float(os.getenv("REQUEST_TIMEOUT_MAX_SECONDS", "30"))
+    
+    # While the database circuit breaker is open: "read_only" lets GET/HEAD/OPTIONS
+    # requests use a recently verified user snapshot, "off" rejects them with 503
+    AUTH_STALE_PRINCIPAL_POLICY: str = os.getenv("AUTH_STALE_PRINCIPAL_POLICY", "read_only")
+    AUTH_STALE_PRINCIPAL_MAX_AGE_SECONDS: float = float(os.getenv("AUTH_STALE_PRINCIPAL_MAX_AGE_SECONDS", "300"))
+    AUTH_PRINCIPAL_SNAPSHOT_MAX: int = int(os.getenv("AUTH_PRINCIPAL_SNAPSHOT_MAX", "10000"))
+    
+    # Requests to <tenant>.<TENANT_BASE_DOMAIN> are routed to that tenant's database
+    # (tenant databases are configured with the MONGODB_TENANT* variables)
+    TENANT_BASE_DOMAIN: str = os.getenv("TENANT_BASE_DOMAIN", "").lower()
+    
     @property
     def is_production(self) -> bool:
         return self.ENVIRONMENT.lower() == "production"
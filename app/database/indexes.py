@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Index management
+
+Workers start with Beanie's index sync skipped. Declared indexes are compared
+with the live collections and built one at a time by `python manage.py indexes`,
+typically as a deploy step, instead of by every worker at boot.
+"""
+from typing import Any, Dict, List, Sequence, Tuple, Type
+
+from beanie import Document
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app.config import settings
+
+# Options that change how an index behaves; others (e.g. "v", "ns") are ignored
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression", "collation")
+
+# Indexes of collections that are not Beanie documents, keyed by collection name
+COLLECTION_INDEXES: Dict[str, List[IndexModel]] = {
+    "cache_entries": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "audit_log": [
+        IndexModel(
+            [("ts", ASCENDING)],
+            name="ts_ttl",
+            expireAfterSeconds=settings.AUDIT_RETENTION_DAYS * 24 * 3600,
+        ),
+        IndexModel([("username", ASCENDING), ("ts", DESCENDING)], name="username_ts"),
+        IndexModel([("user_id", ASCENDING), ("ts", DESCENDING)], name="user_id_ts"),
+        IndexModel([("event", ASCENDING), ("ts", DESCENDING)], name="event_ts"),
+        IndexModel([("tenant", ASCENDING), ("ts", DESCENDING)], name="tenant_ts"),
+    ],
+}
+
+
+def _index_model(spec: Any) -> IndexModel:
+    """Convert a Beanie `Settings.indexes` entry into an IndexModel"""
+    if isinstance(spec, IndexModel):
+        return spec
+    if isinstance(spec, str):
+        return IndexModel([(spec, ASCENDING)])
+    return IndexModel(list(spec))
+
+
+def declared_indexes(model: Type[Document]) -> List[IndexModel]:
+    """Indexes declared in a document model's Settings"""
+    settings = getattr(model, "Settings", None)
+    return [_index_model(spec) for spec in getattr(settings, "indexes", [])]
+
+
+def _signature(key: Sequence[Tuple[str, Any]], options: Dict[str, Any]) -> Tuple:
+    return (
+        tuple((field, direction) for field, direction in key),
+        tuple(sorted((k, repr(v)) for k, v in options.items() if k in _COMPARED_OPTIONS)),
+    )
+
+
+async def diff_indexes(collection, declared: List[IndexModel]) -> Dict[str, List[Any]]:
+    """
+    Compare declared indexes with the live collection
+
+    Args:
+        collection: Motor collection
+        declared: Indexes the collection should have
+
+    Returns:
+        Dict with "missing" (IndexModel), "changed" (IndexModel whose keys exist
+        with different options) and "extra" (names of undeclared live indexes)
+    """
+    live = await collection.index_information()
+    live_by_key = {
+        tuple((field, direction) for field, direction in info["key"]): (name, info)
+        for name, info in live.items()
+        if name != "_id_"
+    }
+
+    missing, changed, matched = [], [], set()
+    for index in declared:
+        document = index.document
+        key = tuple(document["key"].items())
+        found = live_by_key.get(key)
+        if found is None:
+            missing.append(index)
+            continue
+        name, info = found
+        matched.add(name)
+        if _signature(key, document) != _signature(key, info):
+            changed.append(index)
+
+    extra = [name for name, _ in live_by_key.values() if name not in matched]
+    return {"missing": missing, "changed": changed, "extra": extra}
+
+
+async def sync_indexes(
+    collection,
+    declared: List[IndexModel],
+    apply: bool = False,
+    rebuild_changed: bool = False,
+    drop_extra: bool = False,
+) -> Dict[str, List[Any]]:
+    """
+    Diff and optionally build the indexes of one collection
+
+    Missing indexes are built one at a time so only a single build runs
+    against the primary at once.
+
+    Args:
+        collection: Motor collection
+        declared: Indexes the collection should have
+        apply: Build missing indexes (otherwise only report)
+        rebuild_changed: Drop and rebuild indexes whose options changed
+        drop_extra: Drop live indexes that are no longer declared
+
+    Returns:
+        The diff computed before any change was made
+    """
+    diff = await diff_indexes(collection, declared)
+    if not apply:
+        return diff
+
+    for index in diff["missing"]:
+        print(f"  building {collection.name}.{index.document['name']}...")
+        # "background" is ignored by MongoDB >= 4.2, which never blocks the collection
+        index.document.setdefault("background", True)
+        await collection.create_indexes([index])
+
+    if rebuild_changed:
+        live = await collection.index_information()
+        for index in diff["changed"]:
+            key = list(index.document["key"].items())
+            for name, info in live.items():
+                if list(info["key"]) == key:
+                    print(f"  rebuilding {collection.name}.{name}...")
+                    await collection.drop_index(name)
+            await collection.create_indexes([index])
+
+    if drop_extra:
+        for name in diff["extra"]:
+            print(f"  dropping {collection.name}.{name}...")
+            await collection.drop_index(name)
+
+    return diff
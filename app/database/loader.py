@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+DataLoader-style batching of concurrent lookups into single queries
+"""
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.config import settings
+from app.database.mongodb import breaker_guard
+from app.database.tenancy import current_tenant, tenant_scope
+from app.middleware.deadline import current_deadline, deadline_scope
+from app.models.user import User
+from app.monitoring.metrics import stats_collector
+
+
+class BatchLoader:
+    """
+    Collect lookups issued within one event loop tick (or a short window)
+    and resolve them with a single batched query
+
+    Concurrent lookups of the same key are deduplicated and share the result.
+    A batch runs under the latest deadline of the requests waiting for it, so
+    one caller's short deadline doesn't fail the others.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        window: float = 0.0,
+        max_batch_size: int = 100,
+        copy: Optional[Callable[[Any], Any]] = None,
+    ):
+        """
+        Args:
+            batch_fn: Coroutine resolving a list of keys to a dict of results;
+                an exception as a result fails only the lookups of that key
+            window: Seconds to wait for more keys; 0 dispatches on the next loop tick
+            max_batch_size: Dispatch immediately once this many keys are pending
+            copy: Applied to a shared result for every deduplicated caller so
+                callers don't mutate each other's objects
+        """
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.copy = copy
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._handle: Optional[asyncio.Handle] = None
+        self._pending_deadline = float("-inf")
+        self.batches = 0
+        self.keys_loaded = 0
+        self.deduplicated = 0
+
+    async def load(self, key: Hashable) -> Any:
+        """
+        Load a single key, batched with the other lookups of this tick
+
+        Args:
+            key: The key to look up
+
+        Returns:
+            The result for the key, or None if nothing was found
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # State belongs to a single event loop
+            self._loop = loop
+            self._pending = {}
+            self._handle = None
+            self._pending_deadline = float("-inf")
+
+        deadline = current_deadline()
+        self._pending_deadline = max(self._pending_deadline, float("inf") if deadline is None else deadline)
+
+        future = self._pending.get(key)
+        if future is not None:
+            self.deduplicated += 1
+            result = await asyncio.shield(future)
+            return self.copy(result) if self.copy is not None and result is not None else result
+
+        future = loop.create_future()
+        self._pending[key] = future
+
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._handle is None:
+            if self.window > 0:
+                self._handle = loop.call_later(self.window, self._dispatch)
+            else:
+                self._handle = loop.call_soon(self._dispatch)
+
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        """Send the pending keys as one batch"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        deadline, self._pending_deadline = self._pending_deadline, float("-inf")
+        if batch:
+            # A fresh context, so the batch doesn't inherit the deadline of whichever request scheduled it
+            contextvars.Context().run(
+                self._loop.create_task,
+                self._run(batch, None if deadline == float("inf") else deadline),
+            )
+
+    async def _run(self, batch: Dict[Hashable, asyncio.Future], deadline: Optional[float] = None) -> None:
+        self.batches += 1
+        self.keys_loaded += len(batch)
+        try:
+            with deadline_scope(deadline):
+                results = await self.batch_fn(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Mark as retrieved in case every caller was cancelled
+                    future.exception()
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                result = results.get(key)
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                    future.exception()
+                else:
+                    future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "keys_loaded": self.keys_loaded,
+            "deduplicated": self.deduplicated,
+            "avg_batch_size": round(self.keys_loaded / self.batches, 2) if self.batches else 0,
+        }
+
+
+async def _load_users_by_username(keys: List[Tuple[Optional[str], str]]) -> Dict[Tuple[Optional[str], str], Any]:
+    """Resolve many (tenant, username) keys with one $in query per tenant"""
+    usernames_by_tenant: Dict[Optional[str], List[str]] = {}
+    for tenant, username in keys:
+        usernames_by_tenant.setdefault(tenant, []).append(username)
+
+    results: Dict[Tuple[Optional[str], str], Any] = {}
+    for tenant, usernames in usernames_by_tenant.items():
+        try:
+            with tenant_scope(tenant), breaker_guard():
+                users = await User.find_trusted({"username": {"$in": usernames}})
+        except Exception as e:
+            # One tenant's outage only fails its own lookups
+            results.update(((tenant, username), e) for username in usernames)
+            continue
+        results.update(((tenant, user.username), user) for user in users)
+    return results
+
+
+# Global loader batching the principal lookups of the auth path
+user_loader = BatchLoader(
+    _load_users_by_username,
+    window=settings.USER_LOADER_WINDOW_MS / 1000,
+    max_batch_size=settings.USER_LOADER_MAX_BATCH_SIZE,
+    copy=lambda user: user.model_copy(deep=True),
+)
+stats_collector.register(
+    "app_user_loader", user_loader.stats,
+    counters=("batches", "keys_loaded", "deduplicated")
+)
+
+
+async def load_user(username: str) -> Optional[User]:
+    """Load a user of the current tenant by username, batched with concurrent lookups"""
+    return await user_loader.load((current_tenant(), username))
@@ -1,12 +1,25 @@
+import contextlib
+import functools
 import os
 import pathlib
-from typing import List, Type
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Type
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from pydantic import BaseModel
+from pymongo import monitoring
+from pymongo.errors import (
+    ConnectionFailure, ExecutionTimeout, OperationFailure, PyMongoError, ServerSelectionTimeoutError
+)
 from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
 
+from app.database.query_audit import query_auditor
+from app.monitoring.metrics import command_metrics, stats_collector
+
 # Get the app directory path
 app_dir = pathlib.Path(__file__).parent.parent
 
@@ -17,14 +30,334 @@ load_dotenv(dotenv_path=os.path.join(app_dir, '.env'))
 MONGODB_URI = os.getenv("MONGODB_URI")
 DATABASE_NAME = os.getenv("MONGODB_DATABASE")
 
+# Index builds are run by `python manage.py indexes`, not at every worker boot
+SYNC_INDEXES_ON_STARTUP = os.getenv("MONGODB_SYNC_INDEXES", "false").lower() == "true"
+
+# Record query shapes for the query-plan audit (tests only)
+QUERY_AUDIT_ENABLED = os.getenv("MONGODB_QUERY_AUDIT", "false").lower() == "true"
+
+# Circuit breaker: opens when at least BREAKER_FAILURE_RATE of the (at least
+# BREAKER_MIN_CALLS) commands of the last BREAKER_WINDOW_SECONDS failed
+BREAKER_ENABLED = os.getenv("MONGODB_BREAKER_ENABLED", "true").lower() == "true"
+BREAKER_WINDOW_SECONDS = int(os.getenv("MONGODB_BREAKER_WINDOW_SECONDS", "10"))
+BREAKER_MIN_CALLS = int(os.getenv("MONGODB_BREAKER_MIN_CALLS", "20"))
+BREAKER_FAILURE_RATE = float(os.getenv("MONGODB_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("MONGODB_BREAKER_OPEN_SECONDS", "5"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("MONGODB_BREAKER_HALF_OPEN_PROBES", "1"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("MONGODB_BREAKER_SLOW_CALL_SECONDS", "1"))
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks connection pool usage so health checks can report saturation"""
+    
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self.check_out_failures = 0
+    
+    def connection_created(self, event):
+        self.open_connections += 1
+    
+    def connection_closed(self, event):
+        self.open_connections -= 1
+    
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+    
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+    
+    def connection_check_out_failed(self, event):
+        self.check_out_failures += 1
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_check_out_started(self, event):
+        pass
+
+
+pool_monitor = PoolMonitor()
+stats_collector.register(
+    "mongodb_pool", lambda: {
+        "open_connections": pool_monitor.open_connections,
+        "checked_out_connections": pool_monitor.checked_out,
+        "check_out_failures": pool_monitor.check_out_failures,
+    },
+    counters=("check_out_failures",)
+)
+
+
+class CircuitOpenError(PyMongoError):
+    """Raised instead of calling the database while the circuit breaker is open"""
+    
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Database circuit breaker is open, retry in {retry_after:.1f}s")
+
+
+# Server error codes meaning the deployment can't serve the command right now
+_UNAVAILABLE_CODES = {6, 7, 89, 91, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+_TIMEOUT_ERRORS = {"NetworkTimeout", "ExecutionTimeout", "WTimeoutError"}
+
+
+def _trial_failed(error: BaseException) -> Optional[bool]:
+    """Whether a trial call's error means the database is still unavailable, None if it can't tell"""
+    if isinstance(error, ConnectionFailure):
+        return True
+    if isinstance(error, (ExecutionTimeout, CircuitOpenError)) or not isinstance(error, PyMongoError):
+        return None
+    # Errors the server answered with (duplicate keys, validation) mean it is up
+    return isinstance(error, OperationFailure) and error.code in _UNAVAILABLE_CODES
+
+
+class CircuitBreaker(monitoring.CommandListener):
+    """
+    Failure-rate circuit breaker in front of the database
+    
+    Every command's outcome is observed as a command listener, so all Motor
+    and Beanie traffic (background tasks included) feeds the failure rate of
+    a sliding window of one-second buckets. Only failures meaning the
+    database is unavailable count: network errors, "not primary" style
+    errors, and timeouts of calls that were actually slow, so a client
+    sending a tiny request deadline can't open the breaker.
+    
+    While open, `guard()`ed calls fail at once with CircuitOpenError. After
+    `open_seconds` the breaker lets `half_open_probes` guarded calls through
+    and the first of them to finish closes or reopens it. Other commands
+    (health pings, background flushes) don't count while half open.
+    """
+    
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    
+    def __init__(self, window: int, min_calls: int, failure_rate: float, open_seconds: float,
+                 half_open_probes: int, slow_call_seconds: float, enabled: bool = True):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.slow_call_seconds = slow_call_seconds
+        self.enabled = enabled
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        # [second, calls, failures] buckets; listeners run on Motor's executor threads
+        self._buckets: Deque[List[int]] = deque()
+        self._lock = threading.Lock()
+        
+        self.opened = 0
+        self.rejected = 0
+    
+    def _record(self, failed: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self.state != self.CLOSED:
+                # Open: outcomes of calls started before the breaker opened.
+                # Half open: only the trial calls decide, see `guard()`
+                return
+            
+            second = int(now)
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0])
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += failed
+            while self._buckets[0][0] <= second - self.window:
+                self._buckets.popleft()
+            
+            if failed:
+                calls = sum(bucket[1] for bucket in self._buckets)
+                failures = sum(bucket[2] for bucket in self._buckets)
+                if calls >= self.min_calls and failures >= calls * self.failure_rate:
+                    self._open(now)
+    
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self._opened_at = now
+        self._probes = 0
+        self._buckets.clear()
+        self.opened += 1
+        print(f"Database circuit breaker opened for {self.open_seconds}s")
+    
+    def _finish_trial(self, failed: Optional[bool]) -> None:
+        """Close or reopen the half-open breaker; None hands the trial slot back"""
+        with self._lock:
+            if self.state != self.HALF_OPEN:
+                return
+            if failed is None:
+                self._probes = max(0, self._probes - 1)
+            elif failed:
+                self._open(time.monotonic())
+            else:
+                self.state = self.CLOSED
+                self._buckets.clear()
+                print("Database circuit breaker closed")
+    
+    def record_success(self) -> None:
+        self._record(False)
+    
+    def record_failure(self) -> None:
+        self._record(True)
+    
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe through"""
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+    
+    def allow(self) -> bool:
+        """Whether a guarded call may go to the database now"""
+        if not self.enabled or self.state == self.CLOSED:
+            return True
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.retry_after() > 0:
+                    return False
+                self.state = self.HALF_OPEN
+                self._opened_at = time.monotonic()
+                self._probes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    if self.retry_after() > 0:
+                        return False
+                    # The probes never reported back (e.g. they were cancelled); try again
+                    self._opened_at = time.monotonic()
+                    self._probes = 0
+                self._probes += 1
+            return True
+    
+    @contextlib.contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Run a block of database calls unless the breaker is open
+        
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        if not self.allow():
+            self.rejected += 1
+            raise CircuitOpenError(self.retry_after())
+        # Admitted while half open: this call is a trial
+        trial = self.state == self.HALF_OPEN
+        try:
+            yield
+        except ServerSelectionTimeoutError:
+            if trial:
+                self._finish_trial(True)
+            else:
+                # No command was sent, so the listener never saw this failure
+                self.record_failure()
+            raise
+        except BaseException as e:
+            if trial:
+                self._finish_trial(_trial_failed(e))
+            raise
+        else:
+            if trial:
+                self._finish_trial(False)
+    
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        self.record_success()
+    
+    def failed(self, event):
+        failure = event.failure or {}
+        if failure.get("errtype") in _TIMEOUT_ERRORS or failure.get("code") in (50, 262):
+            unavailable = event.duration_micros >= self.slow_call_seconds * 1e6
+        else:
+            unavailable = "errtype" in failure or failure.get("code") in _UNAVAILABLE_CODES
+        # Errors the server answered with (duplicate keys, validation) mean it is up
+        self._record(unavailable)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Report the breaker state and counters"""
+        calls = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        return {
+            "open": int(self.state == self.OPEN),
+            "half_open": int(self.state == self.HALF_OPEN),
+            "window_calls": calls,
+            "window_failure_rate": round(failures / calls, 4) if calls else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+db_breaker = CircuitBreaker(
+    window=BREAKER_WINDOW_SECONDS,
+    min_calls=BREAKER_MIN_CALLS,
+    failure_rate=BREAKER_FAILURE_RATE,
+    open_seconds=BREAKER_OPEN_SECONDS,
+    half_open_probes=BREAKER_HALF_OPEN_PROBES,
+    slow_call_seconds=BREAKER_SLOW_CALL_SECONDS,
+    enabled=BREAKER_ENABLED,
+)
+stats_collector.register(
+    "mongodb_breaker", db_breaker.stats,
+    counters=("opened", "rejected")
+)
+
+# Breaker of the database the current context talks to (every tenant has its own)
+_active_breaker: ContextVar[CircuitBreaker] = ContextVar("active_breaker", default=db_breaker)
+
+
+def breaker_guard():
+    """`guard()` of the current context's circuit breaker"""
+    return _active_breaker.get().guard()
+
+
+def breaker_protected(fn: Callable) -> Callable:
+    """Decorator guarding an async function with the current context's circuit breaker"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        with _active_breaker.get().guard():
+            return await fn(*args, **kwargs)
+    return wrapper
+
+
+event_listeners = [pool_monitor, command_metrics, db_breaker]
+if QUERY_AUDIT_ENABLED:
+    event_listeners.append(query_auditor)
+
 # MongoDB client with server API version 1
-client = AsyncIOMotorClient(MONGODB_URI, server_api=ServerApi('1'))
+client = AsyncIOMotorClient(
+    MONGODB_URI,
+    server_api=ServerApi('1'),
+    event_listeners=event_listeners
+)
 db = client[DATABASE_NAME]
 
 
-async def init_db(document_models: List[Type[BaseModel]]) -> None:
-    """Initialize the database connection and register document models"""
+async def init_db(document_models: List[Type[BaseModel]], sync_indexes: Optional[bool] = None) -> None:
+    """
+    Initialize the database connection and register document models
+    
+    Args:
+        document_models: Beanie document models to register
+        sync_indexes: Check and create the declared indexes; defaults to the
+            MONGODB_SYNC_INDEXES environment variable (off)
+    """
+    if sync_indexes is None:
+        sync_indexes = SYNC_INDEXES_ON_STARTUP
+    
     try:
+        started = time.perf_counter()
+        
         # Test connection with a ping
         await client.admin.command('ping')
         print("Pinged your MongoDB Atlas deployment. Connection successful!")
@@ -32,11 +365,16 @@ async def init_db(document_models: List[Type[BaseModel]]) -> None:
         # Initialize Beanie with the document models
         await init_beanie(
             database=db,
-            document_models=document_models
+            document_models=document_models,
+            skip_indexes=not sync_indexes
         )
         print(f"Connected to MongoDB Atlas")
         print(f"Using database: {DATABASE_NAME}")
         print(f"Registered {len(document_models)} document models")
+        print(
+            f"Database initialized in {(time.perf_counter() - started) * 1000:.1f} ms "
+            f"(index sync {'on' if sync_indexes else 'skipped'})"
+        )
     except Exception as e:
         print(f"Failed to connect to MongoDB Atlas: {e}")
         raise
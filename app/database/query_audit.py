@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Query-plan auditor
+
+A pymongo command listener that records every distinct query shape the app
+issues, so a test run can `explain` each one and fail on collection scans or
+on queries that examine far more documents than they return. It is only
+registered when MONGODB_QUERY_AUDIT is enabled (see tests/test_query_plans.py).
+"""
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import monitoring
+
+# Commands that select documents with a filter, and where that filter lives
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+# Command fields added by the driver that explain doesn't accept
+_DRIVER_FIELDS = {
+    "lsid", "txnNumber", "autocommit", "startTransaction", "signature",
+    "apiVersion", "apiStrict", "apiDeprecationErrors",
+}
+
+
+def query_shape(value: Any) -> Any:
+    """Replace the literal values of a filter with "?" so similar queries share a shape"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if all(not isinstance(item, (dict, list, tuple)) for item in value):
+            # e.g. the values of an $in: their number doesn't change the plan
+            return ["?"]
+        return [query_shape(item) for item in value]
+    return "?"
+
+
+def _explainable(command: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Yield (filter, explainable command) pairs for the queries of a command"""
+    name = next(iter(command))
+    command = {k: v for k, v in command.items() if not k.startswith("$") and k not in _DRIVER_FIELDS}
+
+    if name in _FILTER_FIELDS:
+        yield command.get(_FILTER_FIELDS[name]) or {}, command
+    elif name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        first = pipeline[0] if pipeline else {}
+        yield first.get("$match", {}), command
+    elif name in ("update", "delete"):
+        # Explain accepts one statement at a time
+        statements = command.get("updates" if name == "update" else "deletes") or []
+        for statement in statements:
+            yield statement.get("q") or {}, {**command, ("updates" if name == "update" else "deletes"): [statement]}
+
+
+def _find_stages(plan: Any) -> Iterator[str]:
+    if isinstance(plan, dict):
+        stage = plan.get("stage")
+        if isinstance(stage, str):
+            yield stage
+        for value in plan.values():
+            yield from _find_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _find_stages(item)
+
+
+def _execution_stats(explain: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(explain, dict):
+        stats = explain.get("executionStats")
+        if isinstance(stats, dict) and "nReturned" in stats:
+            return stats
+        for value in explain.values():
+            found = _execution_stats(value)
+            if found is not None:
+                return found
+    elif isinstance(explain, list):
+        for item in explain:
+            found = _execution_stats(item)
+            if found is not None:
+                return found
+    return None
+
+
+class QueryPlanAuditor(monitoring.CommandListener):
+    """
+    Records distinct query shapes and audits their plans on demand
+
+    Recording happens in the command listener and never talks to the server;
+    `audit()` runs the explains afterwards.
+    """
+
+    def __init__(self, max_examined_ratio: float = 10.0):
+        self.max_examined_ratio = max_examined_ratio
+        # Shape key -> (database name, sample explainable command, filter shape)
+        self.shapes: Dict[str, Tuple[str, Dict[str, Any], Any]] = {}
+        self.counts: Dict[str, int] = {}
+        self.paused = False
+
+    def started(self, event):
+        if self.paused or event.database_name in ("admin", "config", "local"):
+            return
+        command_name = event.command_name
+        if command_name not in _FILTER_FIELDS and command_name not in ("aggregate", "update", "delete"):
+            return
+        collection = event.command.get(command_name)
+        if not isinstance(collection, str) or collection.startswith("system."):
+            return
+
+        for query, explainable in _explainable(dict(event.command)):
+            shape = query_shape(query)
+            key = json.dumps(
+                [event.database_name, collection, command_name, shape, explainable.get("sort")],
+                sort_keys=True,
+                default=str,
+            )
+            self.counts[key] = self.counts.get(key, 0) + 1
+            if key not in self.shapes:
+                self.shapes[key] = (event.database_name, explainable, shape)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self) -> None:
+        """Forget the recorded shapes"""
+        self.shapes.clear()
+        self.counts.clear()
+
+    async def audit(self, client) -> List[Dict[str, Any]]:
+        """
+        Explain every recorded query shape
+
+        Args:
+            client: Motor client to run the explains with
+
+        Returns:
+            One entry per shape with its plan stages, examined/returned counts
+            and the problems found (an empty "problems" list means it passed)
+        """
+        results = []
+        self.paused = True
+        try:
+            for key, (database_name, command, shape) in self.shapes.items():
+                explain = await client[database_name].command(
+                    {"explain": command, "verbosity": "executionStats"}
+                )
+                stages = list(dict.fromkeys(_find_stages(explain.get("queryPlanner", explain))))
+                stats = _execution_stats(explain) or {}
+                examined = stats.get("totalDocsExamined", 0)
+                returned = stats.get("nReturned", 0)
+
+                problems = []
+                if "COLLSCAN" in stages:
+                    problems.append("collection scan")
+                if examined > max(returned, 1) * self.max_examined_ratio:
+                    problems.append(
+                        f"examined {examined} documents to return {returned} "
+                        f"(ratio limit {self.max_examined_ratio:g})"
+                    )
+
+                command_name = next(iter(command))
+                results.append({
+                    "collection": command[command_name],
+                    "command": command_name,
+                    "shape": shape,
+                    "sort": command.get("sort"),
+                    "executions": self.counts[key],
+                    "stages": stages,
+                    "docs_examined": examined,
+                    "keys_examined": stats.get("totalKeysExamined", 0),
+                    "returned": returned,
+                    "problems": problems,
+                })
+        finally:
+            self.paused = False
+        return results
+
+
+def write_report(results: List[Dict[str, Any]], path: str) -> None:
+    """Write audit results as JSON"""
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+
+
+# Global auditor, registered on the client when MONGODB_QUERY_AUDIT is enabled
+query_auditor = QueryPlanAuditor()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Multi-tenant database routing
+
+Every tenant's users live in a database of its own, on the default cluster or
+on another one. Tenants are configured with MONGODB_TENANTS, a JSON object:
+
+    {"acme": {"database": "acme"},
+     "globex": {"uri": "mongodb+srv://...", "database": "globex", "max_pool_size": 50}}
+
+Tenants that aren't listed use MONGODB_TENANT_DATABASE_TEMPLATE (e.g.
+"tenant_{tenant}") on the default cluster when it is set, and are unknown
+otherwise.
+
+The tenant of the current request is kept in a contextvar. Models deriving
+from TenantDocument look their collection up in the current tenant's
+database on every call, so Beanie is initialized once at startup and nothing
+is rebound per request; without a tenant they use the default database.
+
+Each tenant gets its own Motor client, created on first use, with its own
+connection pool (capped at the tenant's `max_pool_size`, or
+MONGODB_TENANT_MAX_POOL_SIZE), pool monitor and circuit breaker, so a noisy
+or failing tenant can't exhaust the connections or open the breaker of the
+others. Clients of configured tenants stay open; of the template tenants, at
+most MONGODB_TENANT_MAX_CLIENTS clients are kept and the least recently used
+one is closed when another template tenant needs a client.
+
+A template tenant only exists once its database does (`python manage.py
+indexes --tenant <name> --apply` creates it), so requests naming random
+tenants are turned away without creating clients. The list of databases is
+refreshed at most every 30 seconds; the indexes of a template tenant's
+collections are checked in the background whenever its client is created.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Set
+
+from beanie import Document
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo.server_api import ServerApi
+
+from app.database import mongodb
+from app.database.indexes import declared_indexes, sync_indexes
+from app.database.mongodb import (
+    BREAKER_ENABLED,
+    BREAKER_FAILURE_RATE,
+    BREAKER_HALF_OPEN_PROBES,
+    BREAKER_MIN_CALLS,
+    BREAKER_OPEN_SECONDS,
+    BREAKER_SLOW_CALL_SECONDS,
+    BREAKER_WINDOW_SECONDS,
+    MONGODB_URI,
+    QUERY_AUDIT_ENABLED,
+    CircuitBreaker,
+    PoolMonitor,
+    _active_breaker,
+    db_breaker,
+)
+from app.database.query_audit import query_auditor
+from app.monitoring.metrics import command_metrics, stats_collector
+
+# Tenant name -> {"database", optional "uri" and "max_pool_size"}
+TENANTS: Dict[str, Dict[str, Any]] = json.loads(os.getenv("MONGODB_TENANTS", "{}"))
+TENANT_DATABASE_TEMPLATE = os.getenv("MONGODB_TENANT_DATABASE_TEMPLATE", "")
+TENANT_MAX_CLIENTS = int(os.getenv("MONGODB_TENANT_MAX_CLIENTS", "32"))
+TENANT_MAX_POOL_SIZE = int(os.getenv("MONGODB_TENANT_MAX_POOL_SIZE", "20"))
+
+# Evicted clients are closed after this long, so operations still using them can finish
+_CLOSE_DELAY_SECONDS = 60
+
+# How long the default cluster's database names are trusted when checking that a template tenant exists
+_DATABASE_LIST_TTL_SECONDS = 30
+
+_TENANT_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+# Tenant of the current context, None for the default database
+_current_tenant: ContextVar[Optional[str]] = ContextVar("current_tenant", default=None)
+
+
+class UnknownTenantError(LookupError):
+    """Raised for a tenant that is neither configured nor covered by the database template"""
+
+
+class TenantConnection:
+    """Motor client, pool monitor and circuit breaker of one tenant"""
+
+    def __init__(self, tenant: str, uri: Optional[str], database: str, max_pool_size: int):
+        self.tenant = tenant
+        self.pool_monitor = PoolMonitor()
+        self.breaker = CircuitBreaker(
+            window=BREAKER_WINDOW_SECONDS,
+            min_calls=BREAKER_MIN_CALLS,
+            failure_rate=BREAKER_FAILURE_RATE,
+            open_seconds=BREAKER_OPEN_SECONDS,
+            half_open_probes=BREAKER_HALF_OPEN_PROBES,
+            slow_call_seconds=BREAKER_SLOW_CALL_SECONDS,
+            enabled=BREAKER_ENABLED,
+        )
+        listeners = [self.pool_monitor, command_metrics, self.breaker]
+        if QUERY_AUDIT_ENABLED:
+            listeners.append(query_auditor)
+        self.client = AsyncIOMotorClient(
+            uri,
+            server_api=ServerApi('1'),
+            maxPoolSize=max_pool_size,
+            event_listeners=listeners,
+        )
+        self.database = self.client[database]
+        self.max_pool_size = max_pool_size
+        self._collections: Dict[str, AsyncIOMotorCollection] = {}
+
+    def collection(self, name: str) -> AsyncIOMotorCollection:
+        """A collection of the tenant's database"""
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = self.database[name]
+        return collection
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_pool_size": self.max_pool_size,
+            "open_connections": self.pool_monitor.open_connections,
+            "checked_out": self.pool_monitor.checked_out,
+            "check_out_failures": self.pool_monitor.check_out_failures,
+            "breaker_open": int(self.breaker.state == CircuitBreaker.OPEN),
+            "breaker_rejected": self.breaker.rejected,
+        }
+
+
+class TenantRegistry:
+    """
+    Lazily created tenant connections
+
+    Configured tenants keep their client once created. Template tenants are
+    evicted least recently used first, so traffic to them can never close a
+    configured tenant's client.
+
+    Args:
+        tenants: Configured tenants, by name
+        database_template: Database name template for tenants that aren't
+            configured ("{tenant}" is replaced), empty to reject them
+        default_uri: Cluster of tenants without their own `uri`
+        max_clients: Most template tenant clients kept open at once
+        max_pool_size: Connection pool size of tenants without their own
+    """
+
+    def __init__(self, tenants: Dict[str, Dict[str, Any]], database_template: str,
+                 default_uri: Optional[str], max_clients: int, max_pool_size: int):
+        self.tenants = tenants
+        self.database_template = database_template
+        self.default_uri = default_uri
+        self.max_clients = max_clients
+        self.max_pool_size = max_pool_size
+        self._configured: Dict[str, TenantConnection] = {}
+        self._connections: "OrderedDict[str, TenantConnection]" = OrderedDict()
+        self._database_names: Set[str] = set()
+        self._database_names_at = float("-inf")
+        self._database_names_lock = asyncio.Lock()
+        self._index_tasks: Set[asyncio.Task] = set()
+
+        self.created = 0
+        self.evicted = 0
+        self.rejected = 0
+
+    def is_known(self, tenant: str) -> bool:
+        """Whether a tenant is configured or its name fits the database template"""
+        return tenant in self.tenants or (
+            bool(self.database_template) and _TENANT_NAME.match(tenant) is not None
+        )
+
+    async def exists(self, tenant: str) -> bool:
+        """
+        Whether a tenant is configured or its template database exists
+
+        Unlike `is_known`, this never trusts a name alone, so it is the check
+        for tenants named by unauthenticated input such as the request host.
+        """
+        if tenant in self.tenants:
+            return True
+        if not self.is_known(tenant):
+            self.rejected += 1
+            return False
+        names = await self._template_database_names()
+        if self.database_template.format(tenant=tenant) in names:
+            return True
+        self.rejected += 1
+        return False
+
+    async def _template_database_names(self) -> Set[str]:
+        if time.monotonic() - self._database_names_at < _DATABASE_LIST_TTL_SECONDS:
+            return self._database_names
+        async with self._database_names_lock:
+            # Another request may have refreshed the list while this one waited
+            if time.monotonic() - self._database_names_at >= _DATABASE_LIST_TTL_SECONDS:
+                self._database_names = set(await mongodb.client.list_database_names())
+                self._database_names_at = time.monotonic()
+        return self._database_names
+
+    def connection(self, tenant: str, build_indexes: bool = True) -> TenantConnection:
+        """
+        The connection of a tenant, created on first use
+
+        Args:
+            tenant: Tenant name
+            build_indexes: Check the indexes of a template tenant's collections
+                in the background when its client is created
+
+        Raises:
+            UnknownTenantError: If the tenant isn't known
+        """
+        connection = self._configured.get(tenant)
+        if connection is not None:
+            return connection
+        connection = self._connections.get(tenant)
+        if connection is not None:
+            self._connections.move_to_end(tenant)
+            return connection
+
+        if not self.is_known(tenant):
+            raise UnknownTenantError(tenant)
+        config = self.tenants.get(tenant)
+        if config is not None:
+            connection = self._configured[tenant] = TenantConnection(
+                tenant,
+                uri=config.get("uri", self.default_uri),
+                database=config.get("database") or self.database_template.format(tenant=tenant),
+                max_pool_size=int(config.get("max_pool_size", self.max_pool_size)),
+            )
+            self.created += 1
+            return connection
+
+        connection = TenantConnection(
+            tenant,
+            uri=self.default_uri,
+            database=self.database_template.format(tenant=tenant),
+            max_pool_size=self.max_pool_size,
+        )
+        self._connections[tenant] = connection
+        self.created += 1
+        while len(self._connections) > self.max_clients:
+            _, evicted = self._connections.popitem(last=False)
+            self._close_later(evicted)
+            self.evicted += 1
+        if build_indexes:
+            self._build_indexes_later(connection)
+        return connection
+
+    def _close_later(self, connection: TenantConnection) -> None:
+        try:
+            asyncio.get_running_loop().call_later(_CLOSE_DELAY_SECONDS, connection.client.close)
+        except RuntimeError:
+            connection.client.close()
+
+    def _build_indexes_later(self, connection: TenantConnection) -> None:
+        try:
+            task = asyncio.get_running_loop().create_task(self._build_indexes(connection))
+        except RuntimeError:
+            return
+        self._index_tasks.add(task)
+        task.add_done_callback(self._index_tasks.discard)
+
+    async def _build_indexes(self, connection: TenantConnection) -> None:
+        """Create the missing indexes of a tenant's collections"""
+        try:
+            for model in TenantDocument.__subclasses__():
+                await sync_indexes(
+                    connection.collection(model.Settings.name), declared_indexes(model), apply=True
+                )
+        except Exception as e:
+            print(f"Index build for tenant {connection.tenant} failed: {e}")
+
+    def close_all(self) -> None:
+        """Close every tenant client"""
+        for task in self._index_tasks:
+            task.cancel()
+        for connection in (*self._configured.values(), *self._connections.values()):
+            connection.client.close()
+        self._configured.clear()
+        self._connections.clear()
+
+    def tenant_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Report pool usage and breaker state per open tenant client"""
+        return {
+            tenant: connection.stats()
+            for connections in (self._configured, self._connections)
+            for tenant, connection in connections.items()
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the number of tenant clients and their churn"""
+        return {
+            "clients": len(self._configured) + len(self._connections),
+            "template_clients": len(self._connections),
+            "max_clients": self.max_clients,
+            "created": self.created,
+            "evicted": self.evicted,
+            "rejected": self.rejected,
+        }
+
+
+# Global tenant registry
+tenant_registry = TenantRegistry(
+    tenants=TENANTS,
+    database_template=TENANT_DATABASE_TEMPLATE,
+    default_uri=MONGODB_URI,
+    max_clients=TENANT_MAX_CLIENTS,
+    max_pool_size=TENANT_MAX_POOL_SIZE,
+)
+stats_collector.register(
+    "mongodb_tenant", tenant_registry.tenant_stats, label="tenant",
+    counters=("check_out_failures", "breaker_rejected")
+)
+stats_collector.register(
+    "app_tenants", tenant_registry.stats,
+    counters=("created", "evicted", "rejected")
+)
+
+
+def current_tenant() -> Optional[str]:
+    """Tenant of the current context, None for the default database"""
+    return _current_tenant.get()
+
+
+def tenant_key(value: Any) -> str:
+    """Qualify a cache or rate limit key with the current tenant"""
+    tenant = _current_tenant.get()
+    return str(value) if tenant is None else f"{tenant}:{value}"
+
+
+def _activate(tenant: Optional[str]):
+    breaker = db_breaker if tenant is None else tenant_registry.connection(tenant).breaker
+    return _current_tenant.set(tenant), _active_breaker.set(breaker)
+
+
+@contextlib.contextmanager
+def tenant_scope(tenant: Optional[str]) -> Iterator[None]:
+    """
+    Run a block against a tenant's database (None for the default database)
+
+    Raises:
+        UnknownTenantError: If the tenant isn't known
+    """
+    tenant_token, breaker_token = _activate(tenant)
+    try:
+        yield
+    finally:
+        _active_breaker.reset(breaker_token)
+        _current_tenant.reset(tenant_token)
+
+
+def bind_tenant(tenant: Optional[str]) -> bool:
+    """
+    Route the rest of the current request to the tenant of its credentials
+
+    The tenant stays set for the remainder of the request's context. If the
+    request's host already selected a tenant, the credentials must belong to
+    it.
+
+    Args:
+        tenant: Tenant the credentials were issued for, None for the default database
+
+    Returns:
+        False if the credentials belong to another tenant or the tenant is unknown
+    """
+    bound = _current_tenant.get()
+    if bound is not None or tenant is None:
+        return bound == tenant
+    try:
+        _activate(tenant)
+    except UnknownTenantError:
+        return False
+    return True
+
+
+class TenantDocument(Document):
+    """Beanie document stored in the current tenant's database"""
+
+    @classmethod
+    def get_motor_collection(cls) -> AsyncIOMotorCollection:
+        tenant = _current_tenant.get()
+        if tenant is None:
+            return super().get_motor_collection()
+        return tenant_registry.connection(tenant).collection(cls.get_settings().name)
@@ -1,29 +1,14 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any, Optional
+#!/usr/bin/env python3
+"""
+Application entry point
 
-from app.api.routes import router as api_router
-from app.config import settings
+`app.main:app` is the same application object as `app.application:app`.
+Run this module to start the production server:
 
-app = FastAPI(title="FastAPI Starter Template")
-
-# Configure CORS to allow requests from the frontend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include our API router
-app.include_router(api_router, prefix=settings.API_PREFIX)
-
-@app.get("/health")
-async def health_check():
-    """Health check endpoint to verify the API is running"""
-    return {"status": "healthy", "message": "API is running"}
+    python -m app.main
+"""
+from app.application import app
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    from app.server import main
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Adaptive concurrency limiting and load shedding
+
+Every worker admits at most `limit` concurrent HTTP requests and answers the
+rest at once with 503 and Retry-After instead of queueing them, so a slow
+database degrades throughput instead of letting latency grow until the
+worker is killed.
+
+The limit adapts to observed latency (AIMD): at the end of every window, if
+too many requests were slower than LOAD_SHED_TARGET_LATENCY_MS the limit is
+multiplied by LOAD_SHED_BACKOFF; if they were fast and the limit was reached,
+it grows by LOAD_SHED_INCREASE.
+
+Requests are classified by path. Critical requests (login, gateway token
+introspection, metrics scrapes) may use headroom above the limit, normal
+ones the limit, and low-priority ones (batch calls, audit queries) only part
+of it, so they are shed first.
+Health probes are answered by the outermost middleware and never reach the
+limiter; long-lived event streams are exempt.
+"""
+import time
+from typing import Any, Dict, List, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.monitoring.metrics import stats_collector
+
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+EXEMPT = "exempt"
+
+# Share of the limit each priority may use
+_PRIORITY_SHARES = {
+    CRITICAL: 1.0 + settings.LOAD_SHED_CRITICAL_HEADROOM,
+    NORMAL: 1.0,
+    LOW: settings.LOAD_SHED_LOW_PRIORITY_SHARE,
+}
+
+# Path prefixes and their priorities, first match wins
+PRIORITY_PREFIXES: List[Tuple[str, str]] = [
+    (f"{settings.API_PREFIX}/auth/token", CRITICAL),
+    (f"{settings.API_PREFIX}/auth/introspect", CRITICAL),
+    ("/metrics", CRITICAL),
+    (f"{settings.API_PREFIX}/stream", EXEMPT),
+    (f"{settings.API_PREFIX}/batch", LOW),
+    (f"{settings.API_PREFIX}/audit", LOW),
+]
+
+
+def request_priority(path: str) -> str:
+    """Priority class of a request path"""
+    for prefix, priority in PRIORITY_PREFIXES:
+        if path.startswith(prefix):
+            return priority
+    return NORMAL
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit driven by request latency
+
+    Args:
+        initial_limit: Limit to start with
+        min_limit: The limit never drops below this
+        max_limit: The limit never grows above this
+        target_latency: Seconds above which a request counts as slow
+        slow_ratio: Share of slow requests in a window that shrinks the limit
+        backoff: Factor applied to the limit when it shrinks
+        increase: Requests added to the limit when it grows
+        window: Seconds between limit adjustments
+    """
+
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int, target_latency: float,
+                 slow_ratio: float, backoff: float, increase: int, window: float):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = max(min_limit, min(initial_limit, max_limit))
+        self.target_latency = target_latency
+        self.slow_ratio = slow_ratio
+        self.backoff = backoff
+        self.increase = increase
+        self.window = window
+        self.in_flight = 0
+
+        self._window_started = time.monotonic()
+        self._samples = 0
+        self._slow = 0
+        self._saturated = False
+
+        self.admitted: Dict[str, int] = {CRITICAL: 0, NORMAL: 0, LOW: 0}
+        self.shed: Dict[str, int] = {CRITICAL: 0, NORMAL: 0, LOW: 0}
+        self.increases = 0
+        self.decreases = 0
+
+    def try_acquire(self, priority: str) -> bool:
+        """
+        Admit a request if its priority still has room under the limit
+
+        Returns:
+            True if admitted (call `release` when it finishes), False to shed it
+        """
+        if self.in_flight >= self.limit * _PRIORITY_SHARES[priority]:
+            self._saturated = True
+            self.shed[priority] += 1
+            return False
+        self.in_flight += 1
+        if self.in_flight >= self.limit:
+            self._saturated = True
+        self.admitted[priority] += 1
+        return True
+
+    def release(self, latency: float) -> None:
+        """Record a finished request and adjust the limit at the end of a window"""
+        self.in_flight -= 1
+        self._samples += 1
+        if latency > self.target_latency:
+            self._slow += 1
+
+        now = time.monotonic()
+        if now - self._window_started >= self.window:
+            self._adjust()
+            self._window_started = now
+
+    def _adjust(self) -> None:
+        if self._slow > self._samples * self.slow_ratio:
+            limit = max(self.min_limit, int(self.limit * self.backoff))
+            if limit < self.limit:
+                self.limit = limit
+                self.decreases += 1
+        elif self._saturated and self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + self.increase)
+            self.increases += 1
+        self._samples = 0
+        self._slow = 0
+        self._saturated = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the current limit and adjustment counters"""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "limit_increases": self.increases,
+            "limit_decreases": self.decreases,
+        }
+
+    def priority_stats(self) -> Dict[str, Dict[str, int]]:
+        """Report admitted and shed requests per priority"""
+        return {
+            priority: {"admitted": self.admitted[priority], "shed": self.shed[priority]}
+            for priority in self.admitted
+        }
+
+
+# Global concurrency limiter instance
+concurrency_limiter = AdaptiveConcurrencyLimiter(
+    initial_limit=settings.LOAD_SHED_INITIAL_LIMIT,
+    min_limit=settings.LOAD_SHED_MIN_LIMIT,
+    max_limit=settings.LOAD_SHED_MAX_LIMIT,
+    target_latency=settings.LOAD_SHED_TARGET_LATENCY_MS / 1000,
+    slow_ratio=settings.LOAD_SHED_SLOW_RATIO,
+    backoff=settings.LOAD_SHED_BACKOFF,
+    increase=settings.LOAD_SHED_INCREASE,
+    window=settings.LOAD_SHED_WINDOW_SECONDS,
+)
+stats_collector.register(
+    "app_load_shed", concurrency_limiter.stats,
+    counters=("limit_increases", "limit_decreases")
+)
+stats_collector.register(
+    "app_load_shed_requests", concurrency_limiter.priority_stats, label="priority",
+    counters=("admitted", "shed")
+)
+
+_SHED_BODY = b'{"detail":"Server overloaded, retry later"}'
+_SHED_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_SHED_BODY)).encode()),
+    (b"retry-after", str(settings.LOAD_SHED_RETRY_AFTER_SECONDS).encode()),
+]
+
+
+class LoadSheddingMiddleware:
+    """ASGI middleware admitting HTTP requests through the concurrency limiter"""
+
+    def __init__(self, app: ASGIApp, limiter: AdaptiveConcurrencyLimiter = concurrency_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.LOAD_SHED_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        priority = request_priority(scope["path"])
+        if priority == EXEMPT:
+            await self.app(scope, receive, send)
+            return
+
+        if not self.limiter.try_acquire(priority):
+            await send({"type": "http.response.start", "status": 503, "headers": _SHED_HEADERS})
+            await send({"type": "http.response.body", "body": _SHED_BODY})
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(time.perf_counter() - started)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+End-to-end request deadlines
+
+Every HTTP request gets a deadline, REQUEST_TIMEOUT_SECONDS from now or
+sooner when the client sends `X-Request-Timeout: <seconds>`. The deadline is
+kept in a contextvar and applied to the database with `pymongo.timeout`, which
+PyMongo turns into `maxTimeMS` and socket, server-selection and pool
+check-out timeouts for every operation issued in the request's context,
+Motor and Beanie ones included. The rest of the request is cancelled when the
+deadline passes, and the client gets a 504.
+
+Event streams and audit exports stream their response for as long as they
+need, so they have no deadline.
+"""
+import asyncio
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+import pymongo
+from pymongo.errors import PyMongoError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.monitoring.metrics import stats_collector
+
+# time.monotonic() by which the current request has to finish, None outside requests
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+# Paths whose responses are long-lived streams
+EXEMPT_PREFIXES = (
+    f"{settings.API_PREFIX}/stream",
+    f"{settings.API_PREFIX}/audit",
+)
+
+_TIMEOUT_HEADER = b"x-request-timeout"
+
+
+def current_deadline() -> Optional[float]:
+    """Deadline of the current request, as a time.monotonic() value"""
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, None without one"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextlib.contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """
+    Run a block under a deadline, applying it to MongoDB operations
+
+    Args:
+        deadline: time.monotonic() value, or None for no deadline
+    """
+    token = _deadline.set(deadline)
+    try:
+        if deadline is None:
+            yield
+        else:
+            # pymongo.timeout(0) would mean no timeout; an expired deadline fails fast instead
+            with pymongo.timeout(max(deadline - time.monotonic(), 0.001)):
+                yield
+    finally:
+        _deadline.reset(token)
+
+
+def request_timeout(scope: Scope) -> float:
+    """Timeout of a request: the client's, capped at REQUEST_TIMEOUT_MAX_SECONDS, or the default"""
+    for name, value in scope["headers"]:
+        if name == _TIMEOUT_HEADER:
+            try:
+                timeout = float(value)
+            except ValueError:
+                break
+            if timeout > 0:
+                return min(timeout, settings.REQUEST_TIMEOUT_MAX_SECONDS)
+            break
+    return settings.REQUEST_TIMEOUT_SECONDS
+
+
+def is_timeout(error: BaseException) -> bool:
+    """Whether an exception means the request ran out of time"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    return isinstance(error, PyMongoError) and error.timeout
+
+
+class DeadlineStats:
+    """Counts requests stopped by their deadline"""
+
+    def __init__(self):
+        self.expired = 0
+        self.expired_after_response_start = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "expired": self.expired,
+            "expired_after_response_start": self.expired_after_response_start,
+        }
+
+
+# Global deadline counters
+deadline_stats = DeadlineStats()
+stats_collector.register(
+    "app_deadlines", deadline_stats.stats,
+    counters=("expired", "expired_after_response_start")
+)
+
+_EXPIRED_BODY = b'{"detail":"Request deadline exceeded"}'
+_EXPIRED_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_EXPIRED_BODY)).encode()),
+]
+
+
+class DeadlineMiddleware:
+    """ASGI middleware running every HTTP request under its deadline"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not settings.REQUEST_DEADLINES_ENABLED
+            or scope["path"].startswith(EXEMPT_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        timeout = request_timeout(scope)
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            with deadline_scope(time.monotonic() + timeout):
+                await asyncio.wait_for(self.app(scope, receive, send_wrapper), timeout)
+        except Exception as e:
+            if not is_timeout(e):
+                raise
+            if response_started:
+                # Too late for a 504; the client sees a truncated response
+                deadline_stats.expired_after_response_start += 1
+                return
+            deadline_stats.expired += 1
+            await send({"type": "http.response.start", "status": 504, "headers": _EXPIRED_HEADERS})
+            await send({"type": "http.response.body", "body": _EXPIRED_BODY})
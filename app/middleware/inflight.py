@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+In-flight request accounting used to drain the worker gracefully on shutdown
+
+Event streams stay open until the client leaves, so they are not counted:
+waiting for them would hold every shutdown until the drain times out.
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+
+# Long-lived event streams, left out of the drain
+_STREAM_PREFIX = f"{settings.API_PREFIX}/stream"
+
+
+class InFlightTracker:
+    """Counts the HTTP requests currently being served by this worker"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.total = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        # time.monotonic() when the server started shutting down, before it waits for connections
+        self.shutdown_started_at: Optional[float] = None
+
+    def started(self) -> None:
+        self.in_flight += 1
+        self.total += 1
+        self._idle.clear()
+
+    def finished(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    def begin_shutdown(self) -> None:
+        """Record that the server stopped accepting connections"""
+        if self.shutdown_started_at is None:
+            self.shutdown_started_at = time.monotonic()
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Wait until no request is in flight
+
+        Args:
+            timeout: Maximum number of seconds to wait
+
+        Returns:
+            True if drained, False if requests were still running at the timeout
+        """
+        if self.in_flight:
+            print(f"Draining {self.in_flight} in-flight request(s)...")
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Drain timed out after {timeout:.1f}s with {self.in_flight} request(s) in flight")
+            return False
+        print(f"Drained in {time.monotonic() - started:.2f}s ({self.total} requests served)")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": self.in_flight, "total": self.total}
+
+
+# Global in-flight tracker instance
+inflight_tracker = InFlightTracker()
+
+
+class InFlightMiddleware:
+    """ASGI middleware recording every HTTP request in the in-flight tracker"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(_STREAM_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        inflight_tracker.started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            inflight_tracker.finished()
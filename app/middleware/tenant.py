@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tenant resolution from the request host
+
+With TENANT_BASE_DOMAIN set to e.g. "example.com", requests to
+"acme.example.com" are routed to tenant "acme" for their whole lifetime and
+only accept credentials issued for it. Requests to other hosts carry no
+tenant until their credentials bind one (the `tid` token claim or the
+tenant of an API key).
+
+Hosts are unauthenticated input, so a template tenant is only routed to once
+its database exists; other names get a 404 without a client being created.
+"""
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.database.tenancy import tenant_registry, tenant_scope
+
+_UNKNOWN_BODY = b'{"detail":"Unknown tenant"}'
+_UNKNOWN_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_UNKNOWN_BODY)).encode()),
+]
+
+
+def tenant_from_host(scope: Scope) -> Optional[str]:
+    """Tenant selected by the Host header, None if the host doesn't select one"""
+    if not settings.TENANT_BASE_DOMAIN:
+        return None
+    for name, value in scope["headers"]:
+        if name == b"host":
+            host = value.decode("latin-1").split(":", 1)[0].lower()
+            subdomain, dot, domain = host.partition(".")
+            if dot and subdomain and domain == settings.TENANT_BASE_DOMAIN:
+                return subdomain
+            return None
+    return None
+
+
+class TenantMiddleware:
+    """ASGI middleware running every request in the context of its host's tenant"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        tenant = tenant_from_host(scope)
+        if tenant is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await tenant_registry.exists(tenant):
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1008})
+                return
+            await send({"type": "http.response.start", "status": 404, "headers": _UNKNOWN_HEADERS})
+            await send({"type": "http.response.body", "body": _UNKNOWN_BODY})
+            return
+
+        with tenant_scope(tenant):
+            await self.app(scope, receive, send)
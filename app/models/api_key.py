@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+API key model for service-to-service authentication
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+
+class ApiKey(Document):
+    """
+    A service API key
+
+    Only an HMAC-SHA256 of the secret is stored. The key acts as its owner
+    user (of its tenant), limited to its scopes. Keys of every tenant are kept
+    in the default database. `updated_at` changes on every change that
+    matters for authentication (creation, scopes, revocation) so workers can
+    refresh their in-memory key index incrementally; `last_used_at` doesn't
+    touch it.
+    """
+    key_id: str = Field(..., description="Public key id, the part of the key before the secret")
+    name: str = Field(..., description="What the key is used for")
+    secret_hash: str = Field(..., description="Hex HMAC-SHA256 of the key secret")
+    owner_id: str = Field(..., description="Id of the user the key acts as")
+    tenant: Optional[str] = Field(None, description="Tenant of the owner, None for the default database")
+    scopes: List[str] = Field(default_factory=list, description="Scopes granted to the key")
+    expires_at: Optional[datetime] = Field(None, description="When the key stops being accepted")
+    revoked_at: Optional[datetime] = Field(None, description="When the key was revoked")
+    last_used_at: Optional[datetime] = Field(None, description="Last authenticated request")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "api_keys"
+        indexes = [
+            IndexModel([("key_id", ASCENDING)], name="key_id_unique", unique=True),
+            # Serves the incremental index refresh
+            IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        ]
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Batch request models for the FastAPI starter template
+"""
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+
+from app.config import settings
+
+
+class BatchRequestItem(BaseModel):
+    """A single sub-request inside a batch"""
+    id: Optional[str] = Field(None, description="Client supplied identifier echoed back in the result")
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = Field("GET", description="HTTP method")
+    path: str = Field(..., description="Path of the sub-request, including the API prefix and any query string")
+    headers: Dict[str, str] = Field(default_factory=dict, description="Extra headers for the sub-request")
+    body: Optional[Any] = Field(None, description="JSON body for the sub-request")
+
+
+class BatchRequest(BaseModel):
+    """Batch request model"""
+    requests: List[BatchRequestItem] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.BATCH_MAX_REQUESTS,
+        description="Sub-requests to execute concurrently"
+    )
+
+
+class BatchResponseItem(BaseModel):
+    """Result of a single sub-request"""
+    id: Optional[str] = Field(None, description="Identifier of the sub-request")
+    status: int = Field(..., description="HTTP status code of the sub-request")
+    body: Optional[Any] = Field(None, description="Decoded response body")
+
+
+class BatchResponse(BaseModel):
+    """Batch response model"""
+    responses: List[BatchResponseItem] = Field(..., description="Results in the same order as the requests")
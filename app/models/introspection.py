@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Token introspection models (RFC 7662 shaped results)
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from app.config import settings
+
+
+class IntrospectionRequest(BaseModel):
+    """Batch introspection request"""
+    tokens: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.INTROSPECTION_MAX_TOKENS,
+        description="Access tokens to introspect"
+    )
+
+
+class IntrospectionResult(BaseModel):
+    """Introspection result of a single token; inactive tokens only carry `active`"""
+    active: bool = Field(..., description="Whether the token is currently valid for an active user")
+    sub: Optional[str] = Field(None, description="Subject of the token")
+    username: Optional[str] = Field(None, description="Username of the token's user")
+    tenant: Optional[str] = Field(None, description="Tenant of the token's user, absent for the default database")
+    scope: Optional[str] = Field(None, description="Space-separated permissions of the user")
+    token_type: Optional[str] = Field(None, description="Type of the token")
+    exp: Optional[int] = Field(None, description="Expiry as a Unix timestamp; the result may be cached until then")
+
+
+class IntrospectionResponse(BaseModel):
+    """Batch introspection response"""
+    results: List[IntrospectionResult] = Field(..., description="Results in the same order as the tokens")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Background job model for the MongoDB-backed job queue
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+from app.config import settings
+
+
+class Job(Document):
+    """
+    A unit of background work
+
+    A job is claimable while `status` is "pending" or "running" and
+    `available_at` has passed: claiming a job pushes `available_at` forward by
+    the visibility timeout, so a job whose worker died becomes claimable again.
+    """
+    name: str = Field(..., description="Name of the registered job handler")
+    payload: Dict[str, Any] = Field(default_factory=dict, description="Handler arguments")
+    status: str = Field("pending", description="pending, running, done or failed")
+    attempts: int = Field(0, description="Number of times the job was claimed")
+    max_attempts: int = Field(settings.JOB_MAX_ATTEMPTS, description="Attempts before the job is failed")
+    available_at: datetime = Field(default_factory=datetime.utcnow, description="When the job can next be claimed")
+    last_error: Optional[str] = Field(None, description="Error of the last failed attempt")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = Field(None, description="When the job succeeded or was failed")
+
+    class Settings:
+        name = "jobs"
+        indexes = [
+            # Serves the claim query: status in (...), available_at <= now, oldest first
+            IndexModel(
+                [("status", ASCENDING), ("available_at", ASCENDING)],
+                name="status_available_at",
+            ),
+            # Finished jobs are removed after the retention period
+            IndexModel(
+                [("finished_at", ASCENDING)],
+                name="finished_at_ttl",
+                expireAfterSeconds=settings.JOB_RETENTION_SECONDS,
+            ),
+        ]
@@ -2,17 +2,24 @@
 """
 User model for authentication and user management
 """
+import time
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from pydantic import Field, EmailStr, validator
-from beanie import Document, PydanticObjectId
+from beanie import PydanticObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, IndexModel
 from passlib.context import CryptContext
 
+from app.database.tenancy import TenantDocument
+from app.models.fieldsets import FieldSet
+from app.monitoring.metrics import observe_password_hash
+
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-class User(Document):
-    """User model for authentication and profile management"""
+class User(TenantDocument):
+    """User model for authentication and profile management, stored per tenant"""
     username: str = Field(..., description="Username for login", index=True)
     email: EmailStr = Field(..., description="User's email address", index=True)
     hashed_password: str = Field(..., description="Hashed password")
@@ -22,6 +29,8 @@ class User(Document):
     is_verified: bool = Field(False, description="Whether the user's email is verified")
     verification_token: Optional[str] = Field(None, description="Token for email verification")
     roles: List[str] = Field(default_factory=lambda: ["user"], description="User roles")
+    last_login_at: Optional[datetime] = Field(None, description="Last successful login")
+    last_seen_at: Optional[datetime] = Field(None, description="Last authenticated request")
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
     
@@ -43,16 +52,31 @@ class User(Document):
                 ("username", 1),
                 ("email", 1),
             ],
+            # Verified users keep the field as null, so only index the string tokens
+            # of unverified users (a sparse index would still hold every null)
+            IndexModel(
+                [("verification_token", ASCENDING)],
+                name="verification_token_partial",
+                partialFilterExpression={"verification_token": {"$type": "string"}},
+            ),
         ]
     
     @classmethod
     def hash_password(cls, password: str) -> str:
         """Hash a password for storing"""
-        return pwd_context.hash(password)
+        started = time.perf_counter()
+        try:
+            return pwd_context.hash(password)
+        finally:
+            observe_password_hash("hash", time.perf_counter() - started)
     
     def verify_password(self, plain_password: str) -> bool:
         """Verify a stored password against a provided password"""
-        return pwd_context.verify(plain_password, self.hashed_password)
+        started = time.perf_counter()
+        try:
+            return pwd_context.verify(plain_password, self.hashed_password)
+        finally:
+            observe_password_hash("verify", time.perf_counter() - started)
     
     @classmethod
     async def get_by_email(cls, email: str) -> Optional["User"]:
@@ -64,6 +88,34 @@ class User(Document):
         """Get a user by username"""
         return await cls.find_one({"username": username})
     
+    @classmethod
+    def from_trusted(cls, document: Dict[str, Any]) -> "User":
+        """
+        Build a user from a document read from the users collection, without validation
+        
+        Documents are only ever written through this model, so read-only
+        lookups on the auth path skip Pydantic validation (and the username
+        validator). Missing fields get their defaults.
+        UserService re-reads users with validation before saving them.
+        """
+        return cls.model_construct(**document)
+    
+    @classmethod
+    async def find_trusted(cls, query: Dict[str, Any]) -> List["User"]:
+        """Read-only fast path of `find(query).to_list()`, see `from_trusted`"""
+        documents = await cls.get_motor_collection().find(query).to_list(None)
+        return [cls.from_trusted(document) for document in documents]
+    
+    @classmethod
+    async def get_trusted(cls, user_id: str) -> Optional["User"]:
+        """Read-only fast path of `get(user_id)`, see `from_trusted`"""
+        try:
+            object_id = PydanticObjectId(user_id)
+        except (InvalidId, TypeError):
+            return None
+        document = await cls.get_motor_collection().find_one({"_id": object_id})
+        return cls.from_trusted(document) if document is not None else None
+    
     @classmethod
     async def authenticate(cls, username_or_email: str, password: str) -> Optional["User"]:
         """Authenticate a user with username/email and password"""
@@ -77,3 +129,20 @@ class User(Document):
             return user
         
         return None
+
+
+# Fields clients may select with `?fields=`; credentials and tokens are never selectable
+user_fieldset = FieldSet(User, [
+    "id",
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_verified",
+    "roles",
+    "last_login_at",
+    "last_seen_at",
+    "created_at",
+    "updated_at",
+])
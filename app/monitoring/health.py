@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Liveness and readiness probes
+
+Both probes are answered by an ASGI middleware placed in front of every other
+middleware, so they never run authentication, CORS or routing. Readiness is
+served from a snapshot that a background task refreshes, so probes never
+touch the database themselves.
+"""
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.database import mongodb
+
+_JSON_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"cache-control", b"no-store"),
+]
+
+_LIVE_BODY = b'{"status":"alive"}'
+
+
+class HealthMonitor:
+    """Refreshes the readiness snapshot in the background"""
+
+    def __init__(self, refresh_interval: float, ping_timeout: float):
+        self.refresh_interval = refresh_interval
+        self.ping_timeout = ping_timeout
+        self.warmup_complete = False
+        self.snapshot: Dict[str, Any] = {"status": "starting"}
+        self.snapshot_body = json.dumps(self.snapshot).encode()
+        self.is_ready = False
+        self.refreshed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Take a first snapshot and keep refreshing it in the background"""
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop refreshing and report not ready"""
+        self.warmup_complete = False
+        self.is_ready = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Health check refresh failed: {e}")
+
+    async def refresh(self) -> None:
+        """Ping the database and rebuild the readiness snapshot"""
+        database: Dict[str, Any] = {"ok": False, "ping_ms": None, "error": None}
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(mongodb.client.admin.command("ping"), self.ping_timeout)
+            database["ok"] = True
+            database["ping_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        except Exception as e:
+            database["error"] = str(e) or type(e).__name__
+
+        pool = mongodb.pool_monitor
+        max_pool_size = mongodb.client.options.pool_options.max_pool_size
+        database["pool"] = {
+            "max_size": max_pool_size,
+            "open": pool.open_connections,
+            "checked_out": pool.checked_out,
+            "check_out_failures": pool.check_out_failures,
+            "saturation": round(pool.checked_out / max_pool_size, 4) if max_pool_size else None,
+        }
+
+        self.is_ready = self.warmup_complete and database["ok"]
+        self.snapshot = {
+            "status": "ready" if self.is_ready else "not_ready",
+            "warmup_complete": self.warmup_complete,
+            "database": database,
+            "checked_at": datetime.now().isoformat(),
+        }
+        # Encode once here so probes only write bytes
+        self.snapshot_body = json.dumps(self.snapshot).encode()
+        self.refreshed_at = time.monotonic()
+
+    def is_stale(self) -> bool:
+        """Whether the background refresh stopped keeping up"""
+        if self.refreshed_at is None:
+            return True
+        return time.monotonic() - self.refreshed_at > self.refresh_interval * 3
+
+
+# Global health monitor instance
+health_monitor = HealthMonitor(
+    refresh_interval=settings.HEALTH_REFRESH_SECONDS,
+    ping_timeout=settings.HEALTH_PING_TIMEOUT_SECONDS
+)
+
+
+class HealthProbeMiddleware:
+    """
+    ASGI middleware answering the probe paths before any other middleware
+
+    - liveness (`/health`, `/health/live`): constant response, no I/O
+    - readiness (`/health/ready`): last background snapshot, 503 when not ready
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.liveness_paths = {"/health", settings.HEALTH_LIVENESS_PATH}
+        self.readiness_path = settings.HEALTH_READINESS_PATH
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            path = scope["path"]
+            if path in self.liveness_paths:
+                await self._respond(send, 200, _LIVE_BODY)
+                return
+            if path == self.readiness_path:
+                ready = health_monitor.is_ready and not health_monitor.is_stale()
+                await self._respond(send, 200 if ready else 503, health_monitor.snapshot_body)
+                return
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _respond(send: Send, status_code: int, body: bytes) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": _JSON_HEADERS + [(b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics
+
+Metric children are bound to their label values once and kept in dicts, so
+recording in the hot path is a dict lookup plus an observe. Labels are kept
+low-cardinality: route templates instead of raw paths, command names instead
+of queries.
+
+With several workers, set PROMETHEUS_MULTIPROC_DIR so /metrics aggregates the
+metrics of every worker. The production server clears it on start and drops
+the live gauges of workers that exit.
+"""
+import os
+import time
+from typing import Callable, Collection, Dict, Iterable, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+JWT_VERIFY_DURATION = Histogram(
+    "jwt_verify_duration_seconds",
+    "Time spent verifying JWT access tokens",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent in bcrypt hashing and verification",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+MONGODB_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by command name",
+    ["command"],
+    buckets=_LATENCY_BUCKETS,
+)
+MONGODB_COMMAND_ERRORS = Counter(
+    "mongodb_command_errors_total",
+    "Failed MongoDB commands by command name",
+    ["command"],
+)
+
+# Pre-bound children, keyed by their label values
+_request_durations: Dict[Tuple[str, str, str], Histogram] = {}
+_password_durations = {
+    "hash": PASSWORD_HASH_DURATION.labels(operation="hash"),
+    "verify": PASSWORD_HASH_DURATION.labels(operation="verify"),
+}
+_command_durations: Dict[str, Histogram] = {}
+_command_errors: Dict[str, Counter] = {}
+# Keyed by id(): routes live as long as the app and aren't hashable
+_route_templates: Dict[int, str] = {}
+
+
+def _request_duration(method: str, route: str, status: str) -> Histogram:
+    key = (method, route, status)
+    child = _request_durations.get(key)
+    if child is None:
+        child = _request_durations[key] = REQUEST_DURATION.labels(method, route, status)
+    return child
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route that handled a request, e.g. "/api/v1/items/{id}"
+
+    Unmatched paths share one label so random URLs can't blow up cardinality.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+
+    template = _route_templates.get(id(route))
+    if template is None:
+        template = route.path
+        path = scope["path"]
+        # Routes of included routers may not carry their prefix; recover it
+        # from the part of the path in front of what the route matched
+        if not route.path_regex.match(path):
+            for i, char in enumerate(path):
+                if char == "/" and route.path_regex.match(path[i:]):
+                    template = path[:i] + route.path
+                    break
+        _route_templates[id(route)] = template
+    return template
+
+
+def observe_jwt_verify(seconds: float) -> None:
+    JWT_VERIFY_DURATION.observe(seconds)
+
+
+def observe_password_hash(operation: str, seconds: float) -> None:
+    _password_durations[operation].observe(seconds)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener recording per-command latency and errors"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        child = _command_durations.get(event.command_name)
+        if child is None:
+            child = _command_durations[event.command_name] = MONGODB_COMMAND_DURATION.labels(event.command_name)
+        child.observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        child = _command_errors.get(event.command_name)
+        if child is None:
+            child = _command_errors[event.command_name] = MONGODB_COMMAND_ERRORS.labels(event.command_name)
+        child.inc()
+
+
+command_metrics = MongoCommandMetrics()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per route template and in-flight requests"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            _request_duration(scope["method"], route_template(scope), status).observe(time.perf_counter() - started)
+
+
+class StatsCollector:
+    """
+    Exposes the counters kept by application components as metrics
+
+    Each source is a callable returning a flat dict of numbers, e.g.
+    `event_broker.stats`, or, when registered with a label name, a dict of
+    such dicts keyed by label value (e.g. `cache_stats`, keyed by cache name).
+    Keys listed in `counters` are exported as counters, the rest as gauges.
+    Components register their source next to their global instance.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Tuple[Callable[[], Dict], Optional[str], Collection[str]]] = {}
+
+    def register(
+        self,
+        prefix: str,
+        source: Callable[[], Dict],
+        label: Optional[str] = None,
+        counters: Collection[str] = (),
+    ) -> None:
+        self._sources[prefix] = (source, label, counters)
+
+    def collect(self) -> Iterable:
+        for prefix, (source, label, counters) in self._sources.items():
+            try:
+                values = source()
+            except Exception:
+                continue
+
+            rows = values.items() if label else [(None, values)]
+            families: Dict[str, object] = {}
+            for label_value, row in rows:
+                for key, value in row.items():
+                    if not isinstance(value, (int, float)) or isinstance(value, bool):
+                        continue
+                    name = f"{prefix}_{key}"
+                    family = families.get(name)
+                    if family is None:
+                        labels = [label] if label else []
+                        if key in counters:
+                            family = CounterMetricFamily(name, name, labels=labels)
+                        else:
+                            family = GaugeMetricFamily(name, name, labels=labels)
+                        families[name] = family
+                    family.add_metric([str(label_value)] if label else [], value)
+            yield from families.values()
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def render_metrics() -> bytes:
+    """Render the metrics in the Prometheus text format"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        # Component stats are per worker; report the ones of the serving worker
+        registry.register(stats_collector)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def clear_multiprocess_dir() -> None:
+    """
+    Remove the metric files of a previous run from PROMETHEUS_MULTIPROC_DIR
+
+    Call it before the workers start, so a restart doesn't keep reporting the
+    samples of the old workers.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+
+
+def mark_worker_dead(pid: int) -> None:
+    """Drop the live gauge samples (e.g. requests in flight) of a worker that exited"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
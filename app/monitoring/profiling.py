@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Per-request Server-Timing breakdowns and on-demand sampling profiles
+
+Server-Timing is opt-in per request with the `X-Server-Timing: 1` header (or
+for every request with SERVER_TIMING_ENABLED). Phases are recorded by the auth
+middleware (`auth`, `jwt`, `db`) and by TimedRoute (`deps`, `handler`,
+`serialize`, `route`), and returned as a `Server-Timing` response header.
+
+Profiling is enabled per request with `X-Profile: <PROFILING_SECRET>` and is
+rate limited to PROFILING_MAX_PER_MINUTE per worker. The profile is stored as a
+speedscope flamegraph in PROFILING_OUTPUT_DIR (path in the `X-Profile-Path`
+response header), or returned as HTML instead of the response with
+`X-Profile-Output: html`.
+"""
+import asyncio
+import functools
+import hmac
+import inspect
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+
+class ServerTimings:
+    """Phase timings collected while serving one request"""
+
+    def __init__(self):
+        self.entries: List[Tuple[str, float]] = []
+        self.marks: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.entries.append((name, seconds))
+
+    def header_value(self) -> str:
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.entries)
+
+
+_current_timings: ContextVar[Optional[ServerTimings]] = ContextVar("server_timings", default=None)
+
+
+def current_timings() -> Optional[ServerTimings]:
+    """Timings of the current request, or None when Server-Timing is off"""
+    return _current_timings.get()
+
+
+def add_timing(name: str, seconds: float) -> None:
+    """Record an already measured phase for the current request"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def timed_phase(name: str) -> Iterator[None]:
+    """Record the duration of a block as a Server-Timing phase"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute recording the route phases of a request
+
+    - deps: dependency resolution and request validation
+    - handler: the endpoint function itself
+    - serialize: response validation and serialization
+    - route: all of the above
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            timings = _current_timings.get()
+            if timings is None:
+                return await handler(request)
+
+            started = time.perf_counter()
+            response = await handler(request)
+            finished = time.perf_counter()
+
+            handler_started = timings.marks.pop("handler_started", None)
+            handler_finished = timings.marks.pop("handler_finished", None)
+            if handler_started is not None and handler_finished is not None:
+                timings.add("deps", handler_started - started)
+                timings.add("handler", handler_finished - handler_started)
+                timings.add("serialize", finished - handler_finished)
+            timings.add("route", finished - started)
+            return response
+
+        return timed_handler
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Wrap an endpoint so it marks when it starts and finishes"""
+    def mark(name: str) -> None:
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.marks[name] = time.perf_counter()
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            mark("handler_started")
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                mark("handler_finished")
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def sync_wrapper(*args, **kwargs):
+        mark("handler_started")
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            mark("handler_finished")
+    return sync_wrapper
+
+
+class ProfileRateLimiter:
+    """Token bucket limiting how many requests a worker profiles per minute"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self.refill_rate = per_minute / 60
+        self.updated = time.monotonic()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+profile_rate_limiter = ProfileRateLimiter(settings.PROFILING_MAX_PER_MINUTE)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware adding Server-Timing headers and running requested profiles"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        timing_requested = settings.SERVER_TIMING_ENABLED or headers.get(b"x-server-timing") == b"1"
+        profile_requested = self._profile_authorized(headers.get(b"x-profile"))
+
+        if not timing_requested and not profile_requested:
+            await self.app(scope, receive, send)
+            return
+
+        timings = ServerTimings() if timing_requested else None
+        token = _current_timings.set(timings)
+        try:
+            if profile_requested and profile_rate_limiter.allow():
+                await self._profile(scope, receive, send, timings, headers.get(b"x-profile-output") == b"html")
+            else:
+                await self.app(scope, receive, self._timing_sender(send, timings, time.perf_counter()))
+        finally:
+            _current_timings.reset(token)
+
+    @staticmethod
+    def _profile_authorized(value: Optional[bytes]) -> bool:
+        secret = settings.PROFILING_SECRET
+        if not secret or value is None:
+            return False
+        return hmac.compare_digest(value, secret.encode())
+
+    @staticmethod
+    def _timing_sender(send: Send, timings: Optional[ServerTimings], started: float, extra_headers=()) -> Send:
+        async def sender(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", [])) + list(extra_headers)
+                if timings is not None:
+                    timings.add("total", time.perf_counter() - started)
+                    headers.append((b"server-timing", timings.header_value().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+        return sender
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send,
+                       timings: Optional[ServerTimings], return_html: bool) -> None:
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL_SECONDS, async_mode="enabled")
+        started = time.perf_counter()
+
+        if return_html:
+            async def discard(message: Message) -> None:
+                pass
+
+            profiler.start()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                profiler.stop()
+            response = Response(await asyncio.to_thread(profiler.output_html), media_type="text/html")
+            await response(scope, receive, self._timing_sender(send, timings, started))
+            return
+
+        # Rendering and writing the profile happen off the event loop
+        await asyncio.to_thread(os.makedirs, settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+        path = os.path.join(
+            settings.PROFILING_OUTPUT_DIR,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.speedscope.json"
+        )
+        extra_headers = [(b"x-profile-path", path.encode("latin-1"))]
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, self._timing_sender(send, timings, started, extra_headers))
+        finally:
+            profiler.stop()
+            await asyncio.to_thread(_write_profile, profiler, path, SpeedscopeRenderer())
+
+
+def _write_profile(profiler, path: str, renderer) -> None:
+    with open(path, "w") as f:
+        f.write(profiler.output(renderer=renderer))
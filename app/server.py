@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Production server launcher
+
+Runs `create_application` under gunicorn with uvicorn workers using uvloop
+and httptools. The worker count is derived from the CPUs available to the
+container, the application is preloaded in the master before forking, workers
+are recycled after a number of requests and drain gracefully on SIGTERM:
+event streams are closed as soon as shutdown starts, and gunicorn only kills a
+worker after it had its full graceful timeout.
+
+On platforms without gunicorn (Windows) it falls back to uvicorn's own
+multi-process mode.
+"""
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from uvicorn import Server
+
+from app.config import settings
+from app.middleware.inflight import inflight_tracker
+from app.monitoring.metrics import clear_multiprocess_dir, mark_worker_dead
+from app.services.event_service import event_broker
+
+
+def available_cpus() -> int:
+    """
+    Number of CPUs this process may use
+
+    Honors the CPU affinity mask and the cgroup v2 CPU quota so the value is
+    correct inside containers.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return cpus
+
+
+def worker_count() -> int:
+    """Configured worker count, or one worker per available CPU"""
+    return settings.SERVER_WORKERS or available_cpus()
+
+
+def default_job_workers() -> None:
+    """
+    Run no in-app job workers unless JOB_WORKERS is set
+
+    Every server worker would otherwise poll the jobs collection with
+    JOB_WORKERS pollers of its own; jobs are left to `manage.py worker`.
+    """
+    if "JOB_WORKERS" not in os.environ:
+        os.environ["JOB_WORKERS"] = "0"
+        settings.JOB_WORKERS = 0
+
+
+def connection_timeout() -> int:
+    """
+    Seconds the server waits for open connections on shutdown
+
+    The last SERVER_SHUTDOWN_FLUSH_SECONDS of the graceful timeout are left to
+    the application shutdown for writing the buffered activity and audit events.
+    """
+    return max(settings.SERVER_GRACEFUL_TIMEOUT_SECONDS - settings.SERVER_SHUTDOWN_FLUSH_SECONDS, 0)
+
+
+class GracefulServer(Server):
+    """Uvicorn server closing the event streams as soon as shutdown starts"""
+
+    async def shutdown(self, sockets: Optional[List] = None) -> None:
+        inflight_tracker.begin_shutdown()
+        closed = event_broker.close_all()
+        if closed:
+            print(f"Closing {closed} event stream(s)")
+        await super().shutdown(sockets=sockets)
+
+
+def worker_exited(server: Any, worker: Any) -> None:
+    """Gunicorn child_exit hook, run in the master for every worker that exits"""
+    mark_worker_dead(worker.pid)
+
+
+def gunicorn_options() -> Dict[str, Any]:
+    """Gunicorn settings for the production server"""
+    return {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": worker_count(),
+        "worker_class": "app.server.ProductionUvicornWorker",
+        "backlog": settings.SERVER_BACKLOG,
+        "keepalive": settings.SERVER_KEEPALIVE_SECONDS,
+        "preload_app": settings.SERVER_PRELOAD,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        # The worker needs up to SERVER_GRACEFUL_TIMEOUT_SECONDS (connections, then the flushes);
+        # the margin lets it close the database and exit before gunicorn kills it
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT_SECONDS + settings.SERVER_SHUTDOWN_FLUSH_SECONDS,
+        "timeout": settings.SERVER_GRACEFUL_TIMEOUT_SECONDS * 2,
+        "accesslog": None,
+        "child_exit": worker_exited,
+    }
+
+
+try:
+    from gunicorn.app.base import BaseApplication
+    from gunicorn.arbiter import Arbiter
+    from uvicorn_worker import UvicornWorker
+except ImportError:  # pragma: no cover - gunicorn is not available on Windows
+    BaseApplication = None
+    UvicornWorker = None
+
+
+if UvicornWorker is not None:
+
+    class ProductionUvicornWorker(UvicornWorker):
+        """Uvicorn worker using uvloop and httptools, serving with GracefulServer"""
+
+        CONFIG_KWARGS = {
+            "loop": "uvloop",
+            "http": "httptools",
+            "lifespan": "on",
+            "timeout_graceful_shutdown": connection_timeout(),
+        }
+
+        async def _serve(self) -> None:
+            self.config.app = self.wsgi
+            server = GracefulServer(config=self.config)
+            self._install_sigquit_handler()
+            await server.serve(sockets=self.sockets)
+            if not server.started:
+                sys.exit(Arbiter.WORKER_BOOT_ERROR)
+
+    class ProductionServer(BaseApplication):
+        """Gunicorn application serving the FastAPI app"""
+
+        def __init__(self, options: Dict[str, Any]):
+            self.options = options
+            super().__init__()
+
+        def load_config(self) -> None:
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.application import app
+            return app
+
+
+def main() -> None:
+    """Start the production server"""
+    default_job_workers()
+    clear_multiprocess_dir()
+    if BaseApplication is not None:
+        options = gunicorn_options()
+        print(f"Starting production server on {options['bind']} with {options['workers']} worker(s)")
+        ProductionServer(options).run()
+        return
+
+    # uvicorn's own worker processes can't use GracefulServer: event streams are
+    # cancelled when the connection timeout runs out, before the flushes. It has
+    # no child_exit hook either, so live gauges of exited workers linger until restart
+    import uvicorn
+    print(f"gunicorn is not available, starting uvicorn with {worker_count()} worker(s)")
+    uvicorn.run(
+        "app.application:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=worker_count(),
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        limit_max_requests=settings.SERVER_MAX_REQUESTS,
+        timeout_graceful_shutdown=connection_timeout(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Write-behind tracking of user activity (`last_seen_at`, `last_login_at`)
+
+The auth path only records activity in memory, coalesced per user. A
+background task flushes the buffer periodically with one unordered
+`bulk_write` of `$max` updates, so an out-of-order flush from another worker
+can never move a timestamp backwards. Activity is buffered per tenant and
+written to each tenant's database.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database.tenancy import current_tenant, tenant_scope
+from app.models.user import User
+from app.monitoring.metrics import stats_collector
+
+
+class ActivityTracker:
+    """Buffers per-user activity timestamps and flushes them in batches"""
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # (tenant, user id) -> fields to update
+        self._pending: Dict[Tuple[Optional[str], Any], Dict[str, datetime]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+        self.flushes = 0
+        self.flushed_users = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+
+    def _record(self, user_id: Any, fields: Dict[str, datetime]) -> None:
+        key = (current_tenant(), user_id)
+        entry = self._pending.get(key)
+        if entry is not None:
+            entry.update(fields)
+            return
+        if len(self._pending) >= self.max_pending:
+            # Buffer is full: flush early and drop this update (activity is best effort)
+            self.dropped += 1
+            if self._wake is not None:
+                self._wake.set()
+            return
+        self._pending[key] = fields
+
+    def seen(self, user_id: Any) -> None:
+        """Record that a user of the current tenant made an authenticated request"""
+        self._record(user_id, {"last_seen_at": datetime.now()})
+
+    def logged_in(self, user_id: Any) -> None:
+        """Record a successful login of a user of the current tenant"""
+        now = datetime.now()
+        self._record(user_id, {"last_seen_at": now, "last_login_at": now})
+
+    async def flush(self) -> int:
+        """
+        Write the buffered activity to the database
+
+        Returns:
+            Number of users updated
+        """
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        operations_by_tenant: Dict[Optional[str], List[UpdateOne]] = {}
+        for (tenant, user_id), fields in pending.items():
+            operations_by_tenant.setdefault(tenant, []).append(UpdateOne({"_id": user_id}, {"$max": fields}))
+
+        started = time.perf_counter()
+        flushed = 0
+        try:
+            for tenant, operations in operations_by_tenant.items():
+                try:
+                    with tenant_scope(tenant):
+                        await User.get_motor_collection().bulk_write(operations, ordered=False)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Activity flush failed for tenant {tenant or '(default)'}: {e}")
+                    # Keep the tenant's batch for the next flush, newer updates win
+                    for key, fields in pending.items():
+                        if key[0] == tenant and key not in self._pending and len(self._pending) < self.max_pending:
+                            self._pending[key] = fields
+                    continue
+                flushed += len(operations)
+        finally:
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+        if flushed:
+            self.flushes += 1
+            self.flushed_users += flushed
+        return flushed
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """Start the periodic flush in the running event loop"""
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write what is still buffered"""
+        if self._task is not None:
+            # Let a flush in progress finish rather than cancelling it mid-write
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+            self._wake = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Report buffer size and flush counters"""
+        return {
+            "pending_users": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_users": self.flushed_users,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+# Global activity tracker instance
+activity_tracker = ActivityTracker(
+    flush_interval=settings.ACTIVITY_FLUSH_SECONDS,
+    max_pending=settings.ACTIVITY_MAX_PENDING,
+)
+stats_collector.register(
+    "app_activity", activity_tracker.stats,
+    counters=("flushes", "flushed_users", "dropped", "errors")
+)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Authentication audit log
+
+Events (logins, failed logins, rejected tokens, account changes) are queued in
+memory and written by a background task with one `insert_many` per batch, so
+recording an event never waits on the database. The queue is bounded: when it
+is full new events are dropped and counted rather than growing memory or
+blocking requests.
+
+Events are stored in the `audit_log` collection and expire through a TTL index
+on `ts` after AUDIT_RETENTION_DAYS (built by `python manage.py indexes`).
+Events of every tenant go to the default database, tagged with their tenant.
+"""
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from starlette.requests import HTTPConnection
+
+from app.config import settings
+from app.database.tenancy import current_tenant
+from app.monitoring.metrics import stats_collector
+
+AUDIT_COLLECTION = "audit_log"
+
+
+class AuditLog:
+    """Bounded in-process queue of audit events with a batching writer"""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+
+    def _collection(self):
+        from app.database.mongodb import db
+        return db[AUDIT_COLLECTION]
+
+    def record(
+        self,
+        event: str,
+        username: Optional[str] = None,
+        user_id: Any = None,
+        request: Optional[HTTPConnection] = None,
+        **details: Any,
+    ) -> None:
+        """
+        Queue an audit event without waiting for it to be written
+
+        Args:
+            event: Event type, e.g. "login.failed"
+            username: Username the event is about, if known
+            user_id: User id the event is about, if known
+            request: Request the event happened in, for the client address and path
+            **details: Extra event fields
+        """
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            if self._wake is not None:
+                self._wake.set()
+            return
+
+        document = {
+            "ts": datetime.utcnow(),
+            "event": event,
+            "username": username,
+            "user_id": str(user_id) if user_id is not None else None,
+        }
+        tenant = current_tenant()
+        if tenant is not None:
+            document["tenant"] = tenant
+        if request is not None:
+            document["ip"] = request.client.host if request.client else None
+            document["path"] = request.url.path
+        if details:
+            document["details"] = details
+
+        self._queue.append(document)
+        self.recorded += 1
+        if self._wake is not None and len(self._queue) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """
+        Write all queued events
+
+        Returns:
+            Number of events written
+        """
+        written = 0
+        while self._queue:
+            count = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(count)]
+            started = time.perf_counter()
+            try:
+                await self._collection().insert_many(batch, ordered=False)
+            except Exception as e:
+                self.errors += 1
+                print(f"Audit log write failed: {e}")
+                # Put the batch back in front of newer events, within the queue bound
+                room = self.max_queue - len(self._queue)
+                self.dropped += max(0, len(batch) - room)
+                self._queue.extendleft(reversed(batch[:room]))
+                break
+            finally:
+                self.last_flush_ms = (time.perf_counter() - started) * 1000
+            written += count
+        self.written += written
+        return written
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """Start the background writer in the running event loop"""
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background writer and write what is still queued"""
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+            self._wake = None
+        await self.flush()
+
+    async def query(
+        self,
+        filters: Dict[str, Any],
+        limit: int,
+        batch_size: int = 500,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream stored events matching the filters, newest first
+
+        Args:
+            filters: MongoDB filter on the event fields
+            limit: Maximum number of events
+            batch_size: Events fetched per round trip
+
+        Yields:
+            Event documents without their `_id`
+        """
+        cursor = (
+            self._collection()
+            .find(filters, {"_id": 0})
+            .sort("ts", -1)
+            .limit(limit)
+            .batch_size(batch_size)
+        )
+        async for document in cursor:
+            yield document
+
+    def stats(self) -> Dict[str, Any]:
+        """Report queue size and write counters"""
+        return {
+            "queued": len(self._queue),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+# Global audit log instance
+audit_log = AuditLog(
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_SECONDS,
+    max_queue=settings.AUDIT_MAX_QUEUE,
+)
+stats_collector.register(
+    "app_audit", audit_log.stats,
+    counters=("recorded", "written", "dropped", "errors")
+)
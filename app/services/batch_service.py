@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Batch service for executing several API calls in one round trip
+
+Every sub-request runs under a deadline of its own: its X-Request-Timeout
+header or the default timeout, never past the deadline of the batch. Event
+streams and audit exports have no deadline, so they can't be batched.
+"""
+import asyncio
+import json
+from typing import Any, List, Optional
+from urllib.parse import urlsplit
+
+from starlette.types import ASGIApp, Message, Scope
+
+from app.config import settings
+from app.middleware.deadline import EXEMPT_PREFIXES, is_timeout, remaining, request_timeout
+from app.models.batch import BatchRequestItem, BatchResponseItem
+from app.models.user import User
+
+# Headers of the outer request that must not leak into sub-requests
+_SKIPPED_HEADERS = {b"content-length", b"content-type", b"transfer-encoding"}
+
+
+class BatchService:
+    """Service that dispatches batched sub-requests through the application"""
+
+    def __init__(self, app: ASGIApp, parent_scope: Scope, user: User):
+        """
+        Args:
+            app: The ASGI application the sub-requests are dispatched to
+            parent_scope: Scope of the outer batch request
+            user: The user the outer request was authenticated as
+        """
+        self.app = app
+        self.parent_scope = parent_scope
+        self.user = user
+        self.batch_path = f"{settings.API_PREFIX}/batch"
+
+    async def execute(self, items: List[BatchRequestItem]) -> List[BatchResponseItem]:
+        """
+        Execute all sub-requests concurrently
+
+        Args:
+            items: The sub-requests to execute
+
+        Returns:
+            One result per sub-request, in request order
+        """
+        return list(await asyncio.gather(*(self._execute_one(item) for item in items)))
+
+    async def _execute_one(self, item: BatchRequestItem) -> BatchResponseItem:
+        """Run a single sub-request and capture its response"""
+        parts = urlsplit(item.path)
+        path = parts.path
+
+        if (
+            not path.startswith(f"{settings.API_PREFIX}/")
+            or path.rstrip("/") == self.batch_path
+            or path.startswith(EXEMPT_PREFIXES)
+        ):
+            return BatchResponseItem(
+                id=item.id,
+                status=400,
+                body={"detail": f"Path '{path}' cannot be used in a batch"}
+            )
+
+        body = b"" if item.body is None else json.dumps(item.body).encode()
+        scope = self._build_scope(item, path, parts.query, body)
+
+        request_sent = False
+
+        async def receive() -> Message:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Never signal a disconnect while the sub-request is still running
+            await asyncio.Event().wait()
+
+        status_code = 500
+        content_type = ""
+        chunks: List[bytes] = []
+
+        async def send(message: Message) -> None:
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-type":
+                        content_type = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        timeout = request_timeout(scope)
+        batch_remaining = remaining()
+        if batch_remaining is not None:
+            timeout = min(timeout, batch_remaining)
+        try:
+            await asyncio.wait_for(self.app(scope, receive, send), max(timeout, 0))
+        except Exception as e:
+            if is_timeout(e):
+                return BatchResponseItem(
+                    id=item.id, status=504, body={"detail": "Request deadline exceeded"}
+                )
+            print(f"Batch sub-request {item.method} {path} failed: {e!r}")
+            return BatchResponseItem(id=item.id, status=500, body={"detail": "Internal server error"})
+
+        return BatchResponseItem(
+            id=item.id,
+            status=status_code,
+            body=self._decode_body(b"".join(chunks), content_type)
+        )
+
+    def _build_scope(self, item: BatchRequestItem, path: str, query: str, body: bytes) -> Scope:
+        """Build the ASGI scope of a sub-request from the outer request"""
+        parent = self.parent_scope
+
+        # Headers of the item replace the outer request's (e.g. its own X-Request-Timeout)
+        overrides = {
+            name.lower().encode("latin-1"): value.encode("latin-1")
+            for name, value in item.headers.items()
+        }
+        headers = [
+            (name, value) for name, value in parent.get("headers", [])
+            if name not in _SKIPPED_HEADERS and name not in overrides
+        ]
+        headers.extend(overrides.items())
+        if body:
+            headers.append((b"content-type", b"application/json"))
+            headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+        return {
+            "type": "http",
+            "asgi": parent.get("asgi", {"version": "3.0"}),
+            "http_version": parent.get("http_version", "1.1"),
+            "method": item.method,
+            "scheme": parent.get("scheme", "http"),
+            "server": parent.get("server"),
+            "client": parent.get("client"),
+            "root_path": parent.get("root_path", ""),
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": headers,
+            # The outer request is already authenticated: carrying the user
+            # in the state lets sub-requests skip token verification
+            "state": {**parent.get("state", {}), "user": self.user},
+        }
+
+    @staticmethod
+    def _decode_body(raw: bytes, content_type: str) -> Optional[Any]:
+        """Decode a sub-response body according to its content type"""
+        if not raw:
+            return None
+        if content_type.startswith("application/json"):
+            try:
+                return json.loads(raw)
+            except ValueError:
+                pass
+        return raw.decode("utf-8", errors="replace")
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Async result cache for service methods
+
+Usage:
+    class UserService:
+        @staticmethod
+        @cached(name="user.by_id", ttl=30, negative_ttl=5, model=User)
+        async def get_user_by_id(user_id: str) -> Optional[User]:
+            ...
+
+Concurrent misses on the same key are collapsed into a single computation
+(single-flight), ``None`` results can be cached for a shorter time (negative
+caching) and every cache keeps hit/miss counters. The computation runs in a
+context of its own, carrying over only the tenant and the deadline of the
+caller that started it; callers with more time left start another one if it
+runs out of time.
+
+The in-process backend is per worker: `invalidate()` only reaches the worker
+it is called in, and the others keep serving their entry until its TTL runs
+out. Keep the TTL of caches whose staleness matters (e.g. users, whose
+`is_active` flag is checked on the auth path) short, or 0 to only share
+concurrent lookups.
+"""
+import asyncio
+import contextvars
+import functools
+import inspect
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from app.config import settings
+from app.database.tenancy import current_tenant, tenant_scope
+from app.middleware.deadline import current_deadline, deadline_scope, is_timeout
+from app.monitoring.metrics import stats_collector
+
+# Sentinel for a missing cache entry (None is a valid, negatively cached value)
+_MISSING = object()
+
+
+class CacheStats:
+    """Hit-rate counters of a single cache"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of calls answered without running the wrapped function"""
+        lookups = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+class CacheBackend:
+    """Base class of cache backends"""
+
+    # Whether values must be encoded to plain BSON/JSON types before storing
+    needs_encoding = False
+
+    async def get(self, key: str) -> Any:
+        """Return the cached value or the _MISSING sentinel"""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class LRUCacheBackend(CacheBackend):
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class MongoCacheBackend(CacheBackend):
+    """
+    Cache shared by all workers, stored in a MongoDB collection
+
+    Expired entries are ignored on read and removed by a TTL index, which is
+    built by `python manage.py indexes`.
+    """
+
+    needs_encoding = True
+
+    def __init__(self, collection_name: str = "cache_entries"):
+        self.collection_name = collection_name
+
+    def _collection(self):
+        from app.database.mongodb import db
+        return db[self.collection_name]
+
+    async def get(self, key: str) -> Any:
+        document = await self._collection().find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"value": 1}
+        )
+        return _MISSING if document is None else document.get("value")
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._collection().replace_one(
+            {"_id": key},
+            {"value": value, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)},
+            upsert=True
+        )
+
+    async def delete(self, key: str) -> None:
+        await self._collection().delete_one({"_id": key})
+
+
+# Registry of the stats of every cache, keyed by cache name
+cache_registry: Dict[str, CacheStats] = {}
+
+_default_backend: Optional[CacheBackend] = None
+_memory_backend: Optional[LRUCacheBackend] = None
+
+
+def get_memory_backend() -> LRUCacheBackend:
+    """Get the in-process backend"""
+    global _memory_backend
+    if _memory_backend is None:
+        _memory_backend = LRUCacheBackend(max_entries=settings.CACHE_MAX_ENTRIES)
+    return _memory_backend
+
+
+def get_default_backend() -> CacheBackend:
+    """Get the backend selected by settings.CACHE_BACKEND ("memory" or "mongo")"""
+    global _default_backend
+    if _default_backend is None:
+        if settings.CACHE_BACKEND == "mongo":
+            _default_backend = MongoCacheBackend()
+        else:
+            _default_backend = get_memory_backend()
+    return _default_backend
+
+
+def cached(
+    name: str,
+    ttl: float,
+    negative_ttl: float = 0,
+    model: Optional[Type[BaseModel]] = None,
+    backend: Optional[CacheBackend] = None,
+    key: Optional[Callable[..., str]] = None,
+    shared: bool = True,
+):
+    """
+    Cache the results of an async function
+
+    Args:
+        name: Cache name, used as key prefix and in the stats registry
+        ttl: Seconds a result is kept
+        negative_ttl: Seconds a None result is kept (0 disables negative caching)
+        model: Pydantic model of the result, used to encode values for shared
+            backends and to hand out copies from the in-process backend
+        backend: Backend to use, defaults to get_default_backend()
+        key: Function building the cache key from the call arguments
+        shared: Whether results may be stored in a shared backend; results
+            holding secrets (e.g. password hashes) must stay in the process,
+            so without it the default is the in-process backend
+
+    Returns:
+        A decorator; the wrapped function gains `invalidate(*args, **kwargs)`
+        and `stats` attributes
+    """
+    def decorator(func):
+        parameters = list(inspect.signature(func).parameters)
+        # Don't key on the bound instance of methods
+        skip_first = bool(parameters) and parameters[0] in ("self", "cls")
+        stats = cache_registry.setdefault(name, CacheStats(name))
+        # Computation running per key, with its deadline; invalidate() drops it so its result isn't stored
+        in_flight: Dict[str, Tuple[asyncio.Future, float]] = {}
+
+        def get_backend() -> CacheBackend:
+            if backend is not None:
+                return backend
+            return get_default_backend() if shared else get_memory_backend()
+
+        def build_key(args, kwargs) -> str:
+            if skip_first:
+                args = args[1:]
+            if key is not None:
+                return f"{name}:{key(*args, **kwargs)}"
+            parts = [repr(arg) for arg in args]
+            parts.extend(f"{k}={v!r}" for k, v in sorted(kwargs.items()))
+            return f"{name}:{','.join(parts)}"
+
+        def encode(value: Any, cache_backend: CacheBackend) -> Any:
+            if model is not None and value is not None and cache_backend.needs_encoding:
+                return value.model_dump(by_alias=True)
+            return value
+
+        def decode(value: Any, cache_backend: CacheBackend) -> Any:
+            if model is None or value is None:
+                return value
+            if cache_backend.needs_encoding:
+                return model.model_validate(value)
+            # Hand out a copy so callers can't mutate the cached instance (or its lists)
+            return value.model_copy(deep=True)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_backend = get_backend()
+            cache_key = build_key(args, kwargs)
+
+            try:
+                value = await cache_backend.get(cache_key)
+            except Exception:
+                stats.errors += 1
+                value = _MISSING
+
+            if value is not _MISSING:
+                stats.hits += 1
+                if value is None:
+                    stats.negative_hits += 1
+                return decode(value, cache_backend)
+
+            deadline = current_deadline()
+            deadline = float("inf") if deadline is None else deadline
+            while True:
+                # Join the computation already running for this key, or start one.
+                # The computation runs in its own task so a cancelled caller
+                # doesn't cancel it for the others.
+                entry = in_flight.get(cache_key)
+                if entry is not None:
+                    stats.coalesced += 1
+                else:
+                    stats.misses += 1
+                    entry = start(cache_backend, cache_key, deadline, args, kwargs)
+                task, task_deadline = entry
+                try:
+                    result = await asyncio.shield(task)
+                except Exception as e:
+                    # Ran out of the time of the caller that started it, this one has more
+                    if is_timeout(e) and deadline > task_deadline:
+                        continue
+                    raise
+                break
+
+            if model is not None and result is not None:
+                return result.model_copy(deep=True)
+            return result
+
+        def start(cache_backend: CacheBackend, cache_key: str, deadline: float, args, kwargs):
+            # A fresh context, so the computation doesn't inherit the request state
+            # (e.g. its breaker or an expiring pymongo timeout) of the caller that starts it
+            coroutine = compute(
+                cache_backend, cache_key, current_tenant(), None if deadline == float("inf") else deadline, args, kwargs
+            )
+            task = contextvars.Context().run(asyncio.ensure_future, coroutine)
+            in_flight[cache_key] = (task, deadline)
+            task.add_done_callback(lambda done: forget(cache_key, done))
+            return task, deadline
+
+        def forget(cache_key: str, task: asyncio.Future) -> None:
+            entry = in_flight.get(cache_key)
+            if entry is not None and entry[0] is task:
+                del in_flight[cache_key]
+
+        async def compute(
+            cache_backend: CacheBackend, cache_key: str, tenant: Optional[str], deadline: Optional[float], args, kwargs
+        ) -> Any:
+            with tenant_scope(tenant), deadline_scope(deadline):
+                result = await func(*args, **kwargs)
+                entry = in_flight.get(cache_key)
+                if entry is None or entry[0] is not asyncio.current_task():
+                    # Invalidated while running: the result may predate the change
+                    return result
+                entry_ttl = ttl if result is not None else negative_ttl
+                if entry_ttl > 0:
+                    try:
+                        await cache_backend.set(cache_key, encode(result, cache_backend), entry_ttl)
+                    except Exception:
+                        stats.errors += 1
+            return result
+
+        async def invalidate(*args, **kwargs) -> None:
+            """Drop the cached result of a call with these arguments"""
+            cache_key = build_key(((None,) + args) if skip_first else args, kwargs)
+            # A computation already running may have read the old state; later
+            # calls start a new one and its result is not stored
+            in_flight.pop(cache_key, None)
+            await get_backend().delete(cache_key)
+
+        wrapper.invalidate = invalidate
+        wrapper.stats = stats
+        return wrapper
+
+    return decorator
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Report the hit-rate metrics of every cache"""
+    return {name: stats.as_dict() for name, stats in cache_registry.items()}
+
+
+stats_collector.register(
+    "app_cache", cache_stats, label="cache",
+    counters=("hits", "negative_hits", "misses", "coalesced", "errors")
+)
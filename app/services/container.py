@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Service container holding the application-wide service singletons
+"""
+import asyncio
+from datetime import timedelta
+
+from fastapi import Depends, Request
+
+from app.auth.security import create_access_token, verify_token
+from app.config import settings
+from app.database.mongodb import client
+from app.models.hello import HelloAuthenticatedResponse
+from app.models.user import User, pwd_context
+from app.monitoring.health import health_monitor
+from app.services.hello_service import HelloAuthenticatedService
+
+
+class ServiceContainer:
+    """
+    Container for services that live as long as the application
+
+    The container is created once in the application lifespan. Services are
+    built a single time and injected into route handlers through ``Depends``,
+    so stateful services have a place to keep pools, caches and prepared state.
+    """
+
+    def __init__(self):
+        self.hello_service = HelloAuthenticatedService()
+        self.ready = False
+
+    async def warmup(self) -> None:
+        """
+        Prepare the services before the application reports ready
+
+        This primes the database connection pool, loads the password hashing
+        backend, exercises the JWT code path and builds the serializers of the
+        response models so the first requests don't pay for it.
+        """
+        # Open several pool connections up front with concurrent pings
+        await asyncio.gather(*(
+            client.admin.command("ping")
+            for _ in range(settings.DB_WARMUP_CONNECTIONS)
+        ))
+
+        # Load the bcrypt backend used by User.hash_password / verify_password
+        pwd_context.handler().get_backend()
+
+        # Round trip a token to load the signing key and JWT backend
+        verify_token(create_access_token({"sub": "warmup"}, expires_delta=timedelta(minutes=1)))
+
+        # Build the validators and serializers of the response models
+        HelloAuthenticatedResponse(message="warmup", username="warmup").model_dump_json()
+        User.model_json_schema()
+
+        self.ready = True
+        print(f"Service container warmed up ({settings.DB_WARMUP_CONNECTIONS} pool connections primed)")
+
+        # Start reporting ready from the background health snapshot
+        health_monitor.warmup_complete = True
+        await health_monitor.start()
+
+    async def shutdown(self) -> None:
+        """Release the resources held by the services"""
+        self.ready = False
+        await health_monitor.stop()
+
+
+def get_services(request: Request) -> ServiceContainer:
+    """
+    Get the service container of the application
+
+    Args:
+        request: The FastAPI request object
+
+    Returns:
+        The service container created in the application lifespan
+    """
+    return request.app.state.services
+
+
+def get_hello_authenticated_service(
+    services: ServiceContainer = Depends(get_services)
+) -> HelloAuthenticatedService:
+    """Get the shared hello authenticated service"""
+    return services.hello_service
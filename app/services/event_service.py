@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Event service for pushing user-scoped events over long-lived connections
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from app.config import settings
+from app.monitoring.metrics import stats_collector
+
+# Events after which the user's connections are closed, once they are delivered
+CLOSING_EVENTS = frozenset({"user.deactivated"})
+
+
+class Subscription:
+    """A single WebSocket or SSE connection listening for a user's events"""
+
+    def __init__(self, user_id: str, kind: str, max_queue_size: int):
+        self.user_id = user_id
+        self.kind = kind
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.queued_bytes = 0
+        self.dropped = 0
+        self.connected_at = datetime.now()
+        self.closed = False
+        self.close_code = 1000
+        self.close_reason = ""
+
+    def push(self, message: str) -> None:
+        """Queue an encoded event, dropping it if the consumer is too slow"""
+        try:
+            self.queue.put_nowait(message)
+            self.queued_bytes += len(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def close(self, code: int, reason: str) -> None:
+        """
+        End the connection once the events queued so far are delivered
+
+        Args:
+            code: WebSocket close code sent to the client
+            reason: Close reason sent to the client
+        """
+        self.closed = True
+        self.close_code = code
+        self.close_reason = reason
+        if self.queue.empty():
+            # Wake up a consumer waiting for the next event
+            self.queue.put_nowait(None)
+
+    @property
+    def finished(self) -> bool:
+        """Whether the connection was closed and has no events left to deliver"""
+        return self.closed and self.queue.empty()
+
+    async def next_event(self, timeout: float) -> Optional[str]:
+        """
+        Wait for the next event
+
+        Args:
+            timeout: Seconds to wait before giving up
+
+        Returns:
+            The encoded event, or None if nothing arrived in time or the
+            connection is finished
+        """
+        if self.finished:
+            return None
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if message is None:
+            return None
+        self.queued_bytes -= len(message)
+        return message
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes held by this connection"""
+        return sys.getsizeof(self) + sys.getsizeof(self.queue) + self.queued_bytes
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe broker keyed by user id
+
+    Events are encoded once on publish and shared by all of the user's
+    connections. Publishing one of CLOSING_EVENTS closes the user's
+    connections after delivering it, and close_all closes every connection on
+    shutdown. The broker only reaches connections held
+    by the current worker process.
+    """
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self.published = 0
+
+    def subscribe(self, user_id: str, kind: str) -> Subscription:
+        """Register a new connection for a user"""
+        subscription = Subscription(user_id, kind, self.max_queue_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a connection"""
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: str, event_type: str, data: Dict[str, Any]) -> None:
+        """
+        Push an event to every connection of a user
+
+        Args:
+            user_id: Id of the user the event belongs to
+            event_type: Type of the event, e.g. "user.updated"
+            data: JSON serializable event payload
+        """
+        subscriptions = self._subscriptions.get(user_id)
+        if not subscriptions:
+            return
+        message = json.dumps(
+            {"type": event_type, "data": data, "ts": datetime.now().isoformat()},
+            default=str
+        )
+        closing = event_type in CLOSING_EVENTS
+        for subscription in subscriptions:
+            subscription.push(message)
+            if closing:
+                subscription.close(1008, "User deactivated")
+        self.published += 1
+
+    def close_all(self) -> int:
+        """
+        Close every connection, e.g. when the worker starts shutting down
+
+        Event streams never end on their own, so the server would otherwise
+        wait for them until its graceful timeout.
+
+        Returns:
+            The number of connections closed
+        """
+        connections = [s for subscriptions in self._subscriptions.values() for s in subscriptions]
+        for subscription in connections:
+            subscription.close(1012, "Server shutting down")
+        return len(connections)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report connection counts and per-connection memory"""
+        connections = [s for subscriptions in self._subscriptions.values() for s in subscriptions]
+        memory = [s.memory_usage() for s in connections]
+        return {
+            "connections": len(connections),
+            "websocket_connections": sum(1 for s in connections if s.kind == "websocket"),
+            "sse_connections": sum(1 for s in connections if s.kind == "sse"),
+            "users": len(self._subscriptions),
+            "published_events": self.published,
+            "dropped_events": sum(s.dropped for s in connections),
+            "memory_bytes": sum(memory),
+            "memory_bytes_per_connection_avg": sum(memory) // len(memory) if memory else 0,
+            "memory_bytes_per_connection_max": max(memory, default=0),
+        }
+
+
+# Global event broker instance
+event_broker = EventBroker(max_queue_size=settings.STREAM_QUEUE_SIZE)
+stats_collector.register(
+    "app_stream", event_broker.stats,
+    counters=("published_events", "dropped_events")
+)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Batch token introspection for gateways and sidecars
+
+A batch of tokens is verified locally, all their subjects are resolved with
+one `$in` query projected to the fields introspection needs, and every active
+result is cached per token until its `exp` (capped at
+INTROSPECTION_CACHE_MAX_SECONDS so deactivations and role changes show up).
+Updating or deactivating a user drops the results of its tokens at once in
+the worker that made the change. Gateways may cache the results until `exp` as well. Tokens of several tenants
+may be mixed in a batch; their subjects are resolved with one query per tenant.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.auth.rbac import permission_engine
+from app.auth.security import verify_token
+from app.config import settings
+from app.database.mongodb import breaker_guard
+from app.database.tenancy import tenant_registry, tenant_scope
+from app.models.user import User
+from app.monitoring.metrics import stats_collector
+
+_INACTIVE: Dict[str, Any] = {"active": False}
+
+
+class TokenIntrospector:
+    """Introspects batches of tokens with one user query per batch"""
+
+    def __init__(self, cache_max_entries: int, cache_max_seconds: float):
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_seconds = cache_max_seconds
+        # sha256 of the token -> (result, time.time() it expires at, (tenant, subject)),
+        # least recently used first
+        self._cache: "OrderedDict[bytes, Tuple[Dict[str, Any], float, Tuple[Optional[str], str]]]" = OrderedDict()
+        # (tenant, subject) -> cache keys of its tokens
+        self._keys_by_subject: Dict[Tuple[Optional[str], str], Set[bytes]] = {}
+        self._scopes: Dict[int, str] = {}
+
+        self.tokens = 0
+        self.cache_hits = 0
+        self.active = 0
+        self.inactive = 0
+        self.queries = 0
+
+    async def introspect(self, tokens: List[str]) -> List[Dict[str, Any]]:
+        """
+        Introspect a batch of tokens
+
+        Args:
+            tokens: Access tokens
+
+        Returns:
+            One RFC 7662 shaped result per token, in order
+        """
+        now = time.time()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(tokens)
+        # (tenant, subject) -> (index, cache key, expiry) of the tokens issued to it
+        pending: Dict[Tuple[Optional[str], str], List[Tuple[int, bytes, Optional[float]]]] = {}
+
+        for i, token in enumerate(tokens):
+            key = hashlib.sha256(token.encode()).digest()
+            cached = self._cache.get(key)
+            if cached is not None:
+                if cached[1] > now:
+                    self._cache.move_to_end(key)
+                    results[i] = cached[0]
+                    self.cache_hits += 1
+                    continue
+                self._forget(key)
+
+            token_data = verify_token(token)
+            if token_data is None:
+                results[i] = _INACTIVE
+                continue
+            exp = token_data.exp.timestamp() if token_data.exp is not None else None
+            pending.setdefault((token_data.tenant, token_data.sub), []).append((i, key, exp))
+
+        usernames_by_tenant: Dict[Optional[str], List[str]] = {}
+        for tenant, sub in pending:
+            usernames_by_tenant.setdefault(tenant, []).append(sub)
+        for tenant, usernames in usernames_by_tenant.items():
+            users = await self._load_users(tenant, usernames)
+            for sub in usernames:
+                user = users.get(sub)
+                for i, key, exp in pending[tenant, sub]:
+                    if user is None or not user.get("is_active", True):
+                        results[i] = _INACTIVE
+                        continue
+                    result = self._active_result(tenant, sub, user, exp)
+                    self._remember(key, result, now, exp, (tenant, sub))
+                    results[i] = result
+
+        self.tokens += len(tokens)
+        for result in results:
+            if result["active"]:
+                self.active += 1
+            else:
+                self.inactive += 1
+        return results
+
+    async def _load_users(self, tenant: Optional[str], usernames: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Resolve the subjects of a tenant's tokens with one $in query"""
+        if tenant is not None and not await tenant_registry.exists(tenant):
+            # Issued for a tenant that no longer exists
+            return {}
+        self.queries += 1
+        with tenant_scope(tenant), breaker_guard():
+            documents = await User.get_motor_collection().find(
+                {"username": {"$in": usernames}},
+                {"_id": 0, "username": 1, "is_active": 1, "roles": 1},
+            ).to_list(None)
+        return {document["username"]: document for document in documents}
+
+    def _active_result(self, tenant: Optional[str], sub: str, user: Dict[str, Any],
+                       exp: Optional[float]) -> Dict[str, Any]:
+        mask = permission_engine.mask_for_roles(user.get("roles", ["user"]))
+        scope = self._scopes.get(mask)
+        if scope is None:
+            scope = self._scopes[mask] = " ".join(permission_engine.permissions(mask))
+        result = {"active": True, "sub": sub, "username": user["username"], "scope": scope, "token_type": "Bearer"}
+        if tenant is not None:
+            result["tenant"] = tenant
+        if exp is not None:
+            result["exp"] = int(exp)
+        return result
+
+    def _remember(self, key: bytes, result: Dict[str, Any], now: float, exp: Optional[float],
+                  subject: Tuple[Optional[str], str]) -> None:
+        expires_at = now + self.cache_max_seconds if self.cache_max_seconds > 0 else float("inf")
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        if expires_at <= now or self.cache_max_entries <= 0:
+            return
+        self._forget(key)
+        self._cache[key] = (result, expires_at, subject)
+        self._keys_by_subject.setdefault(subject, set()).add(key)
+        while len(self._cache) > self.cache_max_entries:
+            self._forget(next(iter(self._cache)))
+
+    def _forget(self, key: bytes) -> None:
+        entry = self._cache.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_subject.get(entry[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_subject[entry[2]]
+
+    def invalidate(self, tenant: Optional[str], username: str) -> None:
+        """
+        Drop the cached results of a user's tokens
+
+        Args:
+            tenant: Tenant of the user, None for the default database
+            username: Subject of the tokens
+        """
+        for key in self._keys_by_subject.pop((tenant, username), ()):
+            self._cache.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report introspection and cache counters"""
+        return {
+            "tokens": self.tokens,
+            "cache_hits": self.cache_hits,
+            "active": self.active,
+            "inactive": self.inactive,
+            "queries": self.queries,
+            "cached_tokens": len(self._cache),
+        }
+
+
+# Global token introspector
+token_introspector = TokenIntrospector(
+    cache_max_entries=settings.INTROSPECTION_CACHE_MAX_ENTRIES,
+    cache_max_seconds=settings.INTROSPECTION_CACHE_MAX_SECONDS,
+)
+stats_collector.register(
+    "app_introspection", token_introspector.stats,
+    counters=("tokens", "cache_hits", "active", "inactive", "queries")
+)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Durable background job queue stored in MongoDB
+
+Jobs are enqueued into the `jobs` collection and claimed atomically with
+`find_one_and_update`, so any number of workers, in the app processes or in
+`python manage.py worker`, can share the queue. A claimed job stays invisible
+for the visibility timeout; if its worker dies it becomes claimable again.
+Failed jobs are retried with exponential backoff until `max_attempts`.
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+
+from app.config import settings
+from app.models.job import Job
+from app.monitoring.metrics import stats_collector
+
+JobHandler = Callable[..., Awaitable[Any]]
+
+
+class JobQueue:
+    """Enqueues jobs and runs a pool of async workers claiming them"""
+
+    def __init__(
+        self,
+        poll_interval: float,
+        visibility_timeout: float,
+        retry_base: float,
+        retry_max: float,
+    ):
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+        self.enqueued = 0
+        self.claimed = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.expired = 0
+        self.running = 0
+        self.run_seconds = 0.0
+
+    def handler(self, name: str) -> Callable[[JobHandler], JobHandler]:
+        """
+        Register the handler of a job; it is called with the job payload as keyword arguments
+
+        Args:
+            name: Job name used with `enqueue`
+        """
+        def decorator(func: JobHandler) -> JobHandler:
+            self._handlers[name] = func
+            return func
+        return decorator
+
+    async def enqueue(
+        self,
+        name: str,
+        payload: Optional[Dict[str, Any]] = None,
+        delay: float = 0,
+        max_attempts: Optional[int] = None,
+    ) -> Job:
+        """
+        Add a job to the queue
+
+        Args:
+            name: Name of a registered handler
+            payload: JSON/BSON serializable handler arguments
+            delay: Seconds before the job can be claimed
+            max_attempts: Attempts before the job is failed (default JOB_MAX_ATTEMPTS)
+
+        Returns:
+            The stored job
+
+        Raises:
+            ValueError: If no handler is registered under the name
+        """
+        if name not in self._handlers:
+            raise ValueError(f"No job handler registered for '{name}'")
+
+        job = Job(
+            name=name,
+            payload=payload or {},
+            available_at=datetime.utcnow() + timedelta(seconds=delay),
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        )
+        await job.insert()
+        self.enqueued += 1
+        if self._wake is not None and delay <= 0:
+            self._wake.set()
+        return job
+
+    async def claim(self) -> Optional[Job]:
+        """Atomically claim the oldest available job, or return None"""
+        now = datetime.utcnow()
+        document = await Job.get_motor_collection().find_one_and_update(
+            {"status": {"$in": ["pending", "running"]}, "available_at": {"$lte": now}},
+            {
+                "$set": {"status": "running", "available_at": now + timedelta(seconds=self.visibility_timeout)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.BEFORE,
+        )
+        if document is None:
+            return None
+
+        job = Job.model_validate(document)
+        if job.status == "running":
+            # The previous worker didn't finish within the visibility timeout
+            self.expired += 1
+        job.status = "running"
+        job.attempts += 1
+        self.claimed += 1
+        return job
+
+    async def run_once(self) -> bool:
+        """Claim and run a single job; returns False if none was available"""
+        job = await self.claim()
+        if job is None:
+            return False
+        await self._run(job)
+        return True
+
+    async def _run(self, job: Job) -> None:
+        if job.attempts > job.max_attempts:
+            await self._finish(job, "failed", "Visibility timeout exceeded on the last attempt")
+            self.failed += 1
+            return
+
+        handler = self._handlers.get(job.name)
+        if handler is None:
+            await self._finish(job, "failed", f"No job handler registered for '{job.name}'")
+            self.failed += 1
+            return
+
+        self.running += 1
+        started = time.perf_counter()
+        try:
+            # Give up before the claim expires so the job isn't run twice concurrently
+            await asyncio.wait_for(handler(**job.payload), timeout=self.visibility_timeout)
+        except asyncio.CancelledError:
+            # Left running; it is claimed again once the visibility timeout passes
+            raise
+        except Exception as e:
+            await self._retry(job, f"{type(e).__name__}: {e}")
+        else:
+            await self._finish(job, "done")
+            self.succeeded += 1
+        finally:
+            self.running -= 1
+            self.run_seconds += time.perf_counter() - started
+
+    async def _retry(self, job: Job, error: str) -> None:
+        if job.attempts >= job.max_attempts:
+            print(f"Job {job.name} ({job.id}) failed after {job.attempts} attempts: {error}")
+            await self._finish(job, "failed", error)
+            self.failed += 1
+            return
+
+        # Exponential backoff with jitter so failing jobs don't retry in lockstep
+        delay = min(self.retry_base * 2 ** (job.attempts - 1), self.retry_max) * random.uniform(0.5, 1)
+        await self._update(job, {
+            "status": "pending",
+            "available_at": datetime.utcnow() + timedelta(seconds=delay),
+            "last_error": error,
+        })
+        self.retried += 1
+
+    async def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        await self._update(job, {"status": status, "finished_at": datetime.utcnow(), "last_error": error})
+
+    async def _update(self, job: Job, changes: Dict[str, Any]) -> None:
+        # Matching on attempts leaves the job alone if another worker reclaimed it
+        await Job.get_motor_collection().update_one(
+            {"_id": job.id, "attempts": job.attempts},
+            {"$set": changes},
+        )
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                ran = await self.run_once()
+            except Exception as e:
+                print(f"Job worker error: {e}")
+                ran = False
+            if ran:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, workers: int) -> None:
+        """
+        Start the worker pool in the running event loop
+
+        Args:
+            workers: Number of concurrent workers (0 to only enqueue)
+        """
+        if workers <= 0 or self._workers:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(workers)]
+        print(f"Started {workers} job workers")
+
+    async def stop(self, timeout: float) -> None:
+        """
+        Stop the workers, letting running jobs finish for up to `timeout` seconds
+
+        Jobs still running afterwards are cancelled and become claimable again
+        once their visibility timeout passes.
+        """
+        if not self._workers:
+            return
+        self._stopping = True
+        self._wake.set()
+        _, pending = await asyncio.wait(self._workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._workers = []
+        self._wake = None
+        print(f"Stopped job workers ({len(pending)} jobs interrupted)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Report throughput counters of this process"""
+        return {
+            "workers": len(self._workers),
+            "running": self.running,
+            "enqueued": self.enqueued,
+            "claimed": self.claimed,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "expired": self.expired,
+            "run_seconds": self.run_seconds,
+        }
+
+
+# Global job queue instance
+job_queue = JobQueue(
+    poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+    visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+    retry_base=settings.JOB_RETRY_BASE_SECONDS,
+    retry_max=settings.JOB_RETRY_MAX_SECONDS,
+)
+stats_collector.register(
+    "app_jobs", job_queue.stats,
+    counters=("enqueued", "claimed", "succeeded", "retried", "failed", "expired", "run_seconds")
+)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Outgoing email
+
+EMAIL_BACKEND selects the sender: "log" (the default) sends nothing and only
+logs the subject, so development setups need no mail server; "smtp" delivers
+through SMTP_HOST; "package.module:ClassName" plugs in any EmailSender
+subclass, built without arguments.
+"""
+import asyncio
+import importlib
+import smtplib
+from email.message import EmailMessage
+
+from app.config import settings
+
+
+class EmailSender:
+    """Interface of the email senders"""
+
+    async def send(self, to: str, subject: str, body: str) -> None:
+        """
+        Send a plain text email
+
+        Args:
+            to: Recipient address
+            subject: Subject line
+            body: Plain text body
+
+        Raises:
+            Exception: If the message couldn't be handed to the provider; the
+                job sending it is retried
+        """
+        raise NotImplementedError
+
+
+class LogEmailSender(EmailSender):
+    """Sender that drops every message, logging its subject but not the recipient"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, to: str, subject: str, body: str) -> None:
+        self.sent += 1
+        print(f"Email not sent (EMAIL_BACKEND=log): {subject}")
+
+
+class SmtpEmailSender(EmailSender):
+    """Sender delivering through an SMTP server"""
+
+    def __init__(self, host: str, port: int, username: str, password: str, use_tls: bool, sender: str,
+                 timeout: float = 10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender
+        self.timeout = timeout
+
+    def _deliver(self, message: EmailMessage) -> None:
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+    async def send(self, to: str, subject: str, body: str) -> None:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = to
+        message["Subject"] = subject
+        message.set_content(body)
+        # smtplib blocks, keep it off the event loop
+        await asyncio.to_thread(self._deliver, message)
+
+
+def get_default_sender() -> EmailSender:
+    """Build the sender selected by EMAIL_BACKEND"""
+    if settings.EMAIL_BACKEND == "smtp":
+        return SmtpEmailSender(
+            settings.SMTP_HOST,
+            settings.SMTP_PORT,
+            settings.SMTP_USERNAME,
+            settings.SMTP_PASSWORD,
+            settings.SMTP_USE_TLS,
+            settings.EMAIL_FROM,
+        )
+    if ":" in settings.EMAIL_BACKEND:
+        module, _, name = settings.EMAIL_BACKEND.partition(":")
+        return getattr(importlib.import_module(module), name)()
+    return LogEmailSender()
+
+
+# Global email sender instance
+email_sender = get_default_sender()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Rate limiting with the generic cell rate algorithm (GCRA)
+
+Each key keeps a single number, its theoretical arrival time (TAT): a request
+is allowed if the TAT pushed forward by one emission interval stays within the
+burst window of now. That gives a smooth per-key rate with a burst allowance
+and costs one dict lookup and a few float operations per request.
+
+The in-process backend limits per worker. With RATE_LIMIT_BACKEND=mongo the
+TATs are kept in the `rate_limits` collection and updated atomically with one
+`find_one_and_update`, so every worker shares the limits at the cost of a
+database round trip per check.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from starlette.requests import HTTPConnection
+
+from app.config import settings
+from app.monitoring.metrics import stats_collector
+
+
+class RateLimit:
+    """
+    A named limit of `per_minute` requests per key, allowing bursts of `burst`
+
+    Args:
+        name: Name of the limit, used in keys and metrics
+        per_minute: Sustained requests per minute
+        burst: Requests allowed at once (defaults to `per_minute`)
+    """
+
+    def __init__(self, name: str, per_minute: int, burst: int = 0):
+        self.name = name
+        self.per_minute = per_minute
+        self.interval = 60.0 / per_minute
+        self.burst = burst or per_minute
+        self.burst_window = self.burst * self.interval
+        # How far the TAT may run ahead of now, burst_window - interval
+        # computed exactly so a key's first request is never off by rounding
+        self.tolerance = (self.burst - 1) * self.interval
+
+
+class RateLimitExceeded(HTTPException):
+    """Raised when a request is over a limit; rendered as 429 with Retry-After"""
+
+    def __init__(self, limit: RateLimit, retry_after: float):
+        self.limit = limit
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+class MemoryRateLimitBackend:
+    """
+    Per-process GCRA state in a dict, at most `max_keys` keys
+
+    Keys are kept in the order they were last updated; past the cap the least
+    recently updated one is forgotten. Its TAT has almost always passed, so
+    the key is back at full burst and forgetting it changes nothing.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[Tuple[str, Hashable], float]" = OrderedDict()
+
+    def hit_nowait(self, limit: RateLimit, key: Hashable) -> float:
+        """
+        Count a request against a limit
+
+        Returns:
+            0 if the request is allowed, otherwise the seconds until it would be
+        """
+        now = time.monotonic()
+        state_key = (limit.name, key)
+        tat = self._tats.get(state_key, now)
+        if tat < now:
+            tat = now
+        allow_at = tat - limit.tolerance
+        if allow_at > now:
+            return allow_at - now
+        self._tats[state_key] = tat + limit.interval
+        self._tats.move_to_end(state_key)
+        if len(self._tats) > self.max_keys:
+            self._tats.popitem(last=False)
+        return 0.0
+
+    async def hit(self, limit: RateLimit, key: Hashable) -> float:
+        return self.hit_nowait(limit, key)
+
+
+class MongoRateLimitBackend:
+    """
+    GCRA state shared by all workers, stored in a MongoDB collection
+
+    Idle keys are removed by a TTL index on `expires_at`, which is built by
+    `python manage.py indexes`.
+    """
+
+    def __init__(self, collection_name: str = "rate_limits"):
+        self.collection_name = collection_name
+
+    def _collection(self):
+        from app.database.mongodb import db
+        return db[self.collection_name]
+
+    async def hit(self, limit: RateLimit, key: Hashable) -> float:
+        now = time.time()
+        tat = {"$max": [{"$ifNull": ["$tat", now]}, now]}
+        allowed = {"$lte": [{"$subtract": [tat, limit.tolerance]}, now]}
+        document = await self._collection().find_one_and_update(
+            {"_id": f"{limit.name}:{key}"},
+            [
+                {"$set": {"allowed": allowed, "previous": tat}},
+                {"$set": {
+                    "tat": {"$cond": ["$allowed", {"$add": ["$previous", limit.interval]}, "$previous"]},
+                }},
+                {"$set": {"expires_at": {"$toDate": {"$multiply": ["$tat", 1000]}}}},
+                {"$unset": "previous"},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if document["allowed"]:
+            return 0.0
+        return max(0.0, document["tat"] - limit.tolerance - now)
+
+
+class RateLimiter:
+    """Checks requests against limits and counts the outcomes per limit"""
+
+    def __init__(self, backend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self._memory = isinstance(backend, MemoryRateLimitBackend)
+        self._allowed: Dict[str, int] = {}
+        self._rejected: Dict[str, int] = {}
+        self.errors = 0
+
+    async def check(self, limit: RateLimit, key: Hashable) -> None:
+        """
+        Count a request against a limit
+
+        Args:
+            limit: The limit to apply
+            key: What the limit is keyed by, e.g. a client address or username
+
+        Raises:
+            RateLimitExceeded: If the key is over the limit
+        """
+        if not self.enabled:
+            return
+        if self._memory:
+            retry_after = self.backend.hit_nowait(limit, key)
+        else:
+            try:
+                retry_after = await self.backend.hit(limit, key)
+            except Exception as e:
+                # Fail open: an unavailable limit store must not take the API down
+                self.errors += 1
+                print(f"Rate limit check failed: {e}")
+                return
+
+        if retry_after:
+            self._rejected[limit.name] = self._rejected.get(limit.name, 0) + 1
+            raise RateLimitExceeded(limit, retry_after)
+        self._allowed[limit.name] = self._allowed.get(limit.name, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Report allowed and rejected requests per limit"""
+        names = set(self._allowed) | set(self._rejected)
+        return {
+            name: {"allowed": self._allowed.get(name, 0), "rejected": self._rejected.get(name, 0)}
+            for name in names
+        }
+
+
+def client_address(request: HTTPConnection) -> str:
+    """Client address of a request (run uvicorn with --proxy-headers behind a proxy)"""
+    return request.client.host if request.client else "unknown"
+
+
+def get_default_backend():
+    """Build the backend selected by RATE_LIMIT_BACKEND"""
+    if settings.RATE_LIMIT_BACKEND == "mongo":
+        return MongoRateLimitBackend()
+    return MemoryRateLimitBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+# Limits applied by the login route and the authentication middleware
+LOGIN_PER_IP = RateLimit("login_ip", settings.RATE_LIMIT_LOGIN_PER_IP_PER_MINUTE)
+LOGIN_PER_USERNAME = RateLimit("login_username", settings.RATE_LIMIT_LOGIN_PER_USERNAME_PER_MINUTE)
+API_PER_IP = RateLimit("api_ip", settings.RATE_LIMIT_API_PER_IP_PER_MINUTE)
+API_PER_USER = RateLimit("api_user", settings.RATE_LIMIT_API_PER_USER_PER_MINUTE)
+API_PER_KEY = RateLimit("api_key", settings.RATE_LIMIT_API_PER_KEY_PER_MINUTE)
+
+# Global rate limiter instance
+rate_limiter = RateLimiter(get_default_backend(), enabled=settings.RATE_LIMIT_ENABLED)
+stats_collector.register(
+    "app_rate_limit", rate_limiter.stats, label="limit",
+    counters=("allowed", "rejected")
+)
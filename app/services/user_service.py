@@ -2,19 +2,32 @@
 """
 User service for handling user operations and verification
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timedelta
 import secrets
+from bson import ObjectId
+from bson.errors import InvalidId
 from pydantic import EmailStr
 
-from app.models.user import User
+from app.models.user import User, user_fieldset
 from app.auth.security import create_access_token
+from app.config import settings
+from app.database.mongodb import breaker_protected
+from app.database.tenancy import current_tenant, tenant_key, tenant_scope
+from app.services.activity import activity_tracker
+from app.services.audit import audit_log
+from app.services.cache import cached
+from app.services.event_service import event_broker
+from app.services.introspection import token_introspector
+from app.services.job_queue import job_queue
+from app.services.mailer import email_sender
 
 
 class UserService:
     """Service for user operations including registration, verification, and profile management"""
     
     @staticmethod
+    @breaker_protected
     async def create_user(
         username: str, 
         email: EmailStr, 
@@ -61,9 +74,16 @@ class UserService:
         )
         
         await user.insert()
+        
+        # Send the verification email from a background worker
+        await job_queue.enqueue(
+            "user.send_verification_email",
+            {"user_id": str(user.id), "tenant": current_tenant()}
+        )
         return user
     
     @staticmethod
+    @breaker_protected
     async def verify_user(verification_token: str) -> Optional[User]:
         """
         Verify a user's email using the verification token
@@ -74,7 +94,8 @@ class UserService:
         Returns:
             User object if verification successful, None otherwise
         """
-        user = await User.find_one({"verification_token": verification_token})
+        # The $type repeats the partial filter so the planner can use verification_token_partial
+        user = await User.find_one({"verification_token": {"$eq": verification_token, "$type": "string"}})
         
         if not user:
             return None
@@ -85,9 +106,11 @@ class UserService:
         user.updated_at = datetime.now()
         
         await user.save()
+        await UserService.get_user_by_id.invalidate(str(user.id))
         return user
     
     @staticmethod
+    @breaker_protected
     async def authenticate_user(username_or_email: str, password: str) -> Optional[Dict[str, Any]]:
         """
         Authenticate a user and return a token
@@ -102,10 +125,18 @@ class UserService:
         user = await User.authenticate(username_or_email, password)
         
         if not user:
+            audit_log.record("login.failed", username=username_or_email)
             return None
+        
+        activity_tracker.logged_in(user.id)
+        audit_log.record("login.succeeded", username=user.username, user_id=user.id)
             
-        # Create access token
-        access_token = create_access_token(data={"sub": user.username})
+        # Create access token, bound to the tenant the user belongs to
+        token_claims = {"sub": user.username}
+        tenant = current_tenant()
+        if tenant is not None:
+            token_claims["tid"] = tenant
+        access_token = create_access_token(data=token_claims)
         
         return {
             "access_token": access_token,
@@ -115,19 +146,69 @@ class UserService:
         }
     
     @staticmethod
+    @cached(
+        name="user.by_id",
+        ttl=settings.CACHE_USER_TTL_SECONDS,
+        negative_ttl=settings.CACHE_USER_NEGATIVE_TTL_SECONDS,
+        model=User,
+        key=tenant_key,
+        shared=False
+    )
+    @breaker_protected
     async def get_user_by_id(user_id: str) -> Optional[User]:
         """
         Get a user by ID
         
+        Results are cached; concurrent lookups of the same ID share one query.
+        
         Args:
             user_id: User ID
             
         Returns:
             User object if found, None otherwise
         """
-        return await User.get(user_id)
+        return await User.get_trusted(user_id)
+    
+    @staticmethod
+    @breaker_protected
+    async def get_user_fields(user_id: str, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """
+        Get selected fields of a user, projected in the database
+        
+        Args:
+            user_id: User ID
+            fields: Field selection from `user_fieldset.parse`
+            
+        Returns:
+            The stored document with only the selected fields, None if not found
+        """
+        try:
+            object_id = ObjectId(user_id)
+        except (InvalidId, TypeError):
+            return None
+        return await User.get_motor_collection().find_one(
+            {"_id": object_id},
+            user_fieldset.projection(fields)
+        )
     
     @staticmethod
+    async def _load_for_write(user: User) -> User:
+        """
+        Re-read a user with validation before changing and saving it
+        
+        Callers may hold a cached or `User.from_trusted` copy, which isn't
+        validated and may be stale; saving it would write that back.
+        
+        Raises:
+            ValueError: If the user no longer exists
+        """
+        current = await User.get(user.id)
+        if current is None:
+            raise ValueError("User not found")
+        return current
+    
+    @staticmethod
+    @breaker_protected
     async def update_user(
         user: User,
         update_data: Dict[str, Any]
@@ -142,21 +223,42 @@ class UserService:
         Returns:
             Updated user object
         """
+        user = await UserService._load_for_write(user)
+        username = user.username
+        
         # Handle password update separately
-        if "password" in update_data:
+        password_changed = "password" in update_data
+        if password_changed:
             user.hashed_password = User.hash_password(update_data.pop("password"))
         
         # Update other fields
+        changes = {}
         for field, value in update_data.items():
             if hasattr(user, field) and field not in ["id", "created_at", "updated_at"]:
                 setattr(user, field, value)
+                if field not in ["hashed_password", "verification_token"]:
+                    changes[field] = value
         
         user.updated_at = datetime.now()
         await user.save()
         
+        # Drop the cached copies and notify the user's live connections
+        await UserService.get_user_by_id.invalidate(str(user.id))
+        token_introspector.invalidate(current_tenant(), username)
+        event_broker.publish(str(user.id), "user.updated", changes)
+        # Only field names are audited, values may be personal data
+        audit_log.record(
+            "user.updated",
+            username=user.username,
+            user_id=user.id,
+            fields=sorted(changes),
+            password_changed=password_changed,
+        )
+        
         return user
     
     @staticmethod
+    @breaker_protected
     async def deactivate_user(user: User) -> User:
         """
         Deactivate a user account
@@ -167,13 +269,20 @@ class UserService:
         Returns:
             Deactivated user object
         """
+        user = await UserService._load_for_write(user)
         user.is_active = False
         user.updated_at = datetime.now()
         await user.save()
         
+        await UserService.get_user_by_id.invalidate(str(user.id))
+        token_introspector.invalidate(current_tenant(), user.username)
+        event_broker.publish(str(user.id), "user.deactivated", {"is_active": False})
+        audit_log.record("user.deactivated", username=user.username, user_id=user.id)
+        
         return user
     
     @staticmethod
+    @breaker_protected
     async def reactivate_user(user: User) -> User:
         """
         Reactivate a user account
@@ -184,8 +293,36 @@ class UserService:
         Returns:
             Reactivated user object
         """
+        user = await UserService._load_for_write(user)
         user.is_active = True
         user.updated_at = datetime.now()
         await user.save()
         
+        await UserService.get_user_by_id.invalidate(str(user.id))
+        event_broker.publish(str(user.id), "user.reactivated", {"is_active": True})
+        audit_log.record("user.reactivated", username=user.username, user_id=user.id)
+        
         return user
+
+
+@job_queue.handler("user.send_verification_email")
+async def send_verification_email(user_id: str, tenant: Optional[str] = None) -> None:
+    """
+    Background job sending the verification token of a new user
+    
+    Args:
+        user_id: ID of the user to verify
+        tenant: Tenant the user belongs to
+    """
+    with tenant_scope(tenant):
+        user = await User.get(user_id)
+    if not user or user.is_verified or not user.verification_token:
+        return
+    
+    print(f"Sending verification email to user {user_id}")
+    link = settings.EMAIL_VERIFICATION_URL.format(token=user.verification_token)
+    await email_sender.send(
+        user.email,
+        "Verify your email address",
+        f"Hello {user.username},\n\nConfirm your email address by opening this link:\n\n{link}\n"
+    )
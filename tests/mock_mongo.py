@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+In-memory MongoDB for tests that need a database but no server
+
+Import this module before any other app module: it points
+app.database.mongodb (and tenant clients) at a shared mongomock-motor client,
+so `init_db` and everything built on it run unchanged.
+"""
+import os
+import sys
+import types
+
+os.environ.setdefault("MONGODB_DATABASE", "test")
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import mongomock.collection
+from mongomock_motor import AsyncMongoMockClient
+
+from app.database import mongodb
+
+mock_client = AsyncMongoMockClient()
+mock_client.options = types.SimpleNamespace(pool_options=types.SimpleNamespace(max_pool_size=100))
+mongodb.client = mock_client
+mongodb.db = mock_client[os.environ["MONGODB_DATABASE"]]
+
+# Tenant databases live on the same in-memory "cluster"
+from app.database import tenancy
+
+tenancy.AsyncIOMotorClient = lambda *args, **kwargs: mock_client
+
+
+# mongomock doesn't implement `$max` or the `sort` option of bulk updates
+def _max_updater(document, field_name, value):
+    current = document.get(field_name)
+    document[field_name] = value if current is None else max(current, value)
+
+
+mongomock.collection._updaters["$max"] = _max_updater
+_add_update = mongomock.collection.BulkOperationBuilder.add_update
+mongomock.collection.BulkOperationBuilder.add_update = (
+    lambda self, *args, sort=None, **kwargs: _add_update(self, *args, **kwargs)
+)
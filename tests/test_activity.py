@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Activity tracking tests: coalesced updates, timestamps that never move
+backwards, the buffer bound, failed flushes and the flush on stop
+(in-memory database)
+"""
+import asyncio
+import contextlib
+import io
+from datetime import datetime, timedelta
+from unittest import mock
+
+from mock_mongo import mock_client
+
+from app.application import DOCUMENT_MODELS
+from app.database.mongodb import DATABASE_NAME, init_db
+from app.services.activity import ActivityTracker
+
+
+async def seed_user(username: str, last_seen_at=None):
+    await init_db(DOCUMENT_MODELS)
+    result = await mock_client[DATABASE_NAME]["users"].insert_one({
+        "username": username,
+        "email": f"{username}@example.com",
+        "hashed_password": "unused",
+        "last_seen_at": last_seen_at,
+    })
+    return result.inserted_id
+
+
+async def stored(user_id):
+    return await mock_client[DATABASE_NAME]["users"].find_one({"_id": user_id})
+
+
+async def test_updates_are_coalesced_per_user():
+    user_id = await seed_user("activity_coalesced")
+    tracker = ActivityTracker(flush_interval=60, max_pending=10)
+    for _ in range(5):
+        tracker.seen(user_id)
+    tracker.logged_in(user_id)
+    assert tracker.stats()["pending_users"] == 1
+    assert await tracker.flush() == 1
+    user = await stored(user_id)
+    assert user["last_login_at"] == user["last_seen_at"] is not None
+    assert await tracker.flush() == 0
+
+
+async def test_timestamps_never_move_backwards():
+    later = datetime.now() + timedelta(hours=1)
+    user_id = await seed_user("activity_max", last_seen_at=later)
+    tracker = ActivityTracker(flush_interval=60, max_pending=10)
+    tracker.seen(user_id)
+    await tracker.flush()
+    assert (await stored(user_id))["last_seen_at"] > datetime.now() + timedelta(minutes=59)
+
+
+async def test_full_buffer_drops_new_users():
+    tracker = ActivityTracker(flush_interval=60, max_pending=2)
+    for user_id in ("a", "b", "c"):
+        tracker.seen(user_id)
+    tracker.seen("a")
+    assert tracker.stats()["pending_users"] == 2
+    assert tracker.dropped == 1
+
+
+async def test_failed_flush_keeps_the_batch():
+    user_id = await seed_user("activity_retry")
+    tracker = ActivityTracker(flush_interval=60, max_pending=10)
+    tracker.seen(user_id)
+    collection = type(mock_client[DATABASE_NAME]["users"])
+    with mock.patch.object(collection, "bulk_write", side_effect=ConnectionError("down")), \
+            contextlib.redirect_stdout(io.StringIO()):
+        assert await tracker.flush() == 0
+    assert (tracker.errors, tracker.stats()["pending_users"]) == (1, 1)
+    assert await tracker.flush() == 1
+    assert (await stored(user_id))["last_seen_at"] is not None
+
+
+async def test_stop_flushes_the_buffer():
+    user_id = await seed_user("activity_stop")
+    tracker = ActivityTracker(flush_interval=60, max_pending=10)
+    tracker.start()
+    tracker.seen(user_id)
+    await tracker.stop()
+    assert (await stored(user_id))["last_seen_at"] is not None
+    assert tracker.stats()["pending_users"] == 0
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        asyncio.run(test())
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} activity tracking tests passed")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+API key tests: key format, the in-memory index and its incremental refresh,
+expiry, last-used times and scoped requests (in-memory database)
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from mock_mongo import mock_client
+
+from fastapi.testclient import TestClient
+
+from app.application import DOCUMENT_MODELS, create_application
+from app.auth.api_keys import ApiKeyIndex, generate_api_key, parse_api_key
+from app.config import settings
+from app.database.mongodb import DATABASE_NAME, init_db
+from app.models.api_key import ApiKey
+
+API = settings.API_PREFIX
+
+
+async def create_key(owner_id: str, scopes, expires_at=None) -> str:
+    await init_db(DOCUMENT_MODELS)
+    key, key_id, secret_hash = generate_api_key()
+    await ApiKey(
+        key_id=key_id, name="test", secret_hash=secret_hash, owner_id=owner_id, scopes=scopes, expires_at=expires_at
+    ).insert()
+    return key
+
+
+def test_key_format():
+    key, key_id, secret_hash = generate_api_key()
+    assert key.startswith(f"{settings.API_KEY_PREFIX}_{key_id}_")
+    assert parse_api_key(key)[0] == key_id
+    assert secret_hash not in key
+    assert parse_api_key("not_a-key") is None
+    assert parse_api_key(f"{settings.API_KEY_PREFIX}_{key_id}") is None
+
+
+async def test_index_authenticates_and_picks_up_revocations():
+    key = await create_key("owner", ["hello:read"])
+    index = ApiKeyIndex(refresh_interval=60)
+    await index.refresh()
+    entry = index.authenticate(key)
+    assert entry is not None and entry.scopes == {"hello:read"}
+    assert index.authenticate(key[:-1] + ("A" if key[-1] != "A" else "B")) is None
+
+    await mock_client[DATABASE_NAME]["api_keys"].update_one(
+        {"key_id": entry.key_id}, {"$set": {"revoked_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+    )
+    assert await index.refresh() >= 1
+    assert index.authenticate(key) is None
+    assert index.stats()["rejected"] == 2
+
+
+async def test_expired_keys_are_rejected():
+    key = await create_key("owner", [], expires_at=datetime.utcnow() - timedelta(seconds=1))
+    index = ApiKeyIndex(refresh_interval=60)
+    await index.refresh()
+    assert index.authenticate(key) is None
+
+
+async def test_last_used_is_written_in_one_batch():
+    key = await create_key("owner", [])
+    index = ApiKeyIndex(refresh_interval=60)
+    await index.refresh()
+    entry = index.authenticate(key)
+    await index.flush_last_used()
+    document = await mock_client[DATABASE_NAME]["api_keys"].find_one({"key_id": entry.key_id})
+    assert document["last_used_at"] is not None
+
+
+def test_requests_are_limited_to_the_key_scopes():
+    result = asyncio.run(mock_client[DATABASE_NAME]["users"].insert_one({
+        "username": "svc_keys",
+        "email": "svc_keys@example.com",
+        "hashed_password": "unused",
+        "is_active": True,
+        "is_verified": True,
+        "roles": ["user"],
+    }))
+    key = asyncio.run(create_key(str(result.inserted_id), ["hello:read"]))
+    with TestClient(create_application()) as client:
+        response = client.get(f"{API}/hello_authenticated", headers={"X-API-Key": key})
+        assert response.status_code == 200, response.text
+        response = client.get(f"{API}/hello_authenticated", headers={"Authorization": f"ApiKey {key}"})
+        assert response.status_code == 200
+        assert client.get(f"{API}/auth/me", headers={"X-API-Key": key}).status_code == 403
+        assert client.get(f"{API}/hello_authenticated", headers={"X-API-Key": key + "x"}).status_code == 401
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        if asyncio.iscoroutinefunction(test):
+            asyncio.run(test())
+        else:
+            test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} API key tests passed")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Audit log tests: batched writes, the queue bound and tenant isolation of the
+audit query endpoint (in-memory database)
+"""
+import asyncio
+import json
+import os
+
+os.environ["MONGODB_TENANTS"] = json.dumps({"acme": {"database": "acme_db"}})
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from mock_mongo import mock_client
+
+from fastapi.testclient import TestClient
+
+from app.application import create_application
+from app.auth.security import create_access_token
+from app.config import settings
+from app.database.mongodb import DATABASE_NAME
+from app.database.tenancy import tenant_scope
+from app.models.user import User
+from app.services.audit import AUDIT_COLLECTION, AuditLog, audit_log
+
+
+def seed_admin(database: str):
+    asyncio.run(mock_client[database]["users"].insert_one({
+        "username": "auditor",
+        "email": f"auditor@{database}.example.com",
+        "hashed_password": User.hash_password("audit-password"),
+        "is_active": True,
+        "is_verified": True,
+        "roles": ["admin"],
+    }))
+
+
+async def test_events_are_written_in_batches():
+    log = AuditLog(batch_size=2, flush_interval=60, max_queue=3)
+    for i in range(5):
+        log.record("login.failed", username=f"user{i}")
+    assert log.dropped == 2
+    assert await log.flush() == 3
+    assert log.written == 3
+    stored = await mock_client[DATABASE_NAME][AUDIT_COLLECTION].count_documents({"event": "login.failed"})
+    assert stored == 3
+
+
+def test_admins_only_see_their_own_tenant():
+    seed_admin(DATABASE_NAME)
+    seed_admin("acme_db")
+    audit_log.record("login.succeeded", username="default-user")
+    with tenant_scope("acme"):
+        audit_log.record("login.succeeded", username="acme-user")
+    asyncio.run(audit_log.flush())
+
+    def usernames(claims):
+        token = create_access_token({"sub": "auditor", **claims})
+        response = client.get(
+            f"{settings.API_PREFIX}/audit/events",
+            params={"event": "login.succeeded"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200, response.text
+        return [json.loads(line)["username"] for line in response.text.splitlines()]
+
+    with TestClient(create_application()) as client:
+        assert usernames({}) == ["default-user"]
+        assert usernames({"tid": "acme"}) == ["acme-user"]
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        if asyncio.iscoroutinefunction(test):
+            asyncio.run(test())
+        else:
+            test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} audit log tests passed")
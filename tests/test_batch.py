@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Batch endpoint tests: result order, per-item status codes, failing items,
+per-item deadlines and paths that can't be batched (in-memory database)
+"""
+import asyncio
+import os
+
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from mock_mongo import mock_client
+
+from fastapi.testclient import TestClient
+
+from app.application import create_application
+from app.auth.security import create_access_token
+from app.config import settings
+from app.database.mongodb import DATABASE_NAME
+from app.models.user import User
+
+API = settings.API_PREFIX
+
+
+def create_test_application():
+    """The application with a slow and a failing route to batch"""
+    app = create_application()
+
+    async def slow():
+        await asyncio.sleep(2)
+        return {"slow": True}
+
+    async def broken():
+        raise RuntimeError("secret connection string")
+
+    app.add_api_route(f"{API}/test/slow", slow)
+    app.add_api_route(f"{API}/test/broken", broken)
+    return app
+
+
+def batch(client: TestClient, requests):
+    asyncio.run(mock_client[DATABASE_NAME]["users"].update_one(
+        {"username": "batcher"},
+        {"$setOnInsert": {
+            "username": "batcher",
+            "email": "batcher@example.com",
+            "hashed_password": User.hash_password("batch-password"),
+            "is_active": True,
+            "is_verified": True,
+            "roles": ["user"],
+        }},
+        upsert=True,
+    ))
+    token = create_access_token({"sub": "batcher"})
+    response = client.post(
+        f"{API}/batch",
+        json={"requests": requests},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["responses"]
+
+
+def test_results_keep_request_order_and_status():
+    with TestClient(create_test_application()) as client:
+        results = batch(client, [
+            {"id": "me", "path": f"{API}/auth/me"},
+            {"id": "missing", "path": f"{API}/no-such-route"},
+            {"id": "hello", "path": f"{API}/hello_authenticated"},
+            {"id": "forbidden", "path": f"{API}/auth/users/000000000000000000000000"},
+        ])
+    assert [result["id"] for result in results] == ["me", "missing", "hello", "forbidden"]
+    assert [result["status"] for result in results] == [200, 404, 200, 403]
+    assert results[0]["body"]["username"] == "batcher"
+
+
+def test_failing_item_is_isolated_and_does_not_leak_errors():
+    with TestClient(create_test_application()) as client:
+        results = batch(client, [
+            {"id": "broken", "path": f"{API}/test/broken"},
+            {"id": "me", "path": f"{API}/auth/me"},
+        ])
+    assert results[0] == {"id": "broken", "status": 500, "body": {"detail": "Internal server error"}}
+    assert results[1]["status"] == 200
+
+
+def test_items_time_out_on_their_own_deadline():
+    with TestClient(create_test_application()) as client:
+        results = batch(client, [
+            {"id": "slow", "path": f"{API}/test/slow", "headers": {"X-Request-Timeout": "0.2"}},
+            {"id": "me", "path": f"{API}/auth/me"},
+        ])
+    assert results[0] == {"id": "slow", "status": 504, "body": {"detail": "Request deadline exceeded"}}
+    assert results[1]["status"] == 200
+
+
+def test_streams_and_nested_batches_are_rejected():
+    with TestClient(create_test_application()) as client:
+        results = batch(client, [
+            {"id": "sse", "path": f"{API}/stream/events"},
+            {"id": "audit", "path": f"{API}/audit/events"},
+            {"id": "nested", "method": "POST", "path": f"{API}/batch", "body": {"requests": []}},
+            {"id": "outside", "path": "/health"},
+        ])
+    assert [result["status"] for result in results] == [400, 400, 400, 400]
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} batch tests passed")
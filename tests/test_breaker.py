@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Circuit breaker tests: opening on the failure rate, trial calls while half
+open and stale principals during an outage (in-memory database)
+"""
+import asyncio
+import contextlib
+import io
+import os
+import time
+import types
+
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from mock_mongo import mock_client
+
+from fastapi.testclient import TestClient
+from pymongo.errors import AutoReconnect, DuplicateKeyError
+
+from app.application import create_application
+from app.auth.principals import principal_snapshots
+from app.auth.security import create_access_token
+from app.config import settings
+from app.database.mongodb import DATABASE_NAME, CircuitBreaker, CircuitOpenError, db_breaker
+
+API = settings.API_PREFIX
+
+
+def breaker(**options) -> CircuitBreaker:
+    options = {"window": 10, "min_calls": 4, "failure_rate": 0.5, "open_seconds": 0.05,
+               "half_open_probes": 1, "slow_call_seconds": 1, **options}
+    return CircuitBreaker(**options)
+
+
+def open_breaker(circuit: CircuitBreaker) -> None:
+    with contextlib.redirect_stdout(io.StringIO()):
+        circuit._open(time.monotonic())
+
+
+def half_open_breaker(circuit: CircuitBreaker) -> None:
+    open_breaker(circuit)
+    circuit._opened_at -= circuit.open_seconds
+
+
+def guarded(circuit: CircuitBreaker, error: BaseException = None) -> None:
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(type(error) if error else ()):
+        with circuit.guard():
+            if error is not None:
+                raise error
+
+
+def test_opens_on_failure_rate():
+    circuit = breaker()
+    circuit.record_success()
+    circuit.record_success()
+    circuit.record_failure()
+    assert circuit.state == CircuitBreaker.CLOSED
+    with contextlib.redirect_stdout(io.StringIO()):
+        circuit.record_failure()
+    assert circuit.state == CircuitBreaker.OPEN
+    try:
+        guarded(circuit)
+    except CircuitOpenError as e:
+        assert e.retry_after > 0
+    else:
+        raise AssertionError("guarded call ran while the breaker was open")
+    assert circuit.rejected == 1
+
+
+def test_only_guarded_trial_calls_close_it():
+    circuit = breaker(half_open_probes=2)
+    half_open_breaker(circuit)
+    assert circuit.allow() is True and circuit.state == CircuitBreaker.HALF_OPEN
+    # Unguarded commands, like health pings and flushes, don't decide
+    circuit.succeeded(types.SimpleNamespace())
+    circuit.record_success()
+    assert circuit.state == CircuitBreaker.HALF_OPEN
+    guarded(circuit)
+    assert circuit.state == CircuitBreaker.CLOSED
+
+
+def test_trial_outcomes():
+    circuit = breaker()
+    half_open_breaker(circuit)
+    guarded(circuit, AutoReconnect("connection refused"))
+    assert circuit.state == CircuitBreaker.OPEN
+
+    half_open_breaker(circuit)
+    guarded(circuit, ValueError("not about the database"))
+    assert (circuit.state, circuit._probes) == (CircuitBreaker.HALF_OPEN, 0)
+    guarded(circuit, DuplicateKeyError("duplicate key", 11000))
+    assert circuit.state == CircuitBreaker.CLOSED
+
+
+def test_stale_principal_serves_reads_during_an_outage():
+    asyncio.run(mock_client[DATABASE_NAME]["users"].insert_one({
+        "username": "outage",
+        "email": "outage@example.com",
+        "hashed_password": "unused",
+        "is_active": True,
+        "is_verified": True,
+        "roles": ["user"],
+    }))
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'outage'})}"}
+    with TestClient(create_application()) as client:
+        assert client.get(f"{API}/auth/me", headers=headers).status_code == 200
+        open_breaker(db_breaker)
+        db_breaker.open_seconds = 60
+        try:
+            served = principal_snapshots.served
+            response = client.get(f"{API}/auth/me", headers=headers)
+            assert response.status_code == 200, response.text
+            assert response.json()["username"] == "outage"
+            assert principal_snapshots.served == served + 1
+            response = client.post(f"{API}/batch", json={"requests": []}, headers=headers)
+            assert response.status_code == 503
+            assert int(response.headers["Retry-After"]) > 0
+        finally:
+            db_breaker.state = CircuitBreaker.CLOSED
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} circuit breaker tests passed")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Service cache tests: hits and misses, negative caching, single-flight, the
+context of shared computations, invalidation during a computation, copies
+handed out and the shared backend (in-memory database)
+"""
+import asyncio
+import contextvars
+import json
+import os
+import time
+from typing import List, Optional
+from unittest import mock
+
+os.environ["MONGODB_TENANTS"] = json.dumps({"acme": {"database": "acme_db"}})
+
+from mock_mongo import mock_client
+
+from pydantic import BaseModel
+
+from app.database.mongodb import DATABASE_NAME
+from app.database.tenancy import current_tenant, tenant_scope
+from app.middleware.deadline import current_deadline, deadline_scope, remaining
+from app.services import cache
+from app.services.cache import LRUCacheBackend, MongoCacheBackend, cached
+
+
+class Profile(BaseModel):
+    name: str
+    tags: List[str] = []
+
+
+def counting(results, delay: float = 0, **options):
+    """A cached function returning `results[key]` and counting its calls"""
+    calls = []
+
+    @cached(name=f"test.{len(cache.cache_registry)}", backend=options.pop("backend", LRUCacheBackend()), **options)
+    async def lookup(key: str) -> Optional[Profile]:
+        calls.append(key)
+        result = results.get(key)
+        await asyncio.sleep(delay)
+        return result
+
+    return lookup, calls
+
+
+async def test_hits_and_negative_caching():
+    lookup, calls = counting({"a": Profile(name="a")}, ttl=60, negative_ttl=60, model=Profile)
+    assert (await lookup("a")).name == "a"
+    assert (await lookup("a")).name == "a"
+    assert await lookup("missing") is None
+    assert await lookup("missing") is None
+    assert calls == ["a", "missing"]
+    assert lookup.stats.as_dict()["negative_hits"] == 1
+
+
+async def test_concurrent_misses_share_one_call():
+    lookup, calls = counting({"a": Profile(name="a")}, delay=0.05, ttl=60, model=Profile)
+    results = await asyncio.gather(*(lookup("a") for _ in range(10)))
+    assert calls == ["a"]
+    assert lookup.stats.coalesced == 9
+    assert len({id(result) for result in results}) == 10
+
+
+async def test_shared_computation_runs_in_its_own_context():
+    request_state = contextvars.ContextVar("test_request_state", default=None)
+    seen = []
+
+    @cached(name="test.context", ttl=60, backend=LRUCacheBackend())
+    async def lookup(key: str) -> str:
+        seen.append((current_tenant(), current_deadline(), request_state.get()))
+        # Stands in for a query bounded by the deadline
+        await asyncio.wait_for(asyncio.sleep(0.05), remaining())
+        return key
+
+    async def call(deadline: float):
+        with deadline_scope(deadline):
+            return await lookup("a")
+
+    request_state.set("first caller")
+    short = time.monotonic() + 0.02
+    with tenant_scope("acme"):
+        first = asyncio.ensure_future(call(short))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(call(time.monotonic() + 5))
+        results = await asyncio.gather(first, second, return_exceptions=True)
+
+    # Only the tenant and the deadline are carried over
+    assert seen[0] == ("acme", short, None)
+    # The caller with more time starts over once the first computation runs out of time
+    assert isinstance(results[0], asyncio.TimeoutError)
+    assert results[1] == "a"
+    assert len(seen) == 2 and seen[1][1] > short
+
+
+async def test_invalidation_during_computation_is_not_lost():
+    results = {"a": Profile(name="old")}
+    lookup, calls = counting(results, delay=0.05, ttl=60, model=Profile)
+    running = asyncio.ensure_future(lookup("a"))
+    await asyncio.sleep(0.01)
+    results["a"] = Profile(name="new")
+    await lookup.invalidate("a")
+    assert (await running).name == "old"
+    assert (await lookup("a")).name == "new"
+    assert calls == ["a", "a"]
+
+
+async def test_callers_get_deep_copies():
+    lookup, _ = counting({"a": Profile(name="a", tags=["x"])}, ttl=60, model=Profile)
+    (await lookup("a")).tags.append("mutated")
+    (await lookup("a")).tags.append("mutated")
+    assert (await lookup("a")).tags == ["x"]
+
+
+async def test_shared_backend_round_trip():
+    backend = MongoCacheBackend("test_cache_entries")
+    lookup, calls = counting({"a": Profile(name="a", tags=["x"])}, ttl=60, model=Profile, backend=backend)
+    assert await lookup("a") == Profile(name="a", tags=["x"])
+    assert await lookup("a") == Profile(name="a", tags=["x"])
+    assert calls == ["a"]
+    assert await mock_client[DATABASE_NAME]["test_cache_entries"].count_documents({}) == 1
+
+
+async def test_unshared_results_stay_in_process():
+    with mock.patch.object(cache, "_default_backend", MongoCacheBackend("test_unshared")):
+        @cached(name="test.unshared", ttl=60, model=Profile, shared=False)
+        async def secret(key: str) -> Profile:
+            return Profile(name=key)
+
+        await secret("a")
+        await secret("a")
+    assert secret.stats.hits == 1
+    assert await mock_client[DATABASE_NAME]["test_unshared"].count_documents({}) == 0
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        asyncio.run(test())
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} service cache tests passed")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Service container tests: services are built once and warmed up before the
+app reports ready, and component counters are exported on /metrics
+(in-memory database)
+"""
+import mock_mongo  # noqa: F401 - in-memory database, imported before the app
+
+from fastapi.testclient import TestClient
+
+from app.application import create_application
+from app.services.container import ServiceContainer
+
+
+def test_services_are_built_once_and_warmed_up():
+    app = create_application()
+    with TestClient(app) as client:
+        services = app.state.services
+        assert isinstance(services, ServiceContainer)
+        assert services.ready
+        assert client.get("/health/ready").status_code == 200
+        hello_service = services.hello_service
+        client.get("/health/ready")
+        assert app.state.services.hello_service is hello_service
+    assert not services.ready
+
+
+def test_component_stats_are_exported():
+    with TestClient(create_application()) as client:
+        metrics = client.get("/metrics").text
+    for family in (
+        "app_stream_connections",
+        "app_jobs_enqueued_total",
+        "app_user_loader_batches_total",
+        "app_deadlines_expired_total",
+        "app_load_shed_limit",
+        "app_tenants_clients",
+        "mongodb_breaker_open",
+        "mongodb_pool_open_connections",
+    ):
+        assert f"\n{family}" in metrics, family
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} service container tests passed")
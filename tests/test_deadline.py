@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Request deadline tests: client timeouts, the 504 response, exempt stream
+paths and the deadline applied to MongoDB operations (no database needed)
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pymongo import _csot
+
+from app.config import settings
+from app.middleware.deadline import (
+    DeadlineMiddleware, deadline_scope, deadline_stats, remaining, request_timeout
+)
+
+API = settings.API_PREFIX
+
+
+def create_test_application() -> FastAPI:
+    app = FastAPI()
+
+    @app.get(f"{API}/slow")
+    async def slow(seconds: float):
+        await asyncio.sleep(seconds)
+        return {"remaining": remaining()}
+
+    @app.get(f"{API}/stream/slow")
+    async def slow_stream(seconds: float):
+        await asyncio.sleep(seconds)
+        return {"remaining": remaining()}
+
+    app.add_middleware(DeadlineMiddleware)
+    return app
+
+
+def scope(*headers):
+    return {"headers": [(name.encode(), value.encode()) for name, value in headers]}
+
+
+def test_request_timeout_header():
+    assert request_timeout(scope()) == settings.REQUEST_TIMEOUT_SECONDS
+    assert request_timeout(scope(("x-request-timeout", "0.5"))) == 0.5
+    assert request_timeout(scope(("x-request-timeout", "100000"))) == settings.REQUEST_TIMEOUT_MAX_SECONDS
+    assert request_timeout(scope(("x-request-timeout", "-1"))) == settings.REQUEST_TIMEOUT_SECONDS
+    assert request_timeout(scope(("x-request-timeout", "soon"))) == settings.REQUEST_TIMEOUT_SECONDS
+
+
+def test_expired_request_gets_504():
+    expired = deadline_stats.expired
+    with TestClient(create_test_application()) as client:
+        response = client.get(f"{API}/slow", params={"seconds": 1}, headers={"X-Request-Timeout": "0.1"})
+        assert response.status_code == 504
+        assert response.json() == {"detail": "Request deadline exceeded"}
+
+        response = client.get(f"{API}/slow", params={"seconds": 0}, headers={"X-Request-Timeout": "5"})
+        assert response.status_code == 200
+        assert 0 < response.json()["remaining"] <= 5
+    assert deadline_stats.expired == expired + 1
+
+
+def test_streams_have_no_deadline():
+    with TestClient(create_test_application()) as client:
+        response = client.get(f"{API}/stream/slow", params={"seconds": 0.2}, headers={"X-Request-Timeout": "0.1"})
+    assert response.status_code == 200
+    assert response.json() == {"remaining": None}
+
+
+def test_deadline_applies_to_mongodb_operations():
+    with deadline_scope(time.monotonic() + 2):
+        assert 1 < _csot.get_timeout() <= 2
+    with deadline_scope(time.monotonic() - 1):
+        # An expired deadline fails operations at once instead of disabling the timeout
+        assert 0 < _csot.get_timeout() <= 0.001
+    with deadline_scope(None):
+        assert _csot.get_timeout() is None
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} request deadline tests passed")
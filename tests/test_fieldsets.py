@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Sparse fieldset tests: parsing selections, projections, serialization and
+the `fields` parameter of the user endpoints (in-memory database)
+"""
+import asyncio
+import json
+import os
+
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from mock_mongo import mock_client
+
+from fastapi.testclient import TestClient
+
+from app.application import create_application
+from app.auth.security import create_access_token
+from app.config import settings
+from app.database.mongodb import DATABASE_NAME
+from app.models.user import User, user_fieldset
+
+API = settings.API_PREFIX
+
+
+def seed_user(username: str, roles) -> str:
+    result = asyncio.run(mock_client[DATABASE_NAME]["users"].insert_one({
+        "username": username,
+        "email": f"{username}@example.com",
+        "hashed_password": User.hash_password("fields-password"),
+        "first_name": "Sparse",
+        "is_active": True,
+        "is_verified": True,
+        "roles": roles,
+    }))
+    return str(result.inserted_id)
+
+
+def headers(username: str):
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+def test_selections_are_normalized_and_allow_listed():
+    assert user_fieldset.parse(None) == user_fieldset.allowed
+    assert user_fieldset.parse(" email, username ,email") == ("username", "email")
+    for raw in ("hashed_password", "username,verification_token"):
+        try:
+            user_fieldset.parse(raw)
+        except ValueError as e:
+            assert "Unknown fields" in str(e)
+        else:
+            raise AssertionError(f"{raw} was selectable")
+
+
+def test_projection_and_serialization():
+    assert user_fieldset.projection(("username", "email")) == {"username": 1, "email": 1, "_id": 0}
+    assert user_fieldset.projection(("id",)) == {"_id": 1}
+    document = {"username": "sparse", "roles": ["user"]}
+    assert json.loads(user_fieldset.dump_document(document, ("username", "first_name", "roles"))) == {
+        "username": "sparse", "roles": ["user"],
+    }
+    assert user_fieldset.response_model(("username",)) is user_fieldset.response_model(("username",))
+
+
+def test_me_returns_only_the_selected_fields():
+    seed_user("sparse_me", ["user"])
+    with TestClient(create_application()) as client:
+        response = client.get(f"{API}/auth/me", params={"fields": "email,username"}, headers=headers("sparse_me"))
+        assert response.status_code == 200, response.text
+        assert response.json() == {"username": "sparse_me", "email": "sparse_me@example.com"}
+
+        response = client.get(f"{API}/auth/me", params={"fields": "hashed_password"}, headers=headers("sparse_me"))
+        assert response.status_code == 400
+
+
+def test_admin_lookup_reads_only_the_selected_fields():
+    seed_user("sparse_admin", ["admin"])
+    user_id = seed_user("sparse_target", ["user"])
+    with TestClient(create_application()) as client:
+        response = client.get(
+            f"{API}/auth/users/{user_id}", params={"fields": "username,first_name"}, headers=headers("sparse_admin")
+        )
+        assert response.status_code == 200, response.text
+        assert response.json() == {"username": "sparse_target", "first_name": "Sparse"}
+
+        response = client.get(f"{API}/auth/users/{user_id}", headers=headers("sparse_admin"))
+        assert "hashed_password" not in response.json()
+        assert response.json()["email"] == "sparse_target@example.com"
+
+        response = client.get(f"{API}/auth/users/000000000000000000000000", headers=headers("sparse_admin"))
+        assert response.status_code == 404
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} sparse fieldset tests passed")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Health probe tests: liveness without I/O or auth, readiness from the
+background snapshot, failed pings and stale snapshots (in-memory database)
+"""
+import asyncio
+import types
+from unittest import mock
+
+from mock_mongo import mock_client
+
+from fastapi.testclient import TestClient
+
+from app.application import create_application
+from app.database import mongodb
+from app.monitoring.health import HealthMonitor, health_monitor
+
+
+def test_liveness_needs_no_auth():
+    with TestClient(create_application()) as client:
+        for path in ("/health", "/health/live"):
+            response = client.get(path)
+            assert response.status_code == 200
+            assert response.json() == {"status": "alive"}
+            assert response.headers["cache-control"] == "no-store"
+
+
+def test_readiness_serves_the_snapshot():
+    with TestClient(create_application()) as client:
+        response = client.get("/health/ready")
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["status"] == "ready" and body["warmup_complete"]
+        assert body["database"]["ok"] and body["database"]["pool"]["max_size"] == 100
+
+        # A snapshot the background refresh stopped updating isn't trusted
+        with mock.patch.object(health_monitor, "refreshed_at", 0.0):
+            assert client.get("/health/ready").status_code == 503
+    # Shut down: not ready any more
+    assert client.get("/health/ready").status_code == 503
+
+
+async def test_failed_ping_is_not_ready():
+    async def unavailable(command):
+        raise ConnectionError("connection refused")
+
+    monitor = HealthMonitor(refresh_interval=60, ping_timeout=0.1)
+    monitor.warmup_complete = True
+    await monitor.refresh()
+    assert monitor.is_ready
+
+    client = types.SimpleNamespace(admin=types.SimpleNamespace(command=unavailable), options=mock_client.options)
+    with mock.patch.object(mongodb, "client", client):
+        await monitor.refresh()
+    assert not monitor.is_ready
+    assert monitor.snapshot["status"] == "not_ready"
+    assert monitor.snapshot["database"]["error"] == "connection refused"
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        if asyncio.iscoroutinefunction(test):
+            asyncio.run(test())
+        else:
+            test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} health probe tests passed")
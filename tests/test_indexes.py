@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Index management tests: declared indexes, diffs against live collections,
+building, rebuilding and dropping indexes, and worker startup skipping the
+index sync (in-memory database)
+"""
+import asyncio
+import contextlib
+import io
+
+from mock_mongo import mock_client
+
+from pymongo import ASCENDING, IndexModel
+
+from app.application import DOCUMENT_MODELS
+from app.database.indexes import declared_indexes, diff_indexes, sync_indexes
+from app.database.mongodb import DATABASE_NAME, init_db
+from app.models.user import User
+
+DECLARED = [
+    IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    IndexModel([("created_at", ASCENDING)], name="created_at"),
+]
+
+
+def quietly():
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def test_declared_indexes_of_a_model():
+    keys = [list(index.document["key"].items()) for index in declared_indexes(User)]
+    assert [("username", ASCENDING)] in keys
+    assert [("username", ASCENDING), ("email", ASCENDING)] in keys
+
+
+async def test_missing_indexes_are_reported_then_built():
+    collection = mock_client[DATABASE_NAME]["test_indexes_missing"]
+    await collection.insert_one({"email": "a@example.com"})
+    diff = await sync_indexes(collection, DECLARED)
+    assert [index.document["name"] for index in diff["missing"]] == ["email_unique", "created_at"]
+    assert "email_unique" not in await collection.index_information()
+
+    with quietly():
+        await sync_indexes(collection, DECLARED, apply=True)
+    assert await diff_indexes(collection, DECLARED) == {"missing": [], "changed": [], "extra": []}
+
+
+async def test_changed_and_extra_indexes():
+    collection = mock_client[DATABASE_NAME]["test_indexes_changed"]
+    await collection.create_index([("email", ASCENDING)], name="email")
+    await collection.create_index([("legacy", ASCENDING)], name="legacy")
+    diff = await diff_indexes(collection, DECLARED)
+    assert [index.document["name"] for index in diff["changed"]] == ["email_unique"]
+    assert diff["extra"] == ["legacy"]
+
+    with quietly():
+        await sync_indexes(collection, DECLARED, apply=True, rebuild_changed=True, drop_extra=True)
+    live = await collection.index_information()
+    assert live["email_unique"]["unique"] is True
+    assert "email" not in live and "legacy" not in live
+
+
+async def test_workers_start_without_building_indexes():
+    with quietly():
+        await init_db(DOCUMENT_MODELS)
+    assert set(await mock_client[DATABASE_NAME]["users"].index_information()) <= {"_id_"}
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        if asyncio.iscoroutinefunction(test):
+            asyncio.run(test())
+        else:
+            test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} index management tests passed")
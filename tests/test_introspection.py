@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Token introspection tests: batched lookups, cached results, the cache bound
+and invalidation on deactivation (in-memory database)
+"""
+import asyncio
+
+from mock_mongo import mock_client
+
+from app.application import DOCUMENT_MODELS
+from app.auth.security import create_access_token
+from app.database.mongodb import DATABASE_NAME, init_db
+from app.models.user import User
+from app.services.introspection import TokenIntrospector, token_introspector
+from app.services.user_service import UserService
+
+
+async def seed_users(*usernames: str) -> None:
+    await init_db(DOCUMENT_MODELS)
+    for username in usernames:
+        await mock_client[DATABASE_NAME]["users"].insert_one({
+            "username": username,
+            "email": f"{username}@example.com",
+            "hashed_password": User.hash_password("introspect-password"),
+            "is_active": True,
+            "is_verified": True,
+            "roles": ["user"],
+        })
+
+
+async def test_batch_is_resolved_with_one_query_and_cached():
+    await seed_users("intro_a", "intro_b")
+    introspector = TokenIntrospector(cache_max_entries=100, cache_max_seconds=60)
+    tokens = [create_access_token({"sub": "intro_a"}), create_access_token({"sub": "intro_b"}), "not-a-token"]
+    results = await introspector.introspect(tokens)
+    assert [result["active"] for result in results] == [True, True, False]
+    assert results[0]["username"] == "intro_a"
+    assert await introspector.introspect(tokens) == results
+    assert (introspector.queries, introspector.cache_hits) == (1, 2)
+
+
+async def test_cache_evicts_least_recently_used_tokens():
+    await seed_users("intro_lru")
+    introspector = TokenIntrospector(cache_max_entries=3, cache_max_seconds=60)
+    tokens = [create_access_token({"sub": "intro_lru", "n": i}) for i in range(5)]
+    await introspector.introspect(tokens[:3])
+    await introspector.introspect(tokens[:1])
+    await introspector.introspect(tokens[3:])
+    assert len(introspector._cache) == 3
+    assert sum(len(keys) for keys in introspector._keys_by_subject.values()) == 3
+    hits = introspector.cache_hits
+    await introspector.introspect(tokens[:1])
+    assert introspector.cache_hits == hits + 1
+
+
+async def test_deactivation_drops_cached_results():
+    await seed_users("intro_deactivated")
+    token = create_access_token({"sub": "intro_deactivated"})
+    assert (await token_introspector.introspect([token]))[0]["active"]
+    await UserService.deactivate_user(await User.get_by_username("intro_deactivated"))
+    assert await token_introspector.introspect([token]) == [{"active": False}]
+    assert (None, "intro_deactivated") not in token_introspector._keys_by_subject
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        asyncio.run(test())
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} token introspection tests passed")
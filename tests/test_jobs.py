@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Background job tests: running and retrying jobs, the verification email job,
+the email senders and the job worker default of the production server
+(in-memory database)
+"""
+import asyncio
+import contextlib
+import io
+import os
+from unittest import mock
+
+from mock_mongo import mock_client
+
+from app import server
+from app.application import DOCUMENT_MODELS
+from app.config import settings
+from app.database.mongodb import DATABASE_NAME, init_db
+from app.models.job import Job
+from app.models.user import User
+from app.services.job_queue import JobQueue, job_queue
+from app.services.mailer import LogEmailSender, email_sender, get_default_sender
+
+
+def queue() -> JobQueue:
+    return JobQueue(poll_interval=0.01, visibility_timeout=5, retry_base=0, retry_max=0)
+
+
+async def test_job_runs_with_its_payload():
+    await init_db(DOCUMENT_MODELS)
+    jobs = queue()
+    calls = []
+
+    @jobs.handler("test.record")
+    async def record(value: int) -> None:
+        calls.append(value)
+
+    job = await jobs.enqueue("test.record", {"value": 7})
+    assert await jobs.run_once()
+    assert not await jobs.run_once()
+    assert calls == [7]
+    assert (await Job.get(job.id)).status == "done"
+
+
+async def test_failing_job_is_retried_then_failed():
+    await init_db(DOCUMENT_MODELS)
+    jobs = queue()
+
+    @jobs.handler("test.broken")
+    async def broken() -> None:
+        raise RuntimeError("mail provider down")
+
+    job = await jobs.enqueue("test.broken", max_attempts=2)
+    with contextlib.redirect_stdout(io.StringIO()):
+        while await jobs.run_once():
+            pass
+    stored = await Job.get(job.id)
+    assert (stored.status, stored.attempts) == ("failed", 2)
+    assert stored.last_error == "RuntimeError: mail provider down"
+    assert (jobs.retried, jobs.failed) == (1, 1)
+
+
+async def test_verification_email_log_has_no_address():
+    await init_db(DOCUMENT_MODELS)
+    result = await mock_client[DATABASE_NAME]["users"].insert_one({
+        "username": "unverified",
+        "email": "unverified@example.com",
+        "hashed_password": User.hash_password("job-password"),
+        "is_verified": False,
+        "verification_token": "token",
+    })
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), mock.patch.object(email_sender, "send", wraps=email_sender.send) as send:
+        await job_queue._handlers["user.send_verification_email"](user_id=str(result.inserted_id))
+    assert str(result.inserted_id) in output.getvalue()
+    assert "unverified@example.com" not in output.getvalue()
+    to, subject, body = send.call_args.args
+    assert to == "unverified@example.com"
+    assert settings.EMAIL_VERIFICATION_URL.format(token="token") in body
+
+
+def test_email_backend_selects_the_sender():
+    assert isinstance(get_default_sender(), LogEmailSender)
+    with mock.patch.object(settings, "EMAIL_BACKEND", "app.services.mailer:LogEmailSender"):
+        assert isinstance(get_default_sender(), LogEmailSender)
+    with mock.patch.object(settings, "EMAIL_BACKEND", "smtp"), mock.patch.object(settings, "SMTP_HOST", "mail.internal"):
+        assert get_default_sender().host == "mail.internal"
+
+
+def test_production_server_leaves_jobs_to_manage_py_worker():
+    environ = {key: value for key, value in os.environ.items() if key != "JOB_WORKERS"}
+    with mock.patch.dict(os.environ, environ, clear=True), mock.patch.object(settings, "JOB_WORKERS", 2):
+        server.default_job_workers()
+        assert (os.environ["JOB_WORKERS"], settings.JOB_WORKERS) == ("0", 0)
+    with mock.patch.dict(os.environ, {"JOB_WORKERS": "3"}), mock.patch.object(settings, "JOB_WORKERS", 3):
+        server.default_job_workers()
+        assert settings.JOB_WORKERS == 3
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        if asyncio.iscoroutinefunction(test):
+            asyncio.run(test())
+        else:
+            test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} background job tests passed")
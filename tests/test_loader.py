@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Batch loader tests: concurrent lookups in one batch, deduplication with
+copies, per-key errors, the batch size cap, batch deadlines and user
+lookups (in-memory database)
+"""
+import asyncio
+import time
+
+from mock_mongo import mock_client
+
+from app.application import DOCUMENT_MODELS
+from app.database.loader import BatchLoader, load_user, user_loader
+from app.database.mongodb import DATABASE_NAME, init_db
+from app.middleware.deadline import current_deadline, deadline_scope
+
+
+def recording_loader(**options):
+    """A loader resolving keys to `[key]` and recording its batches"""
+    batches = []
+
+    async def batch_fn(keys):
+        batches.append(list(keys))
+        return {key: KeyError(key) if key == "broken" else [key] for key in keys if key != "missing"}
+
+    return BatchLoader(batch_fn, **options), batches
+
+
+async def test_concurrent_lookups_share_one_batch():
+    loader, batches = recording_loader()
+    results = await asyncio.gather(*(loader.load(key) for key in ("a", "b", "missing")))
+    assert results == [["a"], ["b"], None]
+    assert batches == [["a", "b", "missing"]]
+
+
+async def test_duplicate_keys_get_copies():
+    loader, batches = recording_loader(copy=list)
+    first, second = await asyncio.gather(loader.load("a"), loader.load("a"))
+    assert first == second == ["a"] and first is not second
+    assert batches == [["a"]]
+    assert loader.deduplicated == 1
+
+
+async def test_errors_fail_only_their_key():
+    loader, _ = recording_loader()
+    results = await asyncio.gather(loader.load("a"), loader.load("broken"), return_exceptions=True)
+    assert results[0] == ["a"]
+    assert isinstance(results[1], KeyError)
+
+
+async def test_full_batches_are_sent_at_once():
+    loader, batches = recording_loader(max_batch_size=2)
+    await asyncio.gather(*(loader.load(key) for key in "abcde"))
+    assert batches == [["a", "b"], ["c", "d"], ["e"]]
+
+
+async def test_batch_runs_under_the_latest_deadline():
+    deadlines = []
+
+    async def batch_fn(keys):
+        deadlines.append(current_deadline())
+        return {}
+
+    loader = BatchLoader(batch_fn)
+    now = time.monotonic()
+
+    async def load(key, deadline):
+        with deadline_scope(deadline):
+            return await loader.load(key)
+
+    await asyncio.gather(load("a", now + 1), load("b", now + 5))
+    await asyncio.gather(load("c", now + 1), load("d", None))
+    assert deadlines == [now + 5, None]
+
+
+async def test_load_user_resolves_usernames():
+    await init_db(DOCUMENT_MODELS)
+    for username in ("loader_a", "loader_b"):
+        await mock_client[DATABASE_NAME]["users"].insert_one({
+            "username": username,
+            "email": f"{username}@example.com",
+            "hashed_password": "unused",
+            "roles": ["user"],
+        })
+    batches = user_loader.batches
+    users = await asyncio.gather(load_user("loader_a"), load_user("loader_b"), load_user("loader_missing"))
+    assert [user.username if user else None for user in users] == ["loader_a", "loader_b", None]
+    assert user_loader.batches == batches + 1
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        asyncio.run(test())
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} batch loader tests passed")
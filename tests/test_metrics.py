@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Metrics tests: route template labels, unmatched paths, component stats, the
+/metrics endpoint and the multiprocess file cleanup of the production server
+(in-memory database)
+"""
+import os
+import tempfile
+import types
+from unittest import mock
+
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import mock_mongo  # noqa: F401 - in-memory database, imported before the app
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.application import create_application
+from app.monitoring.metrics import METRICS_CONTENT_TYPE, MetricsMiddleware, StatsCollector, clear_multiprocess_dir
+from app.server import ProductionServer, gunicorn_options
+
+
+def request_count(method: str, route: str, status: str) -> float:
+    return REGISTRY.get_sample_value(
+        "http_request_duration_seconds_count", {"method": method, "route": route, "status": status}
+    ) or 0
+
+
+def test_requests_are_labelled_with_route_templates():
+    app = FastAPI()
+    router = APIRouter()
+
+    @router.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    app.include_router(router, prefix="/test-metrics")
+    app.add_middleware(MetricsMiddleware)
+
+    before = request_count("GET", "/test-metrics/items/{item_id}", "200")
+    unmatched = request_count("GET", "unmatched", "404")
+    with TestClient(app) as client:
+        for i in range(3):
+            assert client.get(f"/test-metrics/items/{i}").status_code == 200
+        assert client.get("/test-metrics/random/path").status_code == 404
+    assert request_count("GET", "/test-metrics/items/{item_id}", "200") == before + 3
+    assert request_count("GET", "unmatched", "404") == unmatched + 1
+    assert REGISTRY.get_sample_value("http_requests_in_flight") == 0
+
+
+def test_component_stats_become_counters_and_gauges():
+    collector = StatsCollector()
+    collector.register("test_queue", lambda: {"processed": 5, "depth": 2, "healthy": True}, counters=("processed",))
+    collector.register("test_cache", lambda: {"users": {"hits": 3}}, label="cache", counters=("hits",))
+    collector.register("test_broken", lambda: 1 / 0)
+    families = {family.name: family for family in collector.collect()}
+    assert families["test_queue_processed"].type == "counter"
+    assert families["test_queue_depth"].type == "gauge"
+    assert "test_queue_healthy" not in families
+    assert families["test_cache_hits"].samples[0].labels == {"cache": "users"}
+    assert not any(name.startswith("test_broken") for name in families)
+
+
+def test_metrics_endpoint():
+    with TestClient(create_application()) as client:
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == METRICS_CONTENT_TYPE
+    for name in ("http_request_duration_seconds", "app_user_loader_batches_total", "mongodb_breaker_open"):
+        assert name in response.text
+
+
+def test_multiprocess_files_are_cleaned_up():
+    with tempfile.TemporaryDirectory() as path, mock.patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": path}):
+        for name in ("counter_100.db", "gauge_livesum_100.db", "gauge_livesum_200.db", "notes.txt"):
+            open(os.path.join(path, name), "w").close()
+
+        # Gunicorn runs the hook in the master when a worker exits
+        options = gunicorn_options()
+        assert ProductionServer(options).cfg.child_exit is options["child_exit"]
+        options["child_exit"](None, types.SimpleNamespace(pid=100))
+        assert sorted(os.listdir(path)) == ["counter_100.db", "gauge_livesum_200.db", "notes.txt"]
+
+        clear_multiprocess_dir()
+        assert os.listdir(path) == ["notes.txt"]
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} metrics tests passed")
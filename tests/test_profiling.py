@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Profiling middleware tests: Server-Timing headers, the profiling secret and
+profiles written off the event loop (no database needed)
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ["PROFILING_SECRET"] = "profile-secret"
+os.environ["PROFILING_OUTPUT_DIR"] = os.path.join(tempfile.mkdtemp(), "profiles")
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.monitoring import profiling
+from app.monitoring.profiling import ProfilingMiddleware, TimedRoute
+
+loop_threads = []
+
+
+def create_test_application() -> FastAPI:
+    app = FastAPI()
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/work")
+    async def work():
+        loop_threads.append(threading.current_thread())
+        return {"total": sum(range(10000))}
+
+    app.include_router(router)
+    app.add_middleware(ProfilingMiddleware)
+    return app
+
+
+def test_server_timing_is_opt_in():
+    with TestClient(create_test_application()) as client:
+        assert "server-timing" not in client.get("/work").headers
+        timing = client.get("/work", headers={"X-Server-Timing": "1"}).headers["server-timing"]
+    assert [entry.split(";")[0] for entry in timing.split(", ")] == ["deps", "handler", "serialize", "route", "total"]
+
+
+def test_profiling_needs_the_secret():
+    with TestClient(create_test_application()) as client:
+        response = client.get("/work", headers={"X-Profile": "wrong"})
+    assert "x-profile-path" not in response.headers
+
+
+def test_profile_is_written_off_the_event_loop():
+    writers = []
+    write_profile = profiling._write_profile
+
+    def recording_write_profile(*args):
+        writers.append(threading.current_thread())
+        write_profile(*args)
+
+    profiling._write_profile = recording_write_profile
+    try:
+        with TestClient(create_test_application()) as client:
+            response = client.get("/work", headers={"X-Profile": "profile-secret"})
+    finally:
+        profiling._write_profile = write_profile
+    assert response.json() == {"total": sum(range(10000))}
+    with open(response.headers["x-profile-path"]) as f:
+        assert "speedscope" in json.load(f)["$schema"]
+    assert len(writers) == 1 and writers[0] is not loop_threads[-1]
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} profiling tests passed")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Query-plan audit: runs the app's User queries against the database, explains
+every query shape they produced and fails on collection scans or on queries
+examining too many documents per result
+"""
+import asyncio
+import os
+import sys
+import uuid
+
+# The auditor is registered on the client when it is created
+os.environ["MONGODB_QUERY_AUDIT"] = "true"
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.auth.security import create_access_token
+from app.models.job import Job
+from app.models.user import User
+from app.services.user_service import UserService
+from app.database.indexes import COLLECTION_INDEXES, sync_indexes
+from app.database.loader import load_user
+from app.database.mongodb import client, db, init_db
+from app.database.query_audit import query_auditor, write_report
+from app.services.introspection import token_introspector
+from app.services.job_queue import job_queue
+
+REPORT_PATH = os.getenv("QUERY_AUDIT_REPORT", "query_plan_report.json")
+MAX_EXAMINED_RATIO = float(os.getenv("QUERY_AUDIT_MAX_RATIO", "10"))
+
+
+async def exercise_user_queries():
+    """Issue every User and job queue query the app makes"""
+    suffix = uuid.uuid4().hex[:8]
+    username = f"plan_audit_{suffix}"
+    email = f"plan_audit_{suffix}@example.com"
+
+    user = await UserService.create_user(username, email, "plan-audit-password")
+    try:
+        await User.get_by_username(username)
+        await User.get_by_email(email)
+        await User.authenticate(username, "plan-audit-password")
+        await User.authenticate(email, "plan-audit-password")
+        await load_user(username)
+        await token_introspector.introspect([create_access_token({"sub": username})])
+        await UserService.get_user_by_id(str(user.id))
+        await UserService.get_user_fields(str(user.id), ("username", "email"))
+        await UserService.update_user(user, {"first_name": "Plan"})
+        await UserService.verify_user(user.verification_token)
+        await UserService.verify_user("no-such-token")
+        # Claim and run the verification email job enqueued by create_user
+        await job_queue.run_once()
+    finally:
+        await user.delete()
+
+
+async def test_query_plans():
+    """Fail if any recorded query shape scans a collection"""
+    print("Initializing database connection with index sync...")
+    await init_db([User, Job], sync_indexes=True)
+    for collection_name, declared in COLLECTION_INDEXES.items():
+        await sync_indexes(db[collection_name], declared, apply=True)
+
+    query_auditor.max_examined_ratio = MAX_EXAMINED_RATIO
+    query_auditor.reset()
+    await exercise_user_queries()
+
+    results = await query_auditor.audit(client)
+    write_report(results, REPORT_PATH)
+
+    failures = [result for result in results if result["problems"]]
+    for result in results:
+        status = "❌" if result["problems"] else "✅"
+        print(
+            f"{status} {result['collection']}.{result['command']} {result['shape']} "
+            f"-> {', '.join(result['stages'])} "
+            f"(examined {result['docs_examined']}, returned {result['returned']})"
+        )
+        for problem in result["problems"]:
+            print(f"     {problem}")
+
+    print(f"\n{len(results)} query shapes audited, report written to {REPORT_PATH}")
+    if failures:
+        print(f"❌ {len(failures)} query shapes need an index")
+        sys.exit(1)
+    print("✅ All query shapes use an index")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_query_plans())
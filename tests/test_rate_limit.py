@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Rate limiter tests: bursts, sustained rate, Retry-After and the key cap of the
+in-process backend (no database needed)
+"""
+import asyncio
+import os
+import sys
+from unittest import mock
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import rate_limit
+from app.services.rate_limit import MemoryRateLimitBackend, RateLimit, RateLimitExceeded, RateLimiter
+
+
+def test_burst_then_sustained_rate():
+    backend = MemoryRateLimitBackend(max_keys=100)
+    limit = RateLimit("test", per_minute=60, burst=3)
+    with mock.patch.object(rate_limit.time, "monotonic", return_value=1000.0):
+        assert [backend.hit_nowait(limit, "k") for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert backend.hit_nowait(limit, "k") == 1.0
+    with mock.patch.object(rate_limit.time, "monotonic", return_value=1001.0):
+        assert backend.hit_nowait(limit, "k") == 0.0
+        assert backend.hit_nowait(limit, "k") > 0
+
+
+def test_keys_are_limited_independently():
+    backend = MemoryRateLimitBackend(max_keys=100)
+    limit = RateLimit("test", per_minute=1)
+    assert backend.hit_nowait(limit, "a") == 0.0
+    assert backend.hit_nowait(limit, "a") > 0
+    assert backend.hit_nowait(limit, "b") == 0.0
+
+
+def test_key_cap_evicts_least_recently_updated():
+    backend = MemoryRateLimitBackend(max_keys=3)
+    limit = RateLimit("test", per_minute=600)
+    for key in ("a", "b", "c"):
+        backend.hit_nowait(limit, key)
+    backend.hit_nowait(limit, "a")
+    backend.hit_nowait(limit, "d")
+    assert list(backend._tats) == [("test", "c"), ("test", "a"), ("test", "d")]
+    for i in range(1000):
+        backend.hit_nowait(limit, i)
+    assert len(backend._tats) == 3
+
+
+def test_limiter_raises_with_retry_after():
+    limiter = RateLimiter(MemoryRateLimitBackend(max_keys=100))
+    limit = RateLimit("test", per_minute=1)
+    asyncio.run(limiter.check(limit, "k"))
+    try:
+        asyncio.run(limiter.check(limit, "k"))
+    except RateLimitExceeded as e:
+        assert e.status_code == 429
+        assert int(e.headers["Retry-After"]) >= 59
+    else:
+        raise AssertionError("request over the limit was allowed")
+    assert limiter.stats() == {"test": {"allowed": 1, "rejected": 1}}
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} rate limiter tests passed")
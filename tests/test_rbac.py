@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Permission engine tests: the role x permission matrix, role inclusion, unknown
+roles and permissions, and API key scope masks (in-memory database, only
+needed by the imports)
+"""
+import mock_mongo  # noqa: F401 - in-memory database, imported before the app
+
+from app.auth.rbac import ROLE_DEFINITIONS, PermissionEngine, permission_engine
+
+USER_PERMISSIONS = {"profile:read", "hello:read", "batch:execute", "cache:read", "stream:read"}
+GATEWAY_PERMISSIONS = {"tokens:introspect"}
+ADMIN_PERMISSIONS = USER_PERMISSIONS | GATEWAY_PERMISSIONS | {"audit:read", "users:manage"}
+
+
+def allowed(roles, permission):
+    required = permission_engine.mask([permission])
+    return (permission_engine.mask_for_roles(roles) & required) == required
+
+
+def test_role_permission_matrix():
+    expected = {
+        (): set(),
+        ("user",): USER_PERMISSIONS,
+        ("gateway",): GATEWAY_PERMISSIONS,
+        ("admin",): ADMIN_PERMISSIONS,
+        ("user", "admin"): ADMIN_PERMISSIONS,
+    }
+    for roles, permissions in expected.items():
+        for permission in permission_engine.bits:
+            assert allowed(roles, permission) == (permission in permissions), (roles, permission)
+        assert set(permission_engine.permissions(permission_engine.mask_for_roles(roles))) == permissions
+
+
+def test_role_masks_are_cached():
+    first = permission_engine.mask_for_roles(["admin", "user"])
+    assert permission_engine.mask_for_roles(("user", "admin")) == first
+    assert ("admin", "user") in permission_engine._roles_cache
+
+
+def test_unknown_role_grants_nothing():
+    assert permission_engine.mask_for_roles(["no-such-role"]) == 0
+    assert permission_engine.mask_for_roles(["user", "no-such-role"]) == permission_engine.role_masks["user"]
+
+
+def test_unknown_permission_is_rejected():
+    try:
+        permission_engine.mask(["audit:write"])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown permission was accepted")
+
+
+def test_role_definition_errors():
+    for definitions in (
+        {"a": {"includes": ["b"]}},
+        {"a": {"includes": ["b"]}, "b": {"includes": ["a"]}},
+    ):
+        try:
+            PermissionEngine(definitions)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"invalid definitions were accepted: {definitions}")
+
+
+def test_api_key_scope_masks():
+    owner = permission_engine.mask_for_roles(["user"])
+    scoped = owner & permission_engine.scope_mask(["hello:read", "audit:read", "not-a-permission"])
+    # A key never exceeds its owner, and unknown scopes grant nothing
+    assert permission_engine.permissions(scoped) == ["hello:read"]
+    assert permission_engine.scope_mask([]) == 0
+
+
+def test_every_role_is_compiled():
+    assert set(permission_engine.role_masks) == set(ROLE_DEFINITIONS)
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} permission engine tests passed")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Graceful shutdown tests: event streams aren't drained, open streams are closed
+when shutdown starts and every shutdown step fits in the graceful timeout,
+flushes included (in-memory database)
+"""
+import asyncio
+import os
+import socket
+import time
+from unittest import mock
+
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from mock_mongo import mock_client
+
+import httpx
+import uvicorn
+from fastapi.testclient import TestClient
+
+from app.application import create_application
+from app.auth.security import create_access_token
+from app.config import settings
+from app.database.mongodb import DATABASE_NAME
+from app.middleware.inflight import InFlightMiddleware, inflight_tracker
+from app.server import GracefulServer, connection_timeout
+from app.services.audit import audit_log
+from app.services.event_service import event_broker
+
+
+def test_streams_are_not_counted_in_flight():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(inflight_tracker.in_flight)
+
+    middleware = InFlightMiddleware(app)
+    for path in (f"{settings.API_PREFIX}/stream/events", f"{settings.API_PREFIX}/auth/me"):
+        asyncio.run(middleware({"type": "http", "path": path}, None, None))
+    assert seen == [0, 1]
+    assert inflight_tracker.in_flight == 0
+
+
+def test_flushes_run_within_the_graceful_timeout():
+    flushed_at = []
+    stop_audit_log = audit_log.stop
+
+    async def recording_stop():
+        flushed_at.append(time.monotonic())
+        await stop_audit_log()
+
+    with mock.patch.object(settings, "SERVER_GRACEFUL_TIMEOUT_SECONDS", 1), \
+            mock.patch.object(settings, "SERVER_SHUTDOWN_FLUSH_SECONDS", 0.5), \
+            mock.patch.object(audit_log, "stop", recording_stop):
+        with TestClient(create_application()):
+            # A request that never finishes
+            inflight_tracker.started()
+            started = time.monotonic()
+        finished = time.monotonic()
+        inflight_tracker.finished()
+
+    assert len(flushed_at) == 1
+    assert flushed_at[0] - started < 0.8
+    assert finished - started < 1.2
+
+
+async def serve_stream_then_shut_down(token: str) -> float:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    config = uvicorn.Config(
+        create_application(), timeout_graceful_shutdown=connection_timeout(), log_level="warning"
+    )
+    server = GracefulServer(config)
+    serving = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    base_url = "http://%s:%d" % sock.getsockname()
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        async with client.stream("GET", f"{settings.API_PREFIX}/stream/events", headers=headers) as response:
+            assert response.status_code == 200
+            lines = response.aiter_lines()
+            assert await lines.__anext__() == "retry: 5000"
+            started = time.monotonic()
+            server.should_exit = True
+            # The stream ends instead of holding the shutdown until the connection timeout
+            async for _ in lines:
+                pass
+    await serving
+    return started
+
+
+def test_open_streams_dont_hold_the_flush():
+    asyncio.run(mock_client[DATABASE_NAME]["users"].insert_one({
+        "username": "shutdown_stream",
+        "email": "shutdown_stream@example.com",
+        "hashed_password": "unused",
+        "is_active": True,
+        "is_verified": True,
+        "roles": ["user"],
+    }))
+    token = create_access_token({"sub": "shutdown_stream"})
+    flushed_at = []
+    stop_audit_log = audit_log.stop
+
+    async def recording_stop():
+        flushed_at.append(time.monotonic())
+        await stop_audit_log()
+
+    with mock.patch.object(settings, "SERVER_GRACEFUL_TIMEOUT_SECONDS", 3), \
+            mock.patch.object(settings, "SERVER_SHUTDOWN_FLUSH_SECONDS", 1), \
+            mock.patch.object(audit_log, "stop", recording_stop), \
+            mock.patch.object(inflight_tracker, "shutdown_started_at", None):
+        started = asyncio.run(serve_stream_then_shut_down(token))
+
+    assert len(flushed_at) == 1
+    assert flushed_at[0] - started < 1
+    assert event_broker.stats()["connections"] == 0
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} graceful shutdown tests passed")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Event stream tests: WebSocket and SSE connections receive the user's events,
+need stream:read, and are closed when the user is deactivated (in-memory
+database)
+"""
+import asyncio
+import os
+import threading
+import time
+
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from mock_mongo import mock_client
+
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.application import create_application
+from app.auth.security import create_access_token
+from app.config import settings
+from app.database.mongodb import DATABASE_NAME
+from app.models.user import User
+from app.services.event_service import event_broker
+from app.services.user_service import UserService
+
+API = settings.API_PREFIX
+
+
+def seed_user(username: str, roles):
+    asyncio.run(mock_client[DATABASE_NAME]["users"].insert_one({
+        "username": username,
+        "email": f"{username}@example.com",
+        "hashed_password": User.hash_password("stream-password"),
+        "is_active": True,
+        "is_verified": True,
+        "roles": roles,
+    }))
+
+
+async def deactivate(username: str):
+    await UserService.deactivate_user(await User.get_by_username(username))
+
+
+def wait_for_subscription(kind: str):
+    for _ in range(100):
+        if event_broker.stats()[f"{kind}_connections"]:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"no {kind} connection")
+
+
+def test_websocket_closes_on_deactivation():
+    seed_user("ws_user", ["user"])
+    token = create_access_token({"sub": "ws_user"})
+    with TestClient(create_application()) as client:
+        with client.websocket_connect(f"{API}/stream/ws?token={token}") as websocket:
+            wait_for_subscription("websocket")
+            client.portal.call(deactivate, "ws_user")
+            event = websocket.receive_json()
+            assert event["type"] == "user.deactivated"
+            message = websocket.receive()
+            assert message["type"] == "websocket.close"
+            assert message["code"] == 1008
+        assert event_broker.stats()["connections"] == 0
+
+
+def test_websocket_requires_stream_read():
+    seed_user("ws_gateway", ["gateway"])
+    token = create_access_token({"sub": "ws_gateway"})
+    with TestClient(create_application()) as client:
+        try:
+            with client.websocket_connect(f"{API}/stream/ws?token={token}"):
+                pass
+        except WebSocketDisconnect as e:
+            assert e.code == 1008
+        else:
+            raise AssertionError("connection without stream:read was accepted")
+
+
+def test_sse_stream_ends_on_deactivation():
+    seed_user("sse_user", ["user"])
+    token = create_access_token({"sub": "sse_user"})
+    with TestClient(create_application()) as client:
+        def deactivate_when_subscribed():
+            wait_for_subscription("sse")
+            client.portal.call(deactivate, "sse_user")
+
+        deactivator = threading.Thread(target=deactivate_when_subscribed)
+        deactivator.start()
+        with client.stream(
+            "GET", f"{API}/stream/events", headers={"Authorization": f"Bearer {token}"}
+        ) as response:
+            assert response.status_code == 200
+            events = [line for line in response.iter_lines() if line.startswith("data: ")]
+        deactivator.join()
+        assert len(events) == 1 and '"user.deactivated"' in events[0]
+        assert event_broker.stats()["connections"] == 0
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} event stream tests passed")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Multi-tenancy tests: host routing, template tenants that don't exist, client
+eviction, index builds of new tenant clients and tenant-bound tokens
+(in-memory database)
+"""
+import asyncio
+import json
+import os
+
+os.environ["MONGODB_TENANTS"] = json.dumps({"acme": {"database": "acme_db"}})
+os.environ["MONGODB_TENANT_DATABASE_TEMPLATE"] = "tenant_{tenant}"
+os.environ["TENANT_BASE_DOMAIN"] = "example.com"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+from mock_mongo import mock_client
+
+from fastapi.testclient import TestClient
+
+from app.application import create_application
+from app.auth.security import create_access_token
+from app.database.tenancy import TenantRegistry, tenant_registry
+from app.models.user import User
+
+
+def seed_user(database: str, username: str, email: str):
+    asyncio.run(mock_client[database]["users"].insert_one({
+        "username": username,
+        "email": email,
+        "hashed_password": User.hash_password("tenant-password"),
+        "is_active": True,
+        "is_verified": True,
+        "roles": ["user"],
+    }))
+
+
+def me(client: TestClient, token: str, host: str):
+    return client.get(
+        "/api/v1/auth/me",
+        headers={"Authorization": f"Bearer {token}", "Host": host},
+    )
+
+
+def test_host_routing():
+    seed_user("acme_db", "alice", "alice@acme.example.com")
+    seed_user("tenant_initech", "alice", "alice@initech.example.com")
+    with TestClient(create_application()) as client:
+        response = me(client, create_access_token({"sub": "alice", "tid": "acme"}), "acme.example.com")
+        assert response.status_code == 200, response.text
+        assert response.json()["email"] == "alice@acme.example.com"
+
+        response = me(client, create_access_token({"sub": "alice", "tid": "initech"}), "initech.example.com")
+        assert response.status_code == 200, response.text
+        assert response.json()["email"] == "alice@initech.example.com"
+
+        # A token of another tenant isn't accepted on this tenant's host
+        response = me(client, create_access_token({"sub": "alice", "tid": "initech"}), "acme.example.com")
+        assert response.status_code == 401
+
+
+def test_unprovisioned_template_tenant_gets_no_client():
+    with TestClient(create_application()) as client:
+        created = tenant_registry.created
+        for i in range(50):
+            response = client.get("/api/v1/hello/", headers={"Host": f"random{i}.example.com"})
+            assert response.status_code == 404
+            assert response.json() == {"detail": "Unknown tenant"}
+        assert tenant_registry.created == created
+        assert tenant_registry.stats()["rejected"] >= 50
+
+
+def test_template_traffic_never_evicts_configured_tenants():
+    registry = TenantRegistry({"acme": {"database": "acme_db"}}, "tenant_{tenant}", None, 2, 5)
+    acme = registry.connection("acme", build_indexes=False)
+    for i in range(10):
+        registry.connection(f"t{i}", build_indexes=False)
+    assert registry.connection("acme") is acme
+    assert registry.stats()["template_clients"] == 2
+    assert registry.evicted == 8
+    registry.close_all()
+
+
+async def test_new_template_tenant_builds_indexes():
+    registry = TenantRegistry({}, "tenant_{tenant}", None, 4, 5)
+    registry.connection("umbrella")
+    await asyncio.gather(*registry._index_tasks)
+    indexes = await mock_client["tenant_umbrella"]["users"].index_information()
+    assert {"username", "email"} <= {key for index in indexes.values() for key, _ in index["key"]}
+    registry.close_all()
+
+
+async def test_exists_checks_template_databases():
+    registry = TenantRegistry({"acme": {"database": "acme_db"}}, "tenant_{tenant}", None, 4, 5)
+    assert await registry.exists("acme")
+    assert not await registry.exists("Not A Tenant!")
+    await mock_client["tenant_hooli"]["users"].insert_one({"username": "gavin"})
+    assert await registry.exists("hooli")
+    assert not await registry.exists("piedpiper")
+    assert registry.created == 0
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        if asyncio.iscoroutinefunction(test):
+            asyncio.run(test())
+        else:
+            test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} multi-tenancy tests passed")
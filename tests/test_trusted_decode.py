@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Trusted user decoding tests: the fast path matches validated users, bad ids,
+and saving users that came from it (in-memory database)
+"""
+import asyncio
+from datetime import datetime
+
+from mock_mongo import mock_client
+
+from bson import ObjectId
+
+from app.application import DOCUMENT_MODELS
+from app.database.mongodb import DATABASE_NAME, init_db
+from app.models.user import User
+from app.services.user_service import UserService
+
+
+async def seed_user(username: str) -> str:
+    await init_db(DOCUMENT_MODELS)
+    result = await mock_client[DATABASE_NAME]["users"].insert_one({
+        "username": username,
+        "email": f"{username}@example.com",
+        "hashed_password": User.hash_password("trusted-password"),
+        "first_name": "Trusted",
+        "is_active": True,
+        "is_verified": True,
+        "roles": ["user"],
+        "created_at": datetime(2026, 1, 1),
+        "updated_at": datetime(2026, 1, 1),
+    })
+    return str(result.inserted_id)
+
+
+async def stored(user_id: str):
+    return await mock_client[DATABASE_NAME]["users"].find_one({"_id": ObjectId(user_id)})
+
+
+async def test_trusted_user_matches_validated_user():
+    user_id = await seed_user("trusted_match")
+    assert (await User.get_trusted(user_id)).model_dump() == (await User.get(user_id)).model_dump()
+    assert await User.get_trusted("not-an-object-id") is None
+    assert await User.get_trusted(str(ObjectId())) is None
+
+
+async def test_update_of_trusted_user_round_trips():
+    user_id = await seed_user("trusted_update")
+    before = await stored(user_id)
+    user = await UserService.update_user(await User.get_trusted(user_id), {"last_name": "Saved"})
+    after = await stored(user_id)
+    assert isinstance(user, User) and user.last_name == "Saved"
+    assert isinstance(after["_id"], ObjectId)
+    assert after["last_name"] == "Saved"
+    assert all(after[key] == value for key, value in before.items() if key != "updated_at")
+
+
+async def test_stale_trusted_copy_does_not_undo_deactivation():
+    user_id = await seed_user("trusted_stale")
+    stale = await User.get_trusted(user_id)
+    await UserService.deactivate_user(await User.get(user_id))
+    await UserService.update_user(stale, {"first_name": "Stale"})
+    after = await stored(user_id)
+    assert after["first_name"] == "Stale"
+    assert after["is_active"] is False
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        asyncio.run(test())
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} trusted decoding tests passed")